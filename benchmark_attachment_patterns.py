@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+附件正则模式库性能测试脚本
+对比逐条 re.search / re.findall 的旧实现与预编译单次扫描的新实现，
+并校验两者在样例证照语料上的分类与提取结果完全一致
+"""
+
+import re
+import sys
+import time
+import random
+from typing import Dict, Any, List
+
+from src.gender_book.attachment_patterns import ENHANCED_PATTERNS, pattern_library
+
+
+def legacy_classify(text: str) -> Dict[str, Any]:
+    """旧实现：每种文档类型分别扫描关键词和字段正则"""
+    max_confidence = 0
+    best_type = "其他文件"
+    keyword_matches = {}
+
+    for doc_type, config in ENHANCED_PATTERNS.items():
+        keywords = config["keywords"]
+        matches = sum(1 for keyword in keywords if keyword in text)
+        match_ratio = matches / len(keywords)
+
+        field_matches = 0
+        for pattern, field_name in config["critical_fields"]:
+            if re.search(pattern, text, re.IGNORECASE):
+                field_matches += 1
+
+        field_ratio = field_matches / len(config["critical_fields"])
+        confidence = match_ratio * 0.4 + field_ratio * 0.6
+
+        keyword_matches[doc_type] = {
+            "keyword_matches": matches,
+            "field_matches": field_matches,
+            "confidence": confidence
+        }
+
+        if confidence > max_confidence:
+            max_confidence = confidence
+            best_type = doc_type
+
+    return {"type": best_type, "confidence": max_confidence, "analysis": keyword_matches}
+
+
+def legacy_extract(text: str, doc_type: str) -> Dict[str, str]:
+    """旧实现：对选中类型的每个字段执行 re.findall"""
+    raw_values = {}
+    if doc_type in ENHANCED_PATTERNS:
+        for pattern, field_name in ENHANCED_PATTERNS[doc_type]["critical_fields"]:
+            matches = re.findall(pattern, text, re.IGNORECASE | re.DOTALL)
+            if matches:
+                raw_values[field_name] = max(matches, key=len) if isinstance(matches[0], str) else matches[0]
+    return raw_values
+
+
+def build_corpus(size: int, seed: int = 2025) -> List[str]:
+    """生成样例证照语料（营业执照、资质证书、许可证、财务报表、授权书及无关文本）"""
+    rng = random.Random(seed)
+    companies = ["武汉光谷建设开发有限公司", "湖北长江建工集团有限公司", "Wuhan Metro Engineering Co., Ltd."]
+    people = ["李建国", "王志强", "Zhang Wei"]
+
+    def date():
+        return f"{rng.randint(2000, 2030)}{rng.choice('年-')}{rng.randint(1, 12)}{rng.choice('月-')}{rng.randint(1, 28)}"
+
+    def code():
+        return "".join(rng.choice("ABCDEFGHJKLMNPQRTUWXY0123456789") for _ in range(18))
+
+    def money():
+        return f"{rng.randint(1, 99999):,}.{rng.randint(0, 99):02d}"
+
+    templates = [
+        lambda: (f"营业执照\n统一社会信用代码：{code()}\n企业名称：{rng.choice(companies)}\n"
+                 f"注册资本：{rng.randint(100, 90000)}万元人民币\n成立日期：{date()}\n"
+                 f"营业期限：长期\n法定代表人：{rng.choice(people)}\n"
+                 f"经营范围：房屋建筑工程施工总承包；市政公用工程施工。"),
+        lambda: (f"Business License\nCompany Name: {rng.choice(companies)}\nCredit Code: {code().lower()}\n"
+                 f"Registered Capital: {money()} CNY\nEstablishment Date: {date()}\n"
+                 f"Legal Representative: {rng.choice(people)}"),
+        lambda: (f"建筑业企业资质证书\n证书编号：D{rng.randint(100000000, 999999999)}\n"
+                 f"企业名称：{rng.choice(companies)}\n资质类别：施工总承包\n资质等级：壹级\n"
+                 f"有效期至：{date()}\n发证机关：湖北省住房和城乡建设厅"),
+        lambda: (f"安全生产许可证\n许可证编号：（鄂）JZ安许证字[{rng.randint(2015, 2025)}]{rng.randint(1000, 9999)}\n"
+                 f"企业名称：{rng.choice(companies)}\n有效期至：{date()}\n"
+                 f"发证机关：湖北省住房和城乡建设厅 Issuing Authority: Hubei DOHURD"),
+        lambda: (f"{rng.randint(2018, 2024)}年度 资产负债表\n总资产：{money()}\n净资产：{money()}\n"
+                 f"利润表\n营业收入：{money()}\n净利润：{money()}\nIncome Statement Revenue: {money()}"),
+        lambda: (f"法定代表人授权委托书\n法定代表人：{rng.choice(people)} 被授权人：{rng.choice(people)}\n"
+                 f"授权范围：代表本公司参加投标活动\n有效期：自{date()}起 有效期至：{date()}\n"
+                 f"Power of Attorney / Legal Authorization"),
+        lambda: ("本项目为光谷科创中心一期工程预制构件供应项目，" * rng.randint(5, 30)),
+    ]
+
+    corpus = []
+    for _ in range(size):
+        parts = [rng.choice(templates)() for _ in range(rng.randint(1, 3))]
+        # 附加OCR噪声文本，模拟真实扫描件
+        parts.append("\n".join("第{}页 扫描件 OCR 识别文本".format(i) for i in range(rng.randint(5, 40))))
+        corpus.append("\n".join(parts))
+    return corpus
+
+
+def run_legacy(corpus: List[str]) -> List[Any]:
+    results = []
+    for text in corpus:
+        classification = legacy_classify(text)
+        results.append((classification, legacy_extract(text, classification["type"])))
+    return results
+
+
+def run_compiled(corpus: List[str]) -> List[Any]:
+    results = []
+    for text in corpus:
+        scan_result = pattern_library.scan(text)
+        classification = pattern_library.classify(scan_result)
+        results.append((classification, pattern_library.extract(scan_result, classification["type"])))
+    return results
+
+
+def timed(func, corpus: List[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = 5
+    corpus = build_corpus(size)
+
+    print("🔧 附件正则模式库性能测试")
+    print("=" * 50)
+    print(f"样例文档数量: {len(corpus)}，平均长度: {sum(map(len, corpus)) // len(corpus)} 字符")
+
+    if run_legacy(corpus) != run_compiled(corpus):
+        print("❌ 新旧实现结果不一致")
+        sys.exit(1)
+    print("✅ 新旧实现分类与提取结果一致")
+
+    legacy_time = timed(run_legacy, corpus, rounds)
+    compiled_time = timed(run_compiled, corpus, rounds)
+
+    print(f"旧实现（逐条 re.search/findall）: {legacy_time * 1000:.1f} ms")
+    print(f"新实现（预编译单次扫描）:        {compiled_time * 1000:.1f} ms")
+    print(f"加速比: {legacy_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
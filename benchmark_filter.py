@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+招标文件内容优化性能测试脚本
+对比原有逐项遍历的 optimize_tender_content_for_llm 与按列计算的新实现，
+并校验两者在大规模合成文档和随机边界用例上的输出完全一致
+"""
+
+import sys
+import copy
+import time
+import random
+from typing import Any, Dict
+
+from src.utils import filter as content_filter
+
+
+# ==================== 旧实现（src/utils/filter.py 原有逻辑） ====================
+
+def legacy_optimize(filtered_data):
+    """
+    优化过滤后的招标文件，使其更适合大模型理解
+    """
+    
+    def merge_related_fragments(content_list):
+        """合并相关的文本片段"""
+        merged_content = []
+        current_section = ""
+        buffer = []
+        
+        for item in content_list:
+            text = item.get("text", "").strip()
+            item_type = item.get("type", "")
+            
+            # 跳过无意义的内容
+            if (text in ["*", ":", "**", "***"] or 
+                text.startswith("*") and len(text) <= 3 or
+                len(text) <= 1):
+                continue
+            
+            # 处理标题
+            if item_type == "Title":
+                # 如果buffer中有内容，先处理buffer
+                if buffer:
+                    merged_text = " ".join(buffer).strip()
+                    if merged_text and len(merged_text) > 3:
+                        merged_content.append({
+                            "type": "Content",
+                            "text": merged_text,
+                            "section": current_section
+                        })
+                    buffer = []
+                
+                # 处理标题
+                if text.startswith("#"):
+                    current_section = text
+                    merged_content.append({
+                        "type": "Title", 
+                        "text": text,
+                        "section": current_section
+                    })
+                elif text.endswith(":") or "：" in text:
+                    # 这可能是一个字段标签，加入buffer等待后续内容
+                    buffer.append(text)
+                else:
+                    buffer.append(text)
+            
+            # 处理其他内容
+            elif item_type in ["UncategorizedText", "ListItem"]:
+                buffer.append(text)
+        
+        # 处理最后的buffer
+        if buffer:
+            merged_text = " ".join(buffer).strip()
+            if merged_text and len(merged_text) > 3:
+                merged_content.append({
+                    "type": "Content",
+                    "text": merged_text,
+                    "section": current_section
+                })
+        
+        return merged_content
+    
+    def clean_and_merge_text(content_list):
+        """清理并智能合并文本"""
+        cleaned_content = []
+        
+        for i, item in enumerate(content_list):
+            text = item["text"]
+            
+            # 特殊处理：合并被分割的信息
+            if (text.endswith("(027") and 
+                i + 1 < len(content_list) and 
+                content_list[i + 1]["text"].startswith(("8", "1"))):
+                # 合并电话号码
+                next_text = content_list[i + 1]["text"]
+                merged_text = text + next_text
+                cleaned_content.append({
+                    **item,
+                    "text": merged_text
+                })
+                # 跳过下一个项目（因为已经合并了）
+                content_list[i + 1]["skip"] = True
+                continue
+            
+            # 跳过标记为跳过的项目
+            if item.get("skip"):
+                continue
+            
+            # 合并数字信息（如"长度6" + "12米"）
+            if (text.endswith(("长度", "高度")) and text[-1].isdigit() and
+                i + 1 < len(content_list)):
+                next_text = content_list[i + 1]["text"]
+                if next_text.endswith("米"):
+                    merged_text = text + next_text
+                    cleaned_content.append({
+                        **item,
+                        "text": merged_text
+                    })
+                    content_list[i + 1]["skip"] = True
+                    continue
+            
+            cleaned_content.append(item)
+        
+        return cleaned_content
+    
+    # 执行优化
+    content = filtered_data.get("content", [])
+    
+    # 第一步：清理和智能合并
+    cleaned_content = clean_and_merge_text(content)
+    
+    # 第二步：按章节合并相关片段
+    merged_content = merge_related_fragments(cleaned_content)
+    
+    return {"content": merged_content}
+
+
+# ==================== 测试数据 ====================
+
+_FRAGMENTS = ["*", ":", "**", "***", "*a", "a", " ", "", "(027", "87654321", "12米", "长度", "高度",
+              "项目编号：ZB-2025-001", "采购人：某某单位", "联系电话：(027", "1", "8", "**注意**",
+              "含\x00(027"]
+_TYPES = ["Title", "UncategorizedText", "ListItem", "NarrativeText", "Footer", ""]
+
+
+def build_document(elements: int, seed: int = 2025) -> Dict[str, Any]:
+    """生成带章节标题、被拆分电话号码和噪声片段的合成过滤结果"""
+    rng = random.Random(seed)
+    content = []
+    for i in range(elements):
+        roll = rng.random()
+        if roll < 0.05:
+            content.append({"type": "Title", "text": f"# 第{i}章 招标要求"})
+        elif roll < 0.15:
+            content.append({"type": "Title", "text": f"字段{i}："})
+        elif roll < 0.16:
+            content.append({"type": "UncategorizedText", "text": "联系电话：(027"})
+            content.append({"type": "UncategorizedText", "text": f"8{rng.randint(1000000, 9999999)}"})
+        elif roll < 0.3:
+            content.append({"type": rng.choice(_TYPES), "text": rng.choice(_FRAGMENTS)})
+        else:
+            content.append({"type": rng.choice(("UncategorizedText", "ListItem", "NarrativeText")),
+                            "text": f"  第{i}项技术要求：设备应满足国家标准，长度{rng.randint(1, 99)}米  "})
+    return {"content": content}
+
+
+def random_document(rng: random.Random) -> Dict[str, Any]:
+    """随机边界用例：短列表、连续电话片段、已带 skip 标记的元素等"""
+    content = []
+    for _ in range(rng.randint(0, 12)):
+        item = {"text": rng.choice(_FRAGMENTS + ["# 标题", "#", "正文内容一段"])}
+        if rng.random() < 0.9:
+            item["type"] = rng.choice(_TYPES)
+        if rng.random() < 0.05:
+            item["skip"] = True
+        content.append(item)
+    return {"content": content}
+
+
+def run_legacy(data: Dict[str, Any]) -> Dict[str, Any]:
+    # 旧实现会给输入元素写入 skip 标记，每次使用独立副本
+    return legacy_optimize(copy.deepcopy(data))
+
+
+def check_equal(data: Dict[str, Any]) -> bool:
+    snapshot = copy.deepcopy(data)
+    result = content_filter.optimize_tender_content_for_llm(data)
+    # 新实现不修改输入
+    return result == run_legacy(data) and data == snapshot
+
+
+def timed(func, arg, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    elements = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rounds = 7
+    document = build_document(elements)
+    rng = random.Random(7)
+    cases = [random_document(rng) for _ in range(5000)]
+
+    print("🔧 招标文件内容优化性能测试")
+    print("=" * 50)
+    print(f"元素数量: {len(document['content'])}")
+
+    if not check_equal(document) or not all(check_equal(case) for case in cases):
+        print("❌ 新旧实现输出不一致")
+        sys.exit(1)
+    print(f"✅ 新旧实现输出一致（合成文档及 {len(cases)} 个随机用例），且新实现不修改输入")
+
+    # 合成文档不含预置的 skip 标记，旧实现重复运行时写入的标记与首次相同，不影响计时
+    legacy_time = timed(legacy_optimize, copy.deepcopy(document), rounds)
+    new_time = timed(content_filter.optimize_tender_content_for_llm, document, rounds)
+
+    print(f"旧实现（逐项遍历、内部函数）: {legacy_time * 1000:.1f} ms")
+    print(f"新实现（按列计算、单次合并）: {new_time * 1000:.1f} ms")
+    print(f"加速比: {legacy_time / new_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
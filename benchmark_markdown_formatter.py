@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投标书Markdown格式化性能测试脚本
+对比原有多次扫描的Markdown后处理实现与增量单次遍历的MarkdownFormatter，
+并校验两者在约200页投标书上的输出完全一致（整篇转换与按章节增量转换）
+"""
+
+import sys
+import time
+import random
+from typing import List
+
+from src.gender_book.markdown_formatter import MarkdownFormatter
+
+
+# ==================== 旧实现（src/gender_book/api.py 原有逻辑） ====================
+
+def legacy_convert(bid_content):
+    """旧实现：段落识别后再整体做一次格式清理（不含生成时间页脚）"""
+    markdown_content = "# 投标书\n\n"
+    if isinstance(bid_content, str):
+        markdown_content += _process_string_content(bid_content)
+    elif isinstance(bid_content, dict):
+        markdown_content += _process_dict_content(bid_content)
+    else:
+        markdown_content += str(bid_content).strip() + "\n\n"
+    return _clean_markdown_format(markdown_content)
+
+
+def _process_string_content(content):
+    """处理字符串格式的投标书内容，优化标题处理"""
+    result = ""
+    paragraphs = content.split('\n\n')
+    seen_titles = set()
+    
+    for paragraph in paragraphs:
+        if not paragraph.strip():
+            continue
+            
+        paragraph = paragraph.strip()
+        
+        # 跳过重复的"投标书"标题和其他重复标题
+        if paragraph in ["# 投标书", "投标书"] or paragraph.endswith(" 投标书"):
+            continue
+        
+        # 处理已有的markdown标题
+        if paragraph.startswith('#'):
+            # 规范化标题格式
+            title_level = len(paragraph) - len(paragraph.lstrip('#'))
+            title_text = paragraph.lstrip('#').strip()
+            
+            if title_text:
+                # 标准化标题
+                normalized_title = _normalize_title(title_text)
+                
+                # 跳过重复标题
+                if _is_duplicate_title(normalized_title, seen_titles):
+                    continue
+                
+                # 验证和调整标题层级
+                validated_level = _validate_title_level(normalized_title, title_level)
+                # 确保不超过4级标题，一级标题改为二级
+                if validated_level == 1:
+                    validated_level = 2
+                validated_level = min(validated_level, 4)
+                
+                seen_titles.add(normalized_title)
+                result += f"{'#' * validated_level} {normalized_title}\n\n"
+        
+        # 检测可能的章节标题
+        elif _is_chapter_title(paragraph):
+            title = _clean_title_text(paragraph)
+            if title:
+                normalized_title = _normalize_title(title)
+                
+                # 跳过重复标题
+                if not _is_duplicate_title(normalized_title, seen_titles):
+                    seen_titles.add(normalized_title)
+                    result += f"## {normalized_title}\n\n"
+        
+        # 检测可能的子标题
+        elif _is_sub_title(paragraph):
+            title = _clean_title_text(paragraph)
+            if title:
+                normalized_title = _normalize_title(title)
+                
+                # 跳过重复标题
+                if not _is_duplicate_title(normalized_title, seen_titles):
+                    seen_titles.add(normalized_title)
+                    result += f"### {normalized_title}\n\n"
+        
+        else:
+            # 普通段落
+            result += paragraph + "\n\n"
+    
+    return result
+
+
+def _process_dict_content(content_dict):
+    """处理字典格式的投标书内容"""
+    result = ""
+    
+    # 预定义的章节顺序
+    section_order = [
+        "基本信息", "项目理解", "第一章 投标人基本情况", "第二章 资格条件响应",
+        "第三章 技术方案", "第四章 项目管理方案", "第五章 商务方案", 
+        "第六章 售后服务方案", "第七章 其他"
+    ]
+    
+    # 按预定义顺序处理章节
+    processed_sections = set()
+    
+    for section_key in section_order:
+        if section_key in content_dict:
+            result += _format_section(section_key, content_dict[section_key])
+            processed_sections.add(section_key)
+    
+    # 处理剩余章节
+    for section_title, section_content in content_dict.items():
+        if section_title not in processed_sections:
+            result += _format_section(section_title, section_content)
+    
+    return result
+
+
+def _format_section(title, content):
+    """格式化单个章节"""
+    result = f"## {title}\n\n"
+    
+    if isinstance(content, str):
+        # 处理字符串内容中的子标题
+        lines = content.split('\n')
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+                
+            if _is_sub_title(line):
+                clean_title = _clean_title_text(line)
+                if clean_title:
+                    result += f"### {clean_title}\n\n"
+            else:
+                result += line + "\n"
+        result += "\n"
+        
+    elif isinstance(content, list):
+        for item in content:
+            if isinstance(item, str) and item.strip():
+                result += f"- {item.strip()}\n"
+        result += "\n"
+    else:
+        result += str(content).strip() + "\n\n"
+    
+    return result
+
+
+def _is_chapter_title(text):
+    """判断是否为章节标题，更精确的匹配"""
+    import re
+    
+    text = text.strip()
+    
+    # 黑名单关键词 - 这些不应该被识别为章节标题
+    blacklist_keywords = [
+        '详见', '如下', '包括', '具体', '说明', '要求', '标准', '规范',
+        '附件', '附录', '备注', '注意', '提醒', '温馨提示'
+    ]
+    
+    # 检查黑名单
+    for keyword in blacklist_keywords:
+        if keyword in text:
+            return False
+    
+    # 长度检查 - 太短或太长的文本不太可能是标题
+    if len(text) < 2 or len(text) > 50:
+        return False
+    
+    # 章节标题模式（更严格）
+    chapter_patterns = [
+        r'^第[一二三四五六七八九十\d]+章[\s：:].{2,30}$',  # 第X章 标题（限制长度）
+        r'^[一二三四五六七八九十]、.{2,30}$',  # 一、标题
+        r'^\d+[、.]\s*.{2,30}$',  # 1. 标题 或 1、标题
+        r'^\d+\.\d+[\s：:].{2,30}$',  # 1.1 标题
+        r'^.{2,20}[：:]$',  # 以冒号结尾的标题（限制长度）
+    ]
+    
+    for pattern in chapter_patterns:
+        if re.match(pattern, text):
+            return True
+    
+    # 特定关键词（更精确匹配）
+    title_keywords = [
+        '基本信息', '项目理解', '技术方案', '商务方案', '服务方案', 
+        '资格条件', '项目管理', '质量保证', '进度安排', '人员配置',
+        '设备配置', '安全措施', '环保措施', '售后服务'
+    ]
+    
+    # 关键词匹配需要更严格的条件
+    for keyword in title_keywords:
+        if keyword in text:
+            # 确保关键词不是在句子中间
+            if text.startswith(keyword) or text.endswith(keyword):
+                return True
+            # 或者关键词前后有标点符号
+            if re.search(f'[^\\w]{keyword}[^\\w]', text):
+                return True
+    
+    return False
+
+
+def _is_sub_title(text):
+    """判断是否为子标题"""
+    import re
+    
+    # 子标题模式
+    sub_patterns = [
+        r'^\d+\.\d+\.\d+\s+.+',  # 1.1.1 标题
+        r'^\([一二三四五六七八九十\d]+\)\s*.+',  # (1) 标题
+        r'^[①②③④⑤⑥⑦⑧⑨⑩]\s*.+',  # ① 标题
+    ]
+    
+    for pattern in sub_patterns:
+        if re.match(pattern, text.strip()):
+            return True
+    
+    return False
+
+
+def _clean_title_text(text):
+    """清理标题文本"""
+    import re
+    
+    # 移除标题标记
+    text = re.sub(r'^#+\s*', '', text)  # 移除markdown标记
+    text = re.sub(r'^第[一二三四五六七八九十\d]+章\s*', '', text)  # 移除章节标记
+    text = re.sub(r'^[一二三四五六七八九十\d]+[、.]\s*', '', text)  # 移除序号
+    text = re.sub(r'^\d+\.\d+\.?\s*', '', text)  # 移除数字序号
+    text = re.sub(r'^\([一二三四五六七八九十\d]+\)\s*', '', text)  # 移除括号序号
+    text = re.sub(r'^[①②③④⑤⑥⑦⑧⑨⑩]\s*', '', text)  # 移除圆圈序号
+    text = text.rstrip('：:').strip()  # 移除结尾冒号
+    
+    return text.strip()
+
+
+def _normalize_title(title):
+    """标准化标题格式"""
+    import re
+    
+    # 移除多余空白
+    title = re.sub(r'\s+', ' ', title.strip())
+    
+    # 移除重复的标点符号
+    title = re.sub(r'[：:]{2,}', '：', title)
+    title = re.sub(r'[。.]{2,}', '。', title)
+    
+    # 统一标点符号
+    title = title.replace(':', '：')
+    
+    return title
+
+
+def _is_duplicate_title(title, seen_titles):
+    """检查是否为重复标题"""
+    normalized = _normalize_title(title)
+    
+    # 检查完全相同的标题
+    if normalized in seen_titles:
+        return True
+    
+    # 检查相似标题（去除标点后比较）
+    import re
+    clean_title = re.sub(r'[^\w\s]', '', normalized)
+    for seen in seen_titles:
+        clean_seen = re.sub(r'[^\w\s]', '', seen)
+        if clean_title == clean_seen and clean_title:
+            return True
+    
+    return False
+
+
+def _validate_title_level(title, level):
+    """验证标题层级是否合理"""
+    import re
+    
+    # 一级标题关键词
+    level1_keywords = ['投标书', '技术方案', '商务方案', '项目管理方案', '售后服务方案']
+    
+    # 二级标题关键词
+    level2_keywords = ['基本信息', '项目理解', '资格条件', '技术要求', '服务承诺']
+    
+    # 检查是否包含章节标记
+    if re.search(r'第[一二三四五六七八九十\d]+章', title):
+        return min(level, 2)  # 章节标题最多为二级
+    
+    # 根据关键词调整级别
+    for keyword in level1_keywords:
+        if keyword in title:
+            return 2  # 主要章节为二级标题
+    
+    for keyword in level2_keywords:
+        if keyword in title:
+            return 3  # 子章节为三级标题
+    
+    # 限制最大层级
+    return min(level, 4)
+
+
+def _clean_markdown_format(content):
+    """清理markdown格式，消除标题重复和层级混乱"""
+    import re
+    
+    lines = content.split('\n')
+    cleaned_lines = []
+    seen_titles = set()
+    
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        
+        # 跳过空行
+        if not line:
+            # 避免连续空行
+            if cleaned_lines and cleaned_lines[-1] != '':
+                cleaned_lines.append('')
+            i += 1
+            continue
+        
+        # 处理markdown标题
+        title_match = re.match(r'^(#{1,6})\s+(.+)$', line)
+        if title_match:
+            level = len(title_match.group(1))
+            title_text = title_match.group(2).strip()
+            
+            # 标准化标题
+            normalized_title = _normalize_title(title_text)
+            
+            # 跳过重复标题
+            if _is_duplicate_title(normalized_title, seen_titles):
+                i += 1
+                continue
+            
+            # 验证和调整标题层级
+            validated_level = _validate_title_level(normalized_title, level)
+            
+            # 添加标题
+            if normalized_title:
+                seen_titles.add(normalized_title)
+                # 确保标题前有空行（除非是第一行）
+                if cleaned_lines and cleaned_lines[-1] != '':
+                    cleaned_lines.append('')
+                cleaned_lines.append(f"{'#' * validated_level} {normalized_title}")
+                cleaned_lines.append('')  # 标题后空行
+        else:
+            # 普通内容行
+            cleaned_lines.append(line)
+        
+        i += 1
+    
+    # 清理结尾多余空行
+    while cleaned_lines and cleaned_lines[-1] == '':
+        cleaned_lines.pop()
+    
+    return '\n'.join(cleaned_lines)
+
+
+
+# ==================== 测试数据与计时 ====================
+
+def build_bid_sections(pages: int, seed: int = 2025) -> List[str]:
+    """生成约 pages 页（每页约2000字符）的投标书章节，包含各类标题和重复标题"""
+    rng = random.Random(seed)
+    chapters = ["投标人基本情况", "资格条件响应", "技术方案", "项目管理方案", "商务方案", "售后服务方案", "其他"]
+    topics = ["质量保证措施", "进度安排", "人员配置", "设备配置", "安全措施", "环保措施",
+              "施工组织设计", "材料采购计划", "风险控制", "应急预案"]
+    sentence = ("本公司将严格按照招标文件要求组织实施，确保工程质量达到国家现行验收规范合格标准，"
+                "并在合同工期内完成全部施工任务。")
+    numerals = "一二三四五六七八九十"
+
+    sections, size, index = [], 0, 0
+    while size < pages * 2000:
+        chapter = chapters[index % len(chapters)]
+        parts = [f"## 第{numerals[index % 10]}章 {chapter}", f"{chapter}:"]
+        for sub in range(rng.randint(4, 10)):
+            topic = rng.choice(topics)
+            parts.append(rng.choice([
+                f"### {index + 1}.{sub + 1} {topic}",
+                f"{numerals[sub % 10]}、{topic}",
+                f"{index + 1}.{sub + 1}.{rng.randint(1, 9)} {topic}",
+                f"({sub + 1}) {topic}",
+                f"{topic}：",
+                f"#  {topic}::",
+            ]))
+            for _ in range(rng.randint(2, 6)):
+                parts.append(sentence * rng.randint(1, 4) + ("\n- 具体要求详见附件" if rng.random() < 0.2 else ""))
+        parts.append("---")
+        section = "\n\n".join(parts)
+        sections.append(section)
+        size += len(section)
+        index += 1
+    return sections
+
+
+def run_incremental(sections: List[str]) -> str:
+    formatter = MarkdownFormatter()
+    for section in sections:
+        formatter.feed(section)
+    return formatter.render(with_footer=False)
+
+
+def run_whole(document: str) -> str:
+    formatter = MarkdownFormatter()
+    formatter.feed(document)
+    return formatter.render(with_footer=False)
+
+
+def timed(func, arg, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = 5
+    sections = build_bid_sections(pages)
+    document = "\n\n".join(sections)
+
+    print("🔧 投标书Markdown格式化性能测试")
+    print("=" * 50)
+    print(f"章节数量: {len(sections)}，文档长度: {len(document)} 字符（约{len(document) // 2000}页）")
+
+    expected = legacy_convert(document)
+    if run_whole(document) != expected or run_incremental(sections) != expected:
+        print("❌ 新旧实现输出不一致")
+        sys.exit(1)
+    print("✅ 新旧实现输出一致（整篇转换与按章节增量转换）")
+
+    legacy_time = timed(legacy_convert, document, rounds)
+    whole_time = timed(run_whole, document, rounds)
+    incremental_time = timed(run_incremental, sections, rounds)
+
+    print(f"旧实现（多次扫描）:        {legacy_time * 1000:.1f} ms")
+    print(f"新实现（整篇单次遍历）:    {whole_time * 1000:.1f} ms")
+    print(f"新实现（按章节增量）:      {incremental_time * 1000:.1f} ms")
+    print(f"加速比: {legacy_time / whole_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
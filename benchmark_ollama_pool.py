@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ollama多主机负载均衡性能测试脚本
+在本机启动若干个模拟Ollama服务（每台一次只处理一个生成请求，模拟CPU主机），
+对比单主机与多主机时并发 map 阶段调用的吞吐量，并验证故障主机被摘除后请求仍全部成功
+"""
+
+import sys
+import json
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.llm_service.provider_clients import OllamaClient
+
+
+class StandInOllama(BaseHTTPRequestHandler):
+    """模拟Ollama：/api/tags 立即返回，/api/chat 串行处理并固定耗时"""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send({"models": [{"name": "stand-in:latest"}]})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.busy:
+            time.sleep(self.server.latency)
+            self.server.handled += 1
+        self._send({"message": {"content": payload["messages"][0]["content"]}, "load_duration": 0})
+
+
+def start_server(latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInOllama)
+    server.daemon_threads = True
+    server.busy = threading.Lock()
+    server.latency = latency
+    server.handled = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_map(client: OllamaClient, calls: int, workers: int) -> float:
+    """并发发送 calls 个 map 请求，返回每秒完成的请求数"""
+    def call(i):
+        response = client.chat("stand-in", [{"role": "user", "content": f"chunk {i}"}])
+        assert response["message"]["content"] == f"chunk {i}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(call, range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    latency = 0.1
+    calls = 16 * hosts
+    servers = [start_server(latency) for _ in range(hosts)]
+    urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+
+    print("🔧 Ollama多主机负载均衡性能测试")
+    print("=" * 50)
+    print(f"模拟主机: {hosts} 台，每个请求耗时 {latency * 1000:.0f} ms（每台串行处理）")
+
+    single = run_map(OllamaClient(urls[0]), calls, 2 * hosts)
+    pooled_client = OllamaClient(urls)
+    pooled = run_map(pooled_client, calls, 2 * hosts)
+    counts = [endpoint["requests"] for endpoint in pooled_client.pool.get_status()["endpoints"]]
+    print(f"单主机吞吐量: {single:.1f} 请求/秒")
+    print(f"{hosts} 台主机吞吐量: {pooled:.1f} 请求/秒（各主机请求数 {counts}）")
+    print(f"加速比: {pooled / single:.2f}x")
+
+    # 加入一台不可用的主机：请求换主机后全部成功，连续失败后该主机被摘除
+    dead_url = f"http://127.0.0.1:{unused_port()}"
+    failover_client = OllamaClient(urls + [dead_url])
+    run_map(failover_client, calls, 2 * hosts)
+    dead = failover_client.pool.get_status()["endpoints"][-1]
+    print(f"故障主机: 请求 {dead['requests']} 次，失败 {dead['failures']} 次，"
+          f"当前{'已摘除' if not dead['available'] else '未摘除'}，其余请求全部成功")
+
+    for server in servers:
+        server.shutdown()
+    if pooled / single < hosts * 0.7 or dead['available']:
+        print("❌ 负载均衡未达到预期")
+        sys.exit(1)
+    print("✅ 吞吐量随主机数增长，故障主机被摘除")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,20 @@ class Config:
     
     # Embedding模型配置
     EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL') or 'mxbai-embed-large:latest'
+    # 批量embedding配置：每次请求的文本数和持久化向量缓存路径（超时见 http_transport_config.ini）
+    EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE') or 64)
+    EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH') or 'cache/embeddings.db'
+
+    # 长文档分块提取配置：超过分块大小的文档按块并行提取后合并
+    EXTRACTION_CHUNK_SIZE = int(os.environ.get('EXTRACTION_CHUNK_SIZE') or 6000)
+    EXTRACTION_CHUNK_OVERLAP = int(os.environ.get('EXTRACTION_CHUNK_OVERLAP') or 200)
+    EXTRACTION_MAX_WORKERS = int(os.environ.get('EXTRACTION_MAX_WORKERS') or 4)
+
+    # 检索式字段提取配置：长文档按检索分块建立向量索引，每个字段只把最相关的 top-k 块发给模型
+    RETRIEVAL_CHUNK_SIZE = int(os.environ.get('RETRIEVAL_CHUNK_SIZE') or 1500)
+    RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K') or 3)
+    RETRIEVAL_MAX_CHUNKS_PER_PROMPT = int(os.environ.get('RETRIEVAL_MAX_CHUNKS_PER_PROMPT') or 6)
+    RETRIEVAL_INDEX_BACKEND = os.environ.get('RETRIEVAL_INDEX_BACKEND') or 'auto'
     
     # 日志配置
     LOG_LEVEL = logging.INFO
@@ -10,6 +10,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -24,6 +25,13 @@ from src.tender_generation_core.api import router as tender_router
 
 # 导入历史记录API
 from src.history.api import router as history_router
+from src.history.history_writer import history_writer
+from src.history.retention import retention_engine
+
+# 导入模型管理器、Ollama模型驻留管理和多端点健康检查
+from src.llm_service.model_manager import model_manager
+from src.llm_service.ollama_residency import residency_manager
+from src.llm_service.endpoint_pool import endpoint_health_checker
 
 # 导入过滤器API
 from src.api.filter import router as filter_router
@@ -56,9 +64,21 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"文档解析模块加载失败: {str(e)}")
     
+    # 启动历史记录后台写入器和保留策略定期清理
+    history_writer.start()
+    retention_engine.start()
+    # 后台预加载Ollama模型并保持驻留
+    model_manager.start_ollama_residency()
+    # 多台模型主机的后台健康检查（摘除的主机恢复后提前放回）
+    endpoint_health_checker.start()
+    
     yield
     
-    # 关闭时的清理
+    # 关闭时的清理：停止定期清理，写完队列中剩余的历史记录
+    await asyncio.to_thread(residency_manager.stop)
+    await asyncio.to_thread(endpoint_health_checker.stop)
+    await asyncio.to_thread(retention_engine.stop)
+    await asyncio.to_thread(history_writer.stop)
     logger.info("招标书文档解析系统关闭")
 
 
@@ -5,12 +5,13 @@ Ollama性能优化脚本
 用于提升本地大模型的生成速度和响应性能
 """
 
-import requests
 import json
 import time
 import sys
 from typing import Dict, Any
 
+from src.llm_service.http_transport import http_transport
+
 class OllamaOptimizer:
     def __init__(self, host: str = "http://localhost:11434"):
         self.host = host
@@ -19,7 +20,7 @@ class OllamaOptimizer:
     def check_ollama_status(self) -> bool:
         """检查Ollama服务状态"""
         try:
-            response = requests.get(f"{self.api_base}/tags", timeout=5)
+            response = http_transport.get(f"{self.api_base}/tags", "health")
             return response.status_code == 200
         except Exception as e:
             print(f"❌ Ollama服务未运行: {e}")
@@ -28,7 +29,7 @@ class OllamaOptimizer:
     def get_model_info(self, model_name: str) -> Dict[str, Any]:
         """获取模型信息"""
         try:
-            response = requests.get(f"{self.api_base}/tags")
+            response = http_transport.get(f"{self.api_base}/tags", "health")
             if response.status_code == 200:
                 models = response.json().get('models', [])
                 for model in models:
@@ -56,11 +57,7 @@ class OllamaOptimizer:
             }
             
             start_time = time.time()
-            response = requests.post(
-                f"{self.api_base}/generate",
-                json=payload,
-                timeout=60
-            )
+            response = http_transport.post_json(f"{self.api_base}/generate", payload, "generate")
             
             if response.status_code == 200:
                 load_time = time.time() - start_time
@@ -91,11 +88,7 @@ class OllamaOptimizer:
         
         try:
             start_time = time.time()
-            response = requests.post(
-                f"{self.api_base}/generate",
-                json=payload,
-                timeout=120
-            )
+            response = http_transport.post_json(f"{self.api_base}/generate", payload, "generate")
             total_time = time.time() - start_time
             
             if response.status_code == 200:
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
+import json
 import logging
 import sys
 import os
@@ -8,11 +10,16 @@ import os
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.filter import process_tender_document_optimized
+from utils.filter import process_tender_document_optimized, StreamingTenderFilter
 
 router = APIRouter(prefix="/api/filter", tags=["filter"])
 logger = logging.getLogger(__name__)
 
+# NDJSON 单行（一个元素）的最大字节数
+STREAM_MAX_LINE_BYTES = 4 * 1024 * 1024
+# 每处理多少个元素输出一次中间统计
+STREAM_STATISTICS_INTERVAL = 1000
+
 class FilterRequest(BaseModel):
     """过滤请求模型"""
     content: Any  # 可以是任何JSON结构
@@ -64,6 +71,100 @@ async def process_json_filter(request: Dict[str, Any]):
             error=f"处理失败: {str(e)}"
         )
 
+async def _iter_ndjson_elements(request: Request) -> AsyncIterator[Dict[str, Any]]:
+    """从请求体中逐行解析NDJSON元素，只缓存未完整的一行（每个数据块只扫描一次）"""
+    pending = bytearray()
+    line_number = 0
+    async for chunk in request.stream():
+        start = 0
+        newline = chunk.find(b"\n")
+        while newline != -1:
+            pending += chunk[start:newline]
+            line_number += 1
+            if pending.strip():
+                yield _parse_ndjson_element(pending, line_number)
+            pending.clear()
+            start = newline + 1
+            newline = chunk.find(b"\n", start)
+        pending += chunk[start:]
+        if len(pending) > STREAM_MAX_LINE_BYTES:
+            raise ValueError(f"第 {line_number + 1} 行超过 {STREAM_MAX_LINE_BYTES} 字节")
+    if pending.strip():
+        yield _parse_ndjson_element(pending, line_number + 1)
+
+
+def _parse_ndjson_element(line: bytearray, line_number: int) -> Dict[str, Any]:
+    try:
+        element = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"第 {line_number} 行不是合法的JSON: {str(e)}")
+    if not isinstance(element, dict) or not isinstance(element.get("text"), str):
+        raise ValueError(f"第 {line_number} 行缺少 text 字段")
+    return element
+
+
+def _ndjson_event(event: str, **fields: Any) -> bytes:
+    return (json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def _filter_ndjson_events(request: Request) -> AsyncIterator[bytes]:
+    """边读取请求体边逐个元素过滤，每产生一批结构化文本或统计就输出一个NDJSON事件"""
+    stream_filter = StreamingTenderFilter()
+    try:
+        logger.info("开始流式处理NDJSON过滤请求")
+        fragments = []
+        async for element in _iter_ndjson_elements(request):
+            fragments.extend(stream_filter.feed(element))
+            if stream_filter.original_content_count % STREAM_STATISTICS_INTERVAL == 0:
+                if fragments:
+                    yield _ndjson_event("text", text="".join(fragments))
+                    fragments = []
+                yield _ndjson_event("statistics", final=False, **stream_filter.statistics())
+        fragments.extend(stream_filter.finish())
+        if fragments:
+            yield _ndjson_event("text", text="".join(fragments))
+
+        statistics = stream_filter.statistics()
+        logger.info(f"NDJSON流式处理完成，元素数量: {statistics['original_content_count']}，"
+                    f"结构化文本长度: {statistics['structured_text_length']}")
+        yield _ndjson_event("statistics", final=True, **statistics)
+    except Exception as e:
+        logger.error(f"NDJSON流式处理失败: {str(e)}")
+        yield _ndjson_event("error", error=f"处理失败: {str(e)}")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """边读取请求体边输出的流式响应
+
+    StreamingResponse 输出期间会另起任务监听客户端断开（调用 receive），与响应生成器读取请求体争抢
+    同一个消息通道；此响应只顺序输出，不监听断开。客户端断开时读取请求体会抛出 ClientDisconnect，生成器随之结束。
+    """
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            if not isinstance(chunk, (bytes, memoryview)):
+                chunk = chunk.encode(self.charset)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/process/stream")
+async def process_json_filter_stream(request: Request):
+    """
+    流式处理NDJSON格式的元素流
+
+    请求体每行一个元素（如 {"type": "Title", "text": "# 第一章"}），可由流式解析器边解析边上传。
+    服务端边接收边过滤边输出，不缓存原始请求体，也不缓存过滤结果。响应为NDJSON：
+    - {"event": "text", "text": "..."}：结构化文本片段，按顺序拼接即完整的结构化文本
+    - {"event": "statistics", "final": false, ...}：每处理一批元素输出一次中间统计
+    - {"event": "statistics", "final": true, ...}：处理完成后的最终统计
+    - {"event": "error", "error": "..."}：处理失败，随后结束输出
+    """
+    return DuplexStreamingResponse(_filter_ndjson_events(request), media_type="application/x-ndjson")
+
 @router.get("/health")
 async def filter_health():
     """
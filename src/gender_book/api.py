@@ -9,16 +9,18 @@ import os
 import asyncio
 from datetime import datetime
 import sys
-from docx import Document
-from docx.shared import Inches
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from .tender_generator import BidProposalGenerator
 from .section_manager import SectionManager
+from .markdown_formatter import convert_to_markdown
+from .understanding_cache import understanding_cache
+from .generation_profiler import generation_stats
 # 导入现有的LLM服务
 from src.llm_service import LLMService
+from src.utils.docx_renderer import docx_renderer
 
 router = APIRouter(tags=["gender_book"])
 logger = logging.getLogger(__name__)
@@ -26,6 +28,9 @@ logger = logging.getLogger(__name__)
 # 任务状态存储
 task_status = {}
 
+# 生成文件的下载目录（项目根目录下的download）
+DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "download")
+
 class BidProposalGenerationRequest(BaseModel):
     """投标书生成请求模型"""
     tender_document_json: Dict[str, Any]
@@ -98,9 +103,8 @@ async def process_bid_proposal_generation_async(task_id: str, tender_document_js
             # 保存为多种格式的文档
             try:
                 # 确保download目录及子目录存在
-                base_download_dir = r"d:\Pyhton-learn\new\study\zhaobiaoshu\download"
-                word_dir = os.path.join(base_download_dir, "word")
-                markdown_dir = os.path.join(base_download_dir, "markdown")
+                word_dir = os.path.join(DOWNLOAD_DIR, "word")
+                markdown_dir = os.path.join(DOWNLOAD_DIR, "markdown")
                 
                 os.makedirs(word_dir, exist_ok=True)
                 os.makedirs(markdown_dir, exist_ok=True)
@@ -110,39 +114,12 @@ async def process_bid_proposal_generation_async(task_id: str, tender_document_js
                 base_filename = f"bid_proposal_{timestamp}"
                 
                 bid_content = result["bid_proposal"]
-                word_filepath = None
                 markdown_filepath = None
                 
-                # 1. 保存为Word文档
-                try:
-                    doc = Document()
-                    doc.add_heading('投标书', 0)
-                    
-                    if isinstance(bid_content, str):
-                        # 按段落分割内容
-                        paragraphs = bid_content.split('\n\n')
-                        for paragraph in paragraphs:
-                            if paragraph.strip():
-                                doc.add_paragraph(paragraph.strip())
-                    elif isinstance(bid_content, dict):
-                        # 如果是字典格式，按章节添加
-                        for section_title, section_content in bid_content.items():
-                            doc.add_heading(section_title, level=1)
-                            if isinstance(section_content, str):
-                                doc.add_paragraph(section_content)
-                            elif isinstance(section_content, list):
-                                for item in section_content:
-                                    doc.add_paragraph(str(item))
-                    
-                    word_filename = f"{base_filename}.docx"
-                    word_filepath = os.path.join(word_dir, word_filename)
-                    doc.save(word_filepath)
-                    logger.info(f"投标书已保存为Word文档: {word_filepath}")
-                    
-                except Exception as e:
-                    logger.error(f"保存Word文档失败: {str(e)}")
+                # Word文档在首次下载时由Markdown文件渲染生成
+                word_filepath = os.path.join(word_dir, f"{base_filename}.docx")
                 
-                # 2. 保存为Markdown文档
+                # 保存为Markdown文档
                 try:
                     markdown_filename = f"{base_filename}.md"
                     markdown_filepath = os.path.join(markdown_dir, markdown_filename)
@@ -157,6 +134,8 @@ async def process_bid_proposal_generation_async(task_id: str, tender_document_js
                     
                 except Exception as e:
                     logger.error(f"保存Markdown文档失败: {str(e)}")
+                    markdown_filepath = None
+                    word_filepath = None
                 
             except Exception as e:
                 logger.error(f"保存文档失败: {str(e)}")
@@ -173,6 +152,7 @@ async def process_bid_proposal_generation_async(task_id: str, tender_document_js
                 "word_filename": os.path.basename(word_filepath) if word_filepath else None,  # 使用文件名替代完整路径
                 "markdown_filename": os.path.basename(markdown_filepath) if markdown_filepath else None,  # 使用文件名替代完整路径
                 "statistics": result["statistics"],
+                "profile": result.get("profile", {}),
                 "section_plan": result.get("section_plan", {})
             }
             update_task_status(task_id, "completed", 100, "投标书生成完成", formatted_result)
@@ -229,9 +209,8 @@ async def process_bid_proposal_with_attachments_async(task_id: str, tender_docum
             # 保存为多种格式的文档
             try:
                 # 确保download目录及子目录存在
-                base_download_dir = r"d:\Pyhton-learn\new\study\zhaobiaoshu\download"
-                word_dir = os.path.join(base_download_dir, "word")
-                markdown_dir = os.path.join(base_download_dir, "markdown")
+                word_dir = os.path.join(DOWNLOAD_DIR, "word")
+                markdown_dir = os.path.join(DOWNLOAD_DIR, "markdown")
                 
                 os.makedirs(word_dir, exist_ok=True)
                 os.makedirs(markdown_dir, exist_ok=True)
@@ -241,39 +220,12 @@ async def process_bid_proposal_with_attachments_async(task_id: str, tender_docum
                 base_filename = f"bid_proposal_{timestamp}"
                 
                 bid_content = result["bid_proposal"]
-                word_filepath = None
                 markdown_filepath = None
                 
-                # 1. 保存为Word文档
-                try:
-                    doc = Document()
-                    doc.add_heading('投标书', 0)
-                    
-                    if isinstance(bid_content, str):
-                        # 按段落分割内容
-                        paragraphs = bid_content.split('\n\n')
-                        for paragraph in paragraphs:
-                            if paragraph.strip():
-                                doc.add_paragraph(paragraph.strip())
-                    elif isinstance(bid_content, dict):
-                        # 如果是字典格式，按章节添加
-                        for section_title, section_content in bid_content.items():
-                            doc.add_heading(section_title, level=1)
-                            if isinstance(section_content, str):
-                                doc.add_paragraph(section_content)
-                            elif isinstance(section_content, list):
-                                for item in section_content:
-                                    doc.add_paragraph(str(item))
-                    
-                    word_filename = f"{base_filename}.docx"
-                    word_filepath = os.path.join(word_dir, word_filename)
-                    doc.save(word_filepath)
-                    logger.info(f"投标书已保存为Word文档: {word_filepath}")
-                    
-                except Exception as e:
-                    logger.error(f"保存Word文档失败: {str(e)}")
+                # Word文档在首次下载时由Markdown文件渲染生成
+                word_filepath = os.path.join(word_dir, f"{base_filename}.docx")
                 
-                # 2. 保存为Markdown文档
+                # 保存为Markdown文档
                 try:
                     markdown_filename = f"{base_filename}.md"
                     markdown_filepath = os.path.join(markdown_dir, markdown_filename)
@@ -288,6 +240,8 @@ async def process_bid_proposal_with_attachments_async(task_id: str, tender_docum
                     
                 except Exception as e:
                     logger.error(f"保存Markdown文档失败: {str(e)}")
+                    markdown_filepath = None
+                    word_filepath = None
                 
             except Exception as e:
                 logger.error(f"保存文档失败: {str(e)}")
@@ -304,6 +258,7 @@ async def process_bid_proposal_with_attachments_async(task_id: str, tender_docum
                 "word_filename": os.path.basename(word_filepath) if word_filepath else None,  # 使用文件名替代完整路径
                 "markdown_filename": os.path.basename(markdown_filepath) if markdown_filepath else None,  # 使用文件名替代完整路径
                 "statistics": result["statistics"],
+                "profile": result.get("profile", {}),
                 "section_plan": result.get("section_plan", {})
             }
             update_task_status(task_id, "completed", 100, "投标书生成完成", formatted_result)
@@ -320,382 +275,13 @@ async def process_bid_proposal_with_attachments_async(task_id: str, tender_docum
         update_task_status(task_id, "failed", 0, "处理失败", None, str(e))
 
 def _convert_to_markdown(bid_content):
-    """将投标书内容转换为Markdown格式
-    
-    改进的markdown格式化功能：
-    1. 规范化标题层级
-    2. 避免重复的一级标题
-    3. 统一格式化处理
-    4. 清理多余空行
-    """
+    """将投标书内容转换为Markdown格式（规范标题层级、去除重复标题、清理多余空行）"""
     try:
-        import re
-        from datetime import datetime
-        
-        markdown_content = "# 投标书\n\n"
-        
-        if isinstance(bid_content, str):
-            # 字符串格式处理
-            markdown_content += _process_string_content(bid_content)
-                        
-        elif isinstance(bid_content, dict):
-            # 字典格式处理
-            markdown_content += _process_dict_content(bid_content)
-        else:
-            # 其他格式，转换为字符串处理
-            markdown_content += str(bid_content).strip() + "\n\n"
-            
-        # 清理格式
-        markdown_content = _clean_markdown_format(markdown_content)
-        
-        # 添加生成时间信息
-        markdown_content += "\n---\n\n"
-        markdown_content += f"*本投标书由系统自动生成，生成时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}*\n"
-        
-        return markdown_content
-        
+        return convert_to_markdown(bid_content)
     except Exception as e:
         logger.error(f"转换Markdown格式失败: {str(e)}")
         return f"# 投标书\n\n转换失败：{str(e)}\n\n{str(bid_content)}"
 
-
-def _process_string_content(content):
-    """处理字符串格式的投标书内容，优化标题处理"""
-    import re
-    
-    result = ""
-    paragraphs = content.split('\n\n')
-    seen_titles = set()
-    
-    for paragraph in paragraphs:
-        if not paragraph.strip():
-            continue
-            
-        paragraph = paragraph.strip()
-        
-        # 跳过重复的"投标书"标题和其他重复标题
-        if paragraph in ["# 投标书", "投标书"] or paragraph.endswith(" 投标书"):
-            continue
-        
-        # 处理已有的markdown标题
-        if paragraph.startswith('#'):
-            # 规范化标题格式
-            title_level = len(paragraph) - len(paragraph.lstrip('#'))
-            title_text = paragraph.lstrip('#').strip()
-            
-            if title_text:
-                # 标准化标题
-                normalized_title = _normalize_title(title_text)
-                
-                # 跳过重复标题
-                if _is_duplicate_title(normalized_title, seen_titles):
-                    continue
-                
-                # 验证和调整标题层级
-                validated_level = _validate_title_level(normalized_title, title_level)
-                # 确保不超过4级标题，一级标题改为二级
-                if validated_level == 1:
-                    validated_level = 2
-                validated_level = min(validated_level, 4)
-                
-                seen_titles.add(normalized_title)
-                result += f"{'#' * validated_level} {normalized_title}\n\n"
-        
-        # 检测可能的章节标题
-        elif _is_chapter_title(paragraph):
-            title = _clean_title_text(paragraph)
-            if title:
-                normalized_title = _normalize_title(title)
-                
-                # 跳过重复标题
-                if not _is_duplicate_title(normalized_title, seen_titles):
-                    seen_titles.add(normalized_title)
-                    result += f"## {normalized_title}\n\n"
-        
-        # 检测可能的子标题
-        elif _is_sub_title(paragraph):
-            title = _clean_title_text(paragraph)
-            if title:
-                normalized_title = _normalize_title(title)
-                
-                # 跳过重复标题
-                if not _is_duplicate_title(normalized_title, seen_titles):
-                    seen_titles.add(normalized_title)
-                    result += f"### {normalized_title}\n\n"
-        
-        else:
-            # 普通段落
-            result += paragraph + "\n\n"
-    
-    return result
-
-
-def _process_dict_content(content_dict):
-    """处理字典格式的投标书内容"""
-    result = ""
-    
-    # 预定义的章节顺序
-    section_order = [
-        "基本信息", "项目理解", "第一章 投标人基本情况", "第二章 资格条件响应",
-        "第三章 技术方案", "第四章 项目管理方案", "第五章 商务方案", 
-        "第六章 售后服务方案", "第七章 其他"
-    ]
-    
-    # 按预定义顺序处理章节
-    processed_sections = set()
-    
-    for section_key in section_order:
-        if section_key in content_dict:
-            result += _format_section(section_key, content_dict[section_key])
-            processed_sections.add(section_key)
-    
-    # 处理剩余章节
-    for section_title, section_content in content_dict.items():
-        if section_title not in processed_sections:
-            result += _format_section(section_title, section_content)
-    
-    return result
-
-
-def _format_section(title, content):
-    """格式化单个章节"""
-    result = f"## {title}\n\n"
-    
-    if isinstance(content, str):
-        # 处理字符串内容中的子标题
-        lines = content.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if _is_sub_title(line):
-                clean_title = _clean_title_text(line)
-                if clean_title:
-                    result += f"### {clean_title}\n\n"
-            else:
-                result += line + "\n"
-        result += "\n"
-        
-    elif isinstance(content, list):
-        for item in content:
-            if isinstance(item, str) and item.strip():
-                result += f"- {item.strip()}\n"
-        result += "\n"
-    else:
-        result += str(content).strip() + "\n\n"
-    
-    return result
-
-
-def _is_chapter_title(text):
-    """判断是否为章节标题，更精确的匹配"""
-    import re
-    
-    text = text.strip()
-    
-    # 黑名单关键词 - 这些不应该被识别为章节标题
-    blacklist_keywords = [
-        '详见', '如下', '包括', '具体', '说明', '要求', '标准', '规范',
-        '附件', '附录', '备注', '注意', '提醒', '温馨提示'
-    ]
-    
-    # 检查黑名单
-    for keyword in blacklist_keywords:
-        if keyword in text:
-            return False
-    
-    # 长度检查 - 太短或太长的文本不太可能是标题
-    if len(text) < 2 or len(text) > 50:
-        return False
-    
-    # 章节标题模式（更严格）
-    chapter_patterns = [
-        r'^第[一二三四五六七八九十\d]+章[\s：:].{2,30}$',  # 第X章 标题（限制长度）
-        r'^[一二三四五六七八九十]、.{2,30}$',  # 一、标题
-        r'^\d+[、.]\s*.{2,30}$',  # 1. 标题 或 1、标题
-        r'^\d+\.\d+[\s：:].{2,30}$',  # 1.1 标题
-        r'^.{2,20}[：:]$',  # 以冒号结尾的标题（限制长度）
-    ]
-    
-    for pattern in chapter_patterns:
-        if re.match(pattern, text):
-            return True
-    
-    # 特定关键词（更精确匹配）
-    title_keywords = [
-        '基本信息', '项目理解', '技术方案', '商务方案', '服务方案', 
-        '资格条件', '项目管理', '质量保证', '进度安排', '人员配置',
-        '设备配置', '安全措施', '环保措施', '售后服务'
-    ]
-    
-    # 关键词匹配需要更严格的条件
-    for keyword in title_keywords:
-        if keyword in text:
-            # 确保关键词不是在句子中间
-            if text.startswith(keyword) or text.endswith(keyword):
-                return True
-            # 或者关键词前后有标点符号
-            if re.search(f'[^\\w]{keyword}[^\\w]', text):
-                return True
-    
-    return False
-
-
-def _is_sub_title(text):
-    """判断是否为子标题"""
-    import re
-    
-    # 子标题模式
-    sub_patterns = [
-        r'^\d+\.\d+\.\d+\s+.+',  # 1.1.1 标题
-        r'^\([一二三四五六七八九十\d]+\)\s*.+',  # (1) 标题
-        r'^[①②③④⑤⑥⑦⑧⑨⑩]\s*.+',  # ① 标题
-    ]
-    
-    for pattern in sub_patterns:
-        if re.match(pattern, text.strip()):
-            return True
-    
-    return False
-
-
-def _clean_title_text(text):
-    """清理标题文本"""
-    import re
-    
-    # 移除标题标记
-    text = re.sub(r'^#+\s*', '', text)  # 移除markdown标记
-    text = re.sub(r'^第[一二三四五六七八九十\d]+章\s*', '', text)  # 移除章节标记
-    text = re.sub(r'^[一二三四五六七八九十\d]+[、.]\s*', '', text)  # 移除序号
-    text = re.sub(r'^\d+\.\d+\.?\s*', '', text)  # 移除数字序号
-    text = re.sub(r'^\([一二三四五六七八九十\d]+\)\s*', '', text)  # 移除括号序号
-    text = re.sub(r'^[①②③④⑤⑥⑦⑧⑨⑩]\s*', '', text)  # 移除圆圈序号
-    text = text.rstrip('：:').strip()  # 移除结尾冒号
-    
-    return text.strip()
-
-
-def _normalize_title(title):
-    """标准化标题格式"""
-    import re
-    
-    # 移除多余空白
-    title = re.sub(r'\s+', ' ', title.strip())
-    
-    # 移除重复的标点符号
-    title = re.sub(r'[：:]{2,}', '：', title)
-    title = re.sub(r'[。.]{2,}', '。', title)
-    
-    # 统一标点符号
-    title = title.replace(':', '：')
-    
-    return title
-
-
-def _is_duplicate_title(title, seen_titles):
-    """检查是否为重复标题"""
-    normalized = _normalize_title(title)
-    
-    # 检查完全相同的标题
-    if normalized in seen_titles:
-        return True
-    
-    # 检查相似标题（去除标点后比较）
-    import re
-    clean_title = re.sub(r'[^\w\s]', '', normalized)
-    for seen in seen_titles:
-        clean_seen = re.sub(r'[^\w\s]', '', seen)
-        if clean_title == clean_seen and clean_title:
-            return True
-    
-    return False
-
-
-def _validate_title_level(title, level):
-    """验证标题层级是否合理"""
-    import re
-    
-    # 一级标题关键词
-    level1_keywords = ['投标书', '技术方案', '商务方案', '项目管理方案', '售后服务方案']
-    
-    # 二级标题关键词
-    level2_keywords = ['基本信息', '项目理解', '资格条件', '技术要求', '服务承诺']
-    
-    # 检查是否包含章节标记
-    if re.search(r'第[一二三四五六七八九十\d]+章', title):
-        return min(level, 2)  # 章节标题最多为二级
-    
-    # 根据关键词调整级别
-    for keyword in level1_keywords:
-        if keyword in title:
-            return 2  # 主要章节为二级标题
-    
-    for keyword in level2_keywords:
-        if keyword in title:
-            return 3  # 子章节为三级标题
-    
-    # 限制最大层级
-    return min(level, 4)
-
-
-def _clean_markdown_format(content):
-    """清理markdown格式，消除标题重复和层级混乱"""
-    import re
-    
-    lines = content.split('\n')
-    cleaned_lines = []
-    seen_titles = set()
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # 跳过空行
-        if not line:
-            # 避免连续空行
-            if cleaned_lines and cleaned_lines[-1] != '':
-                cleaned_lines.append('')
-            i += 1
-            continue
-        
-        # 处理markdown标题
-        title_match = re.match(r'^(#{1,6})\s+(.+)$', line)
-        if title_match:
-            level = len(title_match.group(1))
-            title_text = title_match.group(2).strip()
-            
-            # 标准化标题
-            normalized_title = _normalize_title(title_text)
-            
-            # 跳过重复标题
-            if _is_duplicate_title(normalized_title, seen_titles):
-                i += 1
-                continue
-            
-            # 验证和调整标题层级
-            validated_level = _validate_title_level(normalized_title, level)
-            
-            # 添加标题
-            if normalized_title:
-                seen_titles.add(normalized_title)
-                # 确保标题前有空行（除非是第一行）
-                if cleaned_lines and cleaned_lines[-1] != '':
-                    cleaned_lines.append('')
-                cleaned_lines.append(f"{'#' * validated_level} {normalized_title}")
-                cleaned_lines.append('')  # 标题后空行
-        else:
-            # 普通内容行
-            cleaned_lines.append(line)
-        
-        i += 1
-    
-    # 清理结尾多余空行
-    while cleaned_lines and cleaned_lines[-1] == '':
-        cleaned_lines.pop()
-    
-    return '\n'.join(cleaned_lines)
-
 @router.post("/generate_from_json", response_model=BidProposalGenerationResponse, 
             summary="从招标文件JSON生成投标书", description="上传经过filter.py处理的招标文件JSON数据，生成完整投标书")
 async def generate_bid_proposal_from_json(
@@ -876,6 +462,44 @@ async def delete_task(task_id: str):
         logger.error(f"删除任务失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"删除任务失败: {str(e)}")
 
+@router.get("/stats", summary="获取LLM调用统计", description="按章节和提供商汇总LLM调用的耗时、调用前准备耗时和token用量")
+async def get_generation_stats():
+    """获取LLM调用统计，章节按总耗时降序排列"""
+    try:
+        return {
+            "success": True,
+            "data": generation_stats.snapshot()
+        }
+    except Exception as e:
+        logger.error(f"获取调用统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取调用统计失败: {str(e)}")
+
+@router.get("/cache", summary="获取项目理解缓存统计", description="获取项目理解缓存的命中统计")
+async def get_understanding_cache_statistics():
+    """获取项目理解缓存统计"""
+    try:
+        return {
+            "success": True,
+            "data": understanding_cache.get_statistics()
+        }
+    except Exception as e:
+        logger.error(f"获取缓存统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取缓存统计失败: {str(e)}")
+
+@router.delete("/cache", summary="清除项目理解缓存", description="按招标文件哈希清除缓存，不指定时清除全部缓存")
+async def invalidate_understanding_cache(tender_hash: Optional[str] = None):
+    """清除项目理解缓存"""
+    try:
+        removed = understanding_cache.invalidate(tender_hash)
+        return {
+            "success": True,
+            "message": f"已清除{removed}条缓存",
+            "removed": removed
+        }
+    except Exception as e:
+        logger.error(f"清除缓存失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"清除缓存失败: {str(e)}")
+
 @router.post("/analyze_json", summary="分析JSON内容", description="分析JSON内容并返回章节计划，不生成具体内容")
 async def analyze_json_content(request: Dict[str, Any]):
     """分析JSON内容"""
@@ -1055,21 +679,30 @@ async def download_file(file_type: str, filename: str):
             raise HTTPException(status_code=400, detail="不支持的文件类型")
         
         # 构建文件路径
-        base_download_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "download")
-        file_dir = os.path.join(base_download_dir, file_type)
+        file_dir = os.path.join(DOWNLOAD_DIR, file_type)
         file_path = os.path.join(file_dir, filename)
         
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="文件不存在")
-        
         # 检查文件是否在允许的目录内（安全检查）
         if not os.path.abspath(file_path).startswith(os.path.abspath(file_dir)):
             raise HTTPException(status_code=403, detail="访问被拒绝")
         
+        # Word文档在首次下载时由同名Markdown文件渲染生成
+        if file_type == "word" and filename.endswith(".docx") and not os.path.exists(file_path):
+            markdown_path = os.path.join(DOWNLOAD_DIR, "markdown", os.path.splitext(filename)[0] + ".md")
+            try:
+                await docx_renderer.ensure_docx(markdown_path, file_path)
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="文件不存在")
+        
+        # 检查文件是否存在
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="文件不存在")
+        
         # 设置媒体类型
         media_type = "application/octet-stream"
         if file_type == "word":
+            if not filename.endswith(".docx"):
+                raise HTTPException(status_code=400, detail="Word文件必须以.docx结尾")
             media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         elif file_type == "markdown":
             media_type = "text/markdown"
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+附件正则模式库
+
+功能说明：
+- 集中定义营业执照、资质证书、许可证、财务报表、授权书等附件的关键词与字段正则
+- 在模块加载时一次性预编译所有字段、验证和关键词模式
+- 将所有字段标签合并为一个扫描器，单次遍历文本即可同时完成分类和关键信息提取
+- 提取结果与逐条 re.search / re.findall 的结果保持一致
+"""
+
+import re
+from typing import Any, Dict, List, Pattern, Tuple
+
+# 增强的正则模式库
+ENHANCED_PATTERNS = {
+    "营业执照": {
+        "keywords": ["营业执照", "Business License", "统一社会信用代码", "Credit Code"],
+        "critical_fields": [
+            (r"(?:企业名称|公司名称|Company Name)[：:\s]*([^\n\r]+)", "企业名称"),
+            (r"(?:统一社会信用代码|Credit Code)[：:\s]*([A-Z0-9]{18})", "信用代码"),
+            (r"(?:注册资本|Registered Capital)[：:\s]*([^\n\r]+)", "注册资本"),
+            (r"(?:成立日期|Establishment Date)[：:\s]*(\d{4}[年-]\d{1,2}[月-]\d{1,2})", "成立日期"),
+            (r"(?:营业期限|Business Term)[：:\s]*([^\n\r]+)", "营业期限"),
+            (r"(?:法定代表人|Legal Representative)[：:\s]*([^\n\r]+)", "法定代表人")
+        ],
+        "validation_rules": [
+            (r"[A-Z0-9]{18}", "信用代码格式检查"),
+            (r"\d{4}[年-]\d{1,2}[月-]\d{1,2}", "日期格式检查")
+        ]
+    },
+    "建筑资质证书": {
+        "keywords": ["建筑业企业资质", "Construction Qualification", "资质证书"],
+        "critical_fields": [
+            (r"(?:证书编号|Certificate No)[：:\s]*([^\n\r]+)", "证书编号"),
+            (r"(?:资质等级|Qualification Level)[：:\s]*([^\n\r]+)", "资质等级"),
+            (r"(?:资质类别|Qualification Type)[：:\s]*([^\n\r]+)", "资质类别"),
+            (r"(?:有效期至|Valid Until)[：:\s]*(\d{4}[年-]\d{1,2}[月-]\d{1,2})", "有效期"),
+            (r"(?:发证机关|Issuing Authority)[：:\s]*([^\n\r]+)", "发证机关")
+        ]
+    },
+    "安全生产许可证": {
+        "keywords": ["安全生产许可证", "Safety Production License"],
+        "critical_fields": [
+            (r"(?:许可证编号|License No)[：:\s]*([^\n\r]+)", "许可证编号"),
+            (r"(?:有效期至|Valid Until)[：:\s]*(\d{4}[年-]\d{1,2}[月-]\d{1,2})", "有效期"),
+            (r"(?:发证机关|Issuing Authority)[：:\s]*([^\n\r]+)", "发证机关")
+        ]
+    },
+    "财务报表": {
+        "keywords": ["资产负债表", "Balance Sheet", "利润表", "Income Statement"],
+        "critical_fields": [
+            (r"(?:总资产|Total Assets)[：:\s]*([0-9,，.]+)", "总资产"),
+            (r"(?:净资产|Net Assets)[：:\s]*([0-9,，.]+)", "净资产"),
+            (r"(?:营业收入|Revenue)[：:\s]*([0-9,，.]+)", "营业收入"),
+            (r"(?:净利润|Net Profit)[：:\s]*([0-9,，.]+)", "净利润"),
+            (r"(\d{4})年度", "报表年度")
+        ]
+    },
+    "法人授权书": {
+        "keywords": ["法人授权", "Legal Authorization", "授权委托书", "Power of Attorney"],
+        "critical_fields": [
+            (r"(?:法定代表人|Legal Representative)[：:\s]*([^\n\r]+)", "法定代表人"),
+            (r"(?:被授权人|Authorized Person)[：:\s]*([^\n\r]+)", "被授权人"),
+            (r"(?:授权范围|Authorization Scope)[：:\s]*([^\n\r]+)", "授权范围"),
+            (r"(?:有效期|Valid Period)[：:\s]*([^\n\r]+)", "有效期")
+        ]
+    }
+}
+
+# 字段正则统一使用的匹配标志（字段值均不含 "."，DOTALL 对结果无影响）
+FIELD_FLAGS = re.IGNORECASE | re.DOTALL
+
+# 以 "(?:标签1|标签2)" 开头的字段正则，用于抽取标签
+_LABEL_PREFIX = re.compile(r"^\(\?:([^()\\\[\]]+)\)")
+
+# IGNORECASE 下可与 ASCII 字母互相匹配、但 str.lower() 无法对齐的字符
+_CASE_FOLD_EXCEPTIONS = re.compile("[\u0130\u0131\u017f]")
+
+
+def _build_scanner(words: List[str], flags: int = 0) -> Pattern:
+    """构建字面量扫描器，按长度降序排列以在每个位置取最长匹配"""
+    ordered = sorted(set(words), key=len, reverse=True)
+    return re.compile("|".join(re.escape(w) for w in ordered), flags)
+
+
+def _iter_matches(scanner: Pattern, text: str):
+    """逐个位置查找匹配（允许匹配重叠），每个起始位置返回最长的词"""
+    match = scanner.search(text)
+    while match:
+        yield match.start(), match.group()
+        match = scanner.search(text, match.start() + 1)
+
+
+def _prefix_closure(words: List[str], normalize) -> Dict[str, List[str]]:
+    """计算每个词在扫描命中时应同时视为命中的词（自身及其所有前缀词）"""
+    closure = {}
+    for word in words:
+        key = normalize(word)
+        closure[key] = [w for w in words if key.startswith(normalize(w))]
+    return closure
+
+
+class AttachmentPatternLibrary:
+    """预编译的附件模式库
+
+    将各文档类型的关键词、字段正则和验证规则在初始化时编译一次，
+    并合并为关键词扫描器和字段标签扫描器。scan() 单次遍历文本，
+    返回的结果可同时用于分类（classify）和关键信息提取（extract）。
+    """
+
+    def __init__(self, patterns: Dict[str, Dict[str, Any]]):
+        self.patterns = patterns
+
+        # 去重后的字段正则（不同文档类型共享相同正则时只执行一次）
+        self.field_sources: List[str] = []
+        self.field_regexes: List[Pattern] = []
+        field_index: Dict[str, int] = {}
+
+        # 每种文档类型: [(字段正则序号, 字段名)]
+        self.type_fields: Dict[str, List[Tuple[int, str]]] = {}
+        self.type_keywords: Dict[str, List[str]] = {}
+        self.validation_rules: Dict[str, List[Tuple[Pattern, str]]] = {}
+
+        for doc_type, config in patterns.items():
+            fields = []
+            for pattern, field_name in config["critical_fields"]:
+                if pattern not in field_index:
+                    field_index[pattern] = len(self.field_sources)
+                    self.field_sources.append(pattern)
+                    self.field_regexes.append(re.compile(pattern, FIELD_FLAGS))
+                fields.append((field_index[pattern], field_name))
+            self.type_fields[doc_type] = fields
+            self.type_keywords[doc_type] = list(config["keywords"])
+            self.validation_rules[doc_type] = [
+                (re.compile(pattern), rule_name)
+                for pattern, rule_name in config.get("validation_rules", [])
+            ]
+
+        # 关键词扫描器（区分大小写，与 `keyword in text` 语义一致）
+        all_keywords = [kw for kws in self.type_keywords.values() for kw in kws]
+        self._keyword_scanner = _build_scanner(all_keywords)
+        self._keyword_closure = _prefix_closure(list(set(all_keywords)), lambda w: w)
+
+        # 字段标签扫描器（忽略大小写）；无标签前缀的正则单独整体匹配
+        label_to_fields: Dict[str, List[int]] = {}
+        self._free_fields: List[int] = []
+        for idx, source in enumerate(self.field_sources):
+            match = _LABEL_PREFIX.match(source)
+            if not match:
+                self._free_fields.append(idx)
+                continue
+            for label in match.group(1).split("|"):
+                label_to_fields.setdefault(label.lower(), []).append(idx)
+
+        # 扫描器只负责定位候选位置，最终由字段正则在原文上确认。
+        # 默认在 lower() 后的文本上做字面量扫描，比 IGNORECASE 交替快一个数量级；
+        # 文本含特殊大小写字符时退回 IGNORECASE 扫描器。
+        labels = list(label_to_fields.keys())
+        self._label_scanner = _build_scanner(labels)
+        self._label_scanner_ci = _build_scanner(labels, re.IGNORECASE)
+        self._label_fields: Dict[str, List[int]] = {}
+        for key, prefixes in _prefix_closure(labels, str.lower).items():
+            indexes = sorted({i for label in prefixes for i in label_to_fields[label]})
+            self._label_fields[key] = indexes
+        self._all_label_fields = sorted({i for idxs in label_to_fields.values() for i in idxs})
+
+    def scan(self, text: str) -> Dict[str, Any]:
+        """单次遍历文本，收集命中的关键词和每个字段正则的全部匹配值
+
+        字段匹配结果与对每个正则执行 re.findall 的结果相同。
+        """
+        keywords_found = set()
+        for _, keyword in _iter_matches(self._keyword_scanner, text):
+            keywords_found.update(self._keyword_closure[keyword])
+
+        lowered = text.lower()
+        if len(lowered) == len(text) and not _CASE_FOLD_EXCEPTIONS.search(text):
+            label_matches = _iter_matches(self._label_scanner, lowered)
+        else:
+            label_matches = _iter_matches(self._label_scanner_ci, text)
+
+        field_values: List[List[str]] = [[] for _ in self.field_regexes]
+        last_end = [0] * len(self.field_regexes)
+        for pos, label in label_matches:
+            candidates = self._label_fields.get(label.lower(), self._all_label_fields)
+            for idx in candidates:
+                # findall 的匹配互不重叠，跳过落在上一次匹配范围内的位置
+                if pos < last_end[idx]:
+                    continue
+                field_match = self.field_regexes[idx].match(text, pos)
+                if field_match:
+                    field_values[idx].append(field_match.group(1))
+                    last_end[idx] = field_match.end()
+
+        for idx in self._free_fields:
+            field_values[idx] = self.field_regexes[idx].findall(text)
+
+        return {"keywords": keywords_found, "fields": field_values}
+
+    def classify(self, scan_result: Dict[str, Any]) -> Dict[str, Any]:
+        """根据扫描结果进行文档分类（带置信度）"""
+        max_confidence = 0
+        best_type = "其他文件"
+        keyword_matches = {}
+        keywords_found = scan_result["keywords"]
+        field_values = scan_result["fields"]
+
+        for doc_type, keywords in self.type_keywords.items():
+            matches = sum(1 for keyword in keywords if keyword in keywords_found)
+            match_ratio = matches / len(keywords)
+
+            fields = self.type_fields[doc_type]
+            field_matches = sum(1 for idx, _ in fields if field_values[idx])
+            field_ratio = field_matches / len(fields)
+
+            # 综合置信度 = 关键词匹配度 * 0.4 + 字段匹配度 * 0.6
+            confidence = match_ratio * 0.4 + field_ratio * 0.6
+
+            keyword_matches[doc_type] = {
+                "keyword_matches": matches,
+                "field_matches": field_matches,
+                "confidence": confidence
+            }
+
+            if confidence > max_confidence:
+                max_confidence = confidence
+                best_type = doc_type
+
+        return {
+            "type": best_type,
+            "confidence": max_confidence,
+            "analysis": keyword_matches
+        }
+
+    def extract(self, scan_result: Dict[str, Any], doc_type: str) -> Dict[str, str]:
+        """返回指定文档类型每个字段的原始匹配值（取最长的匹配结果）"""
+        raw_values = {}
+        field_values = scan_result["fields"]
+
+        for idx, field_name in self.type_fields.get(doc_type, []):
+            matches = field_values[idx]
+            if matches:
+                raw_values[field_name] = max(matches, key=len)
+
+        return raw_values
+
+
+# 模块加载时编译一次的全局模式库
+pattern_library = AttachmentPatternLibrary(ENHANCED_PATTERNS)
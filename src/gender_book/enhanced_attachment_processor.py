@@ -12,70 +12,25 @@ import tempfile
 import aiofiles
 import logging
 from fastapi import UploadFile
+from .attachment_patterns import ENHANCED_PATTERNS, pattern_library
 
 logger = logging.getLogger(__name__)
 
+# 提取值清理用的预编译正则
+_WHITESPACE_RE = re.compile(r'\s+')
+_EDGE_SEPARATOR_RE = re.compile(r'^[：:\-\s]+|[：:\-\s]+$')
+
 class EnhancedAttachmentProcessor:
+    # 类加载时编译一次的模式库，分类与提取共用一次文本扫描
+    pattern_library = pattern_library
+    
     def __init__(self):
         # 使用项目现有的Parser技术
         self.document_service = get_document_service()
         self.document_parser = DocumentParser()
         
-        # 增强的正则模式库
-        self.enhanced_patterns = {
-            "营业执照": {
-                "keywords": ["营业执照", "Business License", "统一社会信用代码", "Credit Code"],
-                "critical_fields": [
-                    (r"(?:企业名称|公司名称|Company Name)[：:\s]*([^\n\r]+)", "企业名称"),
-                    (r"(?:统一社会信用代码|Credit Code)[：:\s]*([A-Z0-9]{18})", "信用代码"),
-                    (r"(?:注册资本|Registered Capital)[：:\s]*([^\n\r]+)", "注册资本"),
-                    (r"(?:成立日期|Establishment Date)[：:\s]*(\d{4}[年-]\d{1,2}[月-]\d{1,2})", "成立日期"),
-                    (r"(?:营业期限|Business Term)[：:\s]*([^\n\r]+)", "营业期限"),
-                    (r"(?:法定代表人|Legal Representative)[：:\s]*([^\n\r]+)", "法定代表人")
-                ],
-                "validation_rules": [
-                    (r"[A-Z0-9]{18}", "信用代码格式检查"),
-                    (r"\d{4}[年-]\d{1,2}[月-]\d{1,2}", "日期格式检查")
-                ]
-            },
-            "建筑资质证书": {
-                "keywords": ["建筑业企业资质", "Construction Qualification", "资质证书"],
-                "critical_fields": [
-                    (r"(?:证书编号|Certificate No)[：:\s]*([^\n\r]+)", "证书编号"),
-                    (r"(?:资质等级|Qualification Level)[：:\s]*([^\n\r]+)", "资质等级"),
-                    (r"(?:资质类别|Qualification Type)[：:\s]*([^\n\r]+)", "资质类别"),
-                    (r"(?:有效期至|Valid Until)[：:\s]*(\d{4}[年-]\d{1,2}[月-]\d{1,2})", "有效期"),
-                    (r"(?:发证机关|Issuing Authority)[：:\s]*([^\n\r]+)", "发证机关")
-                ]
-            },
-            "安全生产许可证": {
-                "keywords": ["安全生产许可证", "Safety Production License"],
-                "critical_fields": [
-                    (r"(?:许可证编号|License No)[：:\s]*([^\n\r]+)", "许可证编号"),
-                    (r"(?:有效期至|Valid Until)[：:\s]*(\d{4}[年-]\d{1,2}[月-]\d{1,2})", "有效期"),
-                    (r"(?:发证机关|Issuing Authority)[：:\s]*([^\n\r]+)", "发证机关")
-                ]
-            },
-            "财务报表": {
-                "keywords": ["资产负债表", "Balance Sheet", "利润表", "Income Statement"],
-                "critical_fields": [
-                    (r"(?:总资产|Total Assets)[：:\s]*([0-9,，.]+)", "总资产"),
-                    (r"(?:净资产|Net Assets)[：:\s]*([0-9,，.]+)", "净资产"),
-                    (r"(?:营业收入|Revenue)[：:\s]*([0-9,，.]+)", "营业收入"),
-                    (r"(?:净利润|Net Profit)[：:\s]*([0-9,，.]+)", "净利润"),
-                    (r"(\d{4})年度", "报表年度")
-                ]
-            },
-            "法人授权书": {
-                "keywords": ["法人授权", "Legal Authorization", "授权委托书", "Power of Attorney"],
-                "critical_fields": [
-                    (r"(?:法定代表人|Legal Representative)[：:\s]*([^\n\r]+)", "法定代表人"),
-                    (r"(?:被授权人|Authorized Person)[：:\s]*([^\n\r]+)", "被授权人"),
-                    (r"(?:授权范围|Authorization Scope)[：:\s]*([^\n\r]+)", "授权范围"),
-                    (r"(?:有效期|Valid Period)[：:\s]*([^\n\r]+)", "有效期")
-                ]
-            }
-        }
+        # 增强的正则模式库（原始定义，预编译版本见 pattern_library）
+        self.enhanced_patterns = ENHANCED_PATTERNS
     
     async def process_attachment_with_parser(self, file_path: str, filename: str) -> Dict[str, Any]:
         """使用Parser模块进行高质量文档处理"""
@@ -97,16 +52,19 @@ class EnhancedAttachmentProcessor:
             elements = parse_result['data']['elements']
             extracted_text = self._extract_text_from_elements(elements)
             
-            # 3. 智能文档分类
-            doc_type = self._classify_document_with_confidence(extracted_text)
+            # 3. 单次扫描文本，分类和提取共用扫描结果
+            scan_result = self.pattern_library.scan(extracted_text)
+            
+            # 4. 智能文档分类
+            doc_type = self._classify_document_with_confidence(extracted_text, scan_result)
             
-            # 4. 使用增强正则提取关键信息
-            key_info = self._extract_enhanced_key_info(extracted_text, doc_type)
+            # 5. 使用增强正则提取关键信息
+            key_info = self._extract_enhanced_key_info(extracted_text, doc_type, scan_result)
             
-            # 5. 验证关键信息完整性
+            # 6. 验证关键信息完整性
             validation_result = self._validate_extracted_info(key_info, doc_type)
             
-            # 6. 处理原始图像数据（如果是图像文件）
+            # 7. 处理原始图像数据（如果是图像文件）
             image_data = None
             if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.tiff', '.bmp')):
                 # 在文件被删除前读取图像数据
@@ -262,62 +220,24 @@ class EnhancedAttachmentProcessor:
                 text_parts.append(element['text'])
         return '\n'.join(text_parts)
     
-    def _classify_document_with_confidence(self, text: str) -> Dict[str, Any]:
+    def _classify_document_with_confidence(self, text: str, scan_result: Dict[str, Any] = None) -> Dict[str, Any]:
         """智能文档分类（带置信度）"""
-        max_confidence = 0
-        best_type = "其他文件"
-        keyword_matches = {}
-        
-        for doc_type, config in self.enhanced_patterns.items():
-            # 计算关键词匹配度
-            keywords = config["keywords"]
-            matches = sum(1 for keyword in keywords if keyword in text)
-            match_ratio = matches / len(keywords)
-            
-            # 检查关键字段匹配
-            field_matches = 0
-            for pattern, field_name in config["critical_fields"]:
-                if re.search(pattern, text, re.IGNORECASE):
-                    field_matches += 1
-            
-            field_ratio = field_matches / len(config["critical_fields"])
-            
-            # 综合置信度 = 关键词匹配度 * 0.4 + 字段匹配度 * 0.6
-            confidence = match_ratio * 0.4 + field_ratio * 0.6
-            
-            keyword_matches[doc_type] = {
-                "keyword_matches": matches,
-                "field_matches": field_matches,
-                "confidence": confidence
-            }
-            
-            if confidence > max_confidence:
-                max_confidence = confidence
-                best_type = doc_type
-        
-        return {
-            "type": best_type,
-            "confidence": max_confidence,
-            "analysis": keyword_matches
-        }
+        if scan_result is None:
+            scan_result = self.pattern_library.scan(text)
+        return self.pattern_library.classify(scan_result)
     
-    def _extract_enhanced_key_info(self, text: str, doc_classification: Dict) -> Dict[str, str]:
+    def _extract_enhanced_key_info(self, text: str, doc_classification: Dict,
+                                   scan_result: Dict[str, Any] = None) -> Dict[str, str]:
         """使用增强正则提取关键信息"""
-        key_info = {}
-        doc_type = doc_classification["type"]
-        
-        if doc_type in self.enhanced_patterns:
-            patterns = self.enhanced_patterns[doc_type]["critical_fields"]
-            
-            for pattern, field_name in patterns:
-                # 多次尝试匹配，提高成功率
-                matches = re.findall(pattern, text, re.IGNORECASE | re.DOTALL)
-                if matches:
-                    # 取最长的匹配结果（通常最完整）
-                    best_match = max(matches, key=len) if isinstance(matches[0], str) else matches[0]
-                    key_info[field_name] = self._clean_extracted_value(best_match)
+        if scan_result is None:
+            scan_result = self.pattern_library.scan(text)
         
-        return key_info
+        # 取最长的匹配结果（通常最完整）
+        raw_values = self.pattern_library.extract(scan_result, doc_classification["type"])
+        return {
+            field_name: self._clean_extracted_value(value)
+            for field_name, value in raw_values.items()
+        }
     
     def _clean_extracted_value(self, value: str) -> str:
         """清理提取的值"""
@@ -325,9 +245,9 @@ class EnhancedAttachmentProcessor:
             return ""
         
         # 去除多余空白
-        cleaned = re.sub(r'\s+', ' ', value).strip()
+        cleaned = _WHITESPACE_RE.sub(' ', value).strip()
         # 去除常见的分隔符
-        cleaned = re.sub(r'^[：:\-\s]+|[：:\-\s]+$', '', cleaned)
+        cleaned = _EDGE_SEPARATOR_RE.sub('', cleaned)
         
         return cleaned
     
@@ -352,10 +272,9 @@ class EnhancedAttachmentProcessor:
             validation["confidence_score"] = completeness
             
             # 格式验证（如果有验证规则）
-            if "validation_rules" in self.enhanced_patterns[doc_type]:
-                for pattern, rule_name in self.enhanced_patterns[doc_type]["validation_rules"]:
-                    # 验证逻辑可以进一步扩展
-                    pass
+            for pattern, rule_name in self.pattern_library.validation_rules.get(doc_type, []):
+                # 验证逻辑可以进一步扩展（pattern 已预编译）
+                pass
         
         return validation
 
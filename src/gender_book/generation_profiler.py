@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投标书生成性能分析模块
+
+功能说明：
+- 记录每次LLM调用（项目理解及各章节）的提示词/生成token数、耗时、调用前准备耗时和提供商
+- 单次生成的明细随任务结果返回，便于定位耗时和成本最高的章节
+- 全局汇总各章节、各提供商的调用统计，供 /api/gender_book/stats 接口查询
+"""
+
+import re
+import time
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+_CJK_RE = re.compile(r'[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]')
+_WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（提供商未返回用量时使用）：中文字符按1个token，英文单词按1.3个token"""
+    if not text:
+        return 0
+    return len(_CJK_RE.findall(text)) + int(len(_WORD_RE.findall(text)) * 1.3)
+
+
+@dataclass
+class LLMCallRecord:
+    """单次LLM调用记录"""
+    section_id: str
+    provider: str = ""
+    model: str = ""
+    prompt_chars: int = 0
+    completion_chars: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tokens_estimated: bool = False
+    prep_time: float = 0.0
+    wall_time: float = 0.0
+    retries: int = 0
+    success: bool = True
+    error: Optional[str] = None
+
+
+class GenerationProfiler:
+    """单次投标书生成的LLM调用分析器"""
+
+    def __init__(self, model_manager):
+        self.model_manager = model_manager
+        self.records: List[LLMCallRecord] = []
+
+    def call(self, section_id: str, module: str, prompt: str, ready_at: Optional[float] = None) -> str:
+        """调用模型并记录调用信息
+
+        Args:
+            section_id: 章节ID（项目理解为 project_understanding）
+            module: 模型模块名
+            prompt: 提示词
+            ready_at: 该步骤可以开始的时间（time.perf_counter）；章节按顺序生成，即轮到该步骤的时间，
+                      到发起调用之间为上下文整理、提示词构建等准备耗时
+        """
+        started_at = time.perf_counter()
+        record = LLMCallRecord(
+            section_id=section_id,
+            prompt_chars=len(prompt),
+            prep_time=started_at - ready_at if ready_at is not None else 0.0
+        )
+
+        response = None
+        try:
+            response = self.model_manager.call_model(module, prompt)
+            record.completion_chars = len(response or "")
+            return response
+        except Exception as e:
+            record.success = False
+            record.error = str(e)
+            raise
+        finally:
+            record.wall_time = time.perf_counter() - started_at
+            self._fill_usage(record, prompt, response)
+            self.records.append(record)
+            generation_stats.add(record)
+
+    def _fill_usage(self, record: LLMCallRecord, prompt: str, response: Optional[str]):
+        """填充提供商和token用量，提供商未返回用量时进行估算"""
+        info = self.model_manager.get_last_call_info()
+        record.provider = info.get('provider', '')
+        record.model = info.get('model', '')
+        record.retries = info.get('retries', 0)
+
+        prompt_tokens = info.get('prompt_tokens')
+        completion_tokens = info.get('completion_tokens')
+        if prompt_tokens is None or completion_tokens is None:
+            record.tokens_estimated = True
+            prompt_tokens = estimate_tokens(prompt) if prompt_tokens is None else prompt_tokens
+            completion_tokens = estimate_tokens(response or "") if completion_tokens is None else completion_tokens
+        record.prompt_tokens = prompt_tokens
+        record.completion_tokens = completion_tokens
+
+    def summary(self) -> Dict[str, Any]:
+        """本次生成的调用明细与汇总"""
+        return {
+            "llm_calls": len(self.records),
+            "total_wall_time": sum(r.wall_time for r in self.records),
+            "total_prep_time": sum(r.prep_time for r in self.records),
+            "total_prompt_tokens": sum(r.prompt_tokens for r in self.records),
+            "total_completion_tokens": sum(r.completion_tokens for r in self.records),
+            "calls": [asdict(r) for r in self.records]
+        }
+
+
+class GenerationStats:
+    """全局LLM调用统计（按章节、按提供商汇总）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._by_section: Dict[str, Dict[str, Any]] = {}
+            self._by_provider: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, record: LLMCallRecord):
+        with self._lock:
+            self._accumulate(self._by_section, record.section_id, record)
+            self._accumulate(self._by_provider, record.provider or "unknown", record)
+
+    @staticmethod
+    def _accumulate(groups: Dict[str, Dict[str, Any]], key: str, record: LLMCallRecord):
+        group = groups.setdefault(key, {
+            "calls": 0, "failures": 0, "retries": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+            "wall_time": 0.0, "max_wall_time": 0.0, "prep_time": 0.0
+        })
+        group["calls"] += 1
+        group["failures"] += 0 if record.success else 1
+        group["retries"] += record.retries
+        group["prompt_tokens"] += record.prompt_tokens
+        group["completion_tokens"] += record.completion_tokens
+        group["wall_time"] += record.wall_time
+        group["max_wall_time"] = max(group["max_wall_time"], record.wall_time)
+        group["prep_time"] += record.prep_time
+
+    @staticmethod
+    def _finalize(groups: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """计算平均值，并按总耗时降序排列"""
+        result = []
+        for key, group in groups.items():
+            item = {"name": key, **group}
+            item["avg_wall_time"] = group["wall_time"] / group["calls"]
+            item["avg_prep_time"] = group["prep_time"] / group["calls"]
+            result.append(item)
+        return sorted(result, key=lambda x: x["wall_time"], reverse=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            sections = self._finalize(self._by_section)
+            providers = self._finalize(self._by_provider)
+        return {
+            "total_calls": sum(s["calls"] for s in sections),
+            "total_wall_time": sum(s["wall_time"] for s in sections),
+            "total_prompt_tokens": sum(s["prompt_tokens"] for s in sections),
+            "total_completion_tokens": sum(s["completion_tokens"] for s in sections),
+            "sections": sections,
+            "providers": providers
+        }
+
+
+# 全局统计实例
+generation_stats = GenerationStats()
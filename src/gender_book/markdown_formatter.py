@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投标书Markdown格式化器
+
+功能说明：
+- 将投标书内容（字符串/字典）转换为规范的Markdown文档
+- 所有标题识别、清理、标准化的正则在模块加载时预编译
+- 段落识别与格式清理合并为单次遍历，标题去重使用哈希集合
+- 支持按章节增量调用（feed），章节流式生成时即可边生成边格式化
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List
+
+# 文档总标题
+DOCUMENT_TITLE = "# 投标书"
+
+# 不应被识别为章节标题的关键词
+_CHAPTER_BLACKLIST = (
+    '详见', '如下', '包括', '具体', '说明', '要求', '标准', '规范',
+    '附件', '附录', '备注', '注意', '提醒', '温馨提示'
+)
+
+# 章节标题关键词
+_CHAPTER_KEYWORDS = (
+    '基本信息', '项目理解', '技术方案', '商务方案', '服务方案',
+    '资格条件', '项目管理', '质量保证', '进度安排', '人员配置',
+    '设备配置', '安全措施', '环保措施', '售后服务'
+)
+
+# 一级/二级标题关键词（用于层级校验）
+_LEVEL1_KEYWORDS = ('投标书', '技术方案', '商务方案', '项目管理方案', '售后服务方案')
+_LEVEL2_KEYWORDS = ('基本信息', '项目理解', '资格条件', '技术要求', '服务承诺')
+
+# 章节标题模式：第X章 标题 / 一、标题 / 1. 标题 / 1.1 标题 / 以冒号结尾的标题
+_CHAPTER_RE = re.compile(
+    r'^(?:第[一二三四五六七八九十\d]+章[\s：:].{2,30}$'
+    r'|[一二三四五六七八九十]、.{2,30}$'
+    r'|\d+[、.]\s*.{2,30}$'
+    r'|\d+\.\d+[\s：:].{2,30}$'
+    r'|.{2,20}[：:]$)'
+)
+# 关键词前后均为标点符号
+_CHAPTER_KEYWORD_RE = re.compile(
+    r'[^\w](?:' + '|'.join(map(re.escape, _CHAPTER_KEYWORDS)) + r')[^\w]'
+)
+
+# 子标题模式：1.1.1 标题 / (1) 标题 / ① 标题
+_SUB_TITLE_RE = re.compile(
+    r'^(?:\d+\.\d+\.\d+\s+.+'
+    r'|\([一二三四五六七八九十\d]+\)\s*.+'
+    r'|[①②③④⑤⑥⑦⑧⑨⑩]\s*.+)'
+)
+
+# 标题清理规则（按顺序依次执行）
+_TITLE_CLEANERS = [
+    re.compile(r'^#+\s*'),  # 移除markdown标记
+    re.compile(r'^第[一二三四五六七八九十\d]+章\s*'),  # 移除章节标记
+    re.compile(r'^[一二三四五六七八九十\d]+[、.]\s*'),  # 移除序号
+    re.compile(r'^\d+\.\d+\.?\s*'),  # 移除数字序号
+    re.compile(r'^\([一二三四五六七八九十\d]+\)\s*'),  # 移除括号序号
+    re.compile(r'^[①②③④⑤⑥⑦⑧⑨⑩]\s*'),  # 移除圆圈序号
+]
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_REPEATED_COLON_RE = re.compile(r'[：:]{2,}')
+_REPEATED_PERIOD_RE = re.compile(r'[。.]{2,}')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_CHAPTER_MARK_RE = re.compile(r'第[一二三四五六七八九十\d]+章')
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+)$')
+
+# 字典格式内容的预定义章节顺序
+_SECTION_ORDER = (
+    "基本信息", "项目理解", "第一章 投标人基本情况", "第二章 资格条件响应",
+    "第三章 技术方案", "第四章 项目管理方案", "第五章 商务方案",
+    "第六章 售后服务方案", "第七章 其他"
+)
+
+
+def is_chapter_title(text: str) -> bool:
+    """判断是否为章节标题"""
+    text = text.strip()
+
+    if any(keyword in text for keyword in _CHAPTER_BLACKLIST):
+        return False
+
+    # 太短或太长的文本不太可能是标题
+    if len(text) < 2 or len(text) > 50:
+        return False
+
+    if _CHAPTER_RE.match(text):
+        return True
+
+    # 关键词需位于开头/结尾，或前后有标点符号
+    if text.startswith(_CHAPTER_KEYWORDS) or text.endswith(_CHAPTER_KEYWORDS):
+        return True
+    return _CHAPTER_KEYWORD_RE.search(text) is not None
+
+
+def is_sub_title(text: str) -> bool:
+    """判断是否为子标题"""
+    return _SUB_TITLE_RE.match(text.strip()) is not None
+
+
+def clean_title_text(text: str) -> str:
+    """清理标题文本中的标记、序号和结尾冒号"""
+    for cleaner in _TITLE_CLEANERS:
+        text = cleaner.sub('', text, count=1)
+    return text.rstrip('：:').strip()
+
+
+def normalize_title(title: str) -> str:
+    """标准化标题格式（空白、重复标点、冒号统一）"""
+    title = _WHITESPACE_RE.sub(' ', title.strip())
+    title = _REPEATED_COLON_RE.sub('：', title)
+    title = _REPEATED_PERIOD_RE.sub('。', title)
+    return title.replace(':', '：')
+
+
+def validate_title_level(title: str, level: int) -> int:
+    """根据章节标记和关键词校正标题层级"""
+    if _CHAPTER_MARK_RE.search(title):
+        return min(level, 2)  # 章节标题最多为二级
+    if any(keyword in title for keyword in _LEVEL1_KEYWORDS):
+        return 2  # 主要章节为二级标题
+    if any(keyword in title for keyword in _LEVEL2_KEYWORDS):
+        return 3  # 子章节为三级标题
+    return min(level, 4)
+
+
+class _TitleSet:
+    """已出现标题集合，同时记录去除标点后的键，去重判断为O(1)"""
+
+    def __init__(self):
+        self._titles = set()
+        self._keys = set()
+
+    def __contains__(self, normalized_title: str) -> bool:
+        if normalized_title in self._titles:
+            return True
+        key = _PUNCTUATION_RE.sub('', normalized_title)
+        return bool(key) and key in self._keys
+
+    def add(self, normalized_title: str):
+        self._titles.add(normalized_title)
+        self._keys.add(_PUNCTUATION_RE.sub('', normalized_title))
+
+
+class MarkdownFormatter:
+    """增量式投标书Markdown格式化器
+
+    每次调用 feed() 处理一个章节（或整篇文本），段落识别与格式清理在同一次
+    遍历中完成，跨章节的标题去重状态保存在实例中。全部章节输入完成后调用
+    render() 获取完整文档。
+
+    示例：
+        formatter = MarkdownFormatter()
+        for section in sections:
+            formatter.feed(section)
+        markdown = formatter.render()
+    """
+
+    def __init__(self):
+        # 段落识别阶段已出现的标题
+        self._paragraph_titles = _TitleSet()
+        # 格式清理阶段已出现的标题
+        self._heading_titles = _TitleSet()
+        self._lines: List[str] = []
+        self._emit_line(DOCUMENT_TITLE)
+
+    def feed(self, content: Any) -> str:
+        """格式化一段内容并追加到文档中
+
+        Args:
+            content: 章节文本，或字典格式的完整投标书
+
+        Returns:
+            本次新增的Markdown片段
+        """
+        start = len(self._lines)
+
+        if isinstance(content, str):
+            for paragraph in content.split('\n\n'):
+                self._feed_paragraph(paragraph)
+        elif isinstance(content, dict):
+            for block in _iter_dict_sections(content):
+                self._emit_block(block)
+        else:
+            self._emit_block(str(content).strip())
+
+        return '\n'.join(self._lines[start:])
+
+    def render(self, with_footer: bool = True) -> str:
+        """返回完整的Markdown文档"""
+        end = len(self._lines)
+        while end and self._lines[end - 1] == '':
+            end -= 1
+        markdown_content = '\n'.join(self._lines[:end])
+
+        if with_footer:
+            markdown_content += "\n---\n\n"
+            markdown_content += f"*本投标书由系统自动生成，生成时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}*\n"
+        return markdown_content
+
+    def _feed_paragraph(self, paragraph: str):
+        """识别段落类型（markdown标题/章节标题/子标题/正文）"""
+        paragraph = paragraph.strip()
+        if not paragraph:
+            return
+
+        # 跳过重复的"投标书"标题
+        if paragraph in ("# 投标书", "投标书") or paragraph.endswith(" 投标书"):
+            return
+
+        if paragraph.startswith('#'):
+            title_text = paragraph.lstrip('#')
+            level = len(paragraph) - len(title_text)
+            title = title_text.strip()
+        elif is_chapter_title(paragraph):
+            level = 2
+            title = clean_title_text(paragraph)
+        elif is_sub_title(paragraph):
+            level = 3
+            title = clean_title_text(paragraph)
+        else:
+            self._emit_block(paragraph)
+            return
+
+        if not title:
+            return
+        normalized_title = normalize_title(title)
+        if normalized_title in self._paragraph_titles:
+            return
+        if paragraph.startswith('#'):
+            # 已有markdown标题：校正层级，一级标题改为二级，且不超过4级
+            level = min(max(validate_title_level(normalized_title, level), 2), 4)
+
+        self._paragraph_titles.add(normalized_title)
+        self._emit_block(f"{'#' * level} {normalized_title}")
+
+    def _emit_block(self, block: str):
+        """逐行送入格式清理阶段，块之间以空行分隔"""
+        for line in block.split('\n'):
+            self._emit_line(line)
+        self._emit_line('')
+
+    def _emit_line(self, line: str):
+        """格式清理：合并空行、标题去重与层级校验"""
+        lines = self._lines
+        line = line.strip()
+
+        if not line:
+            if lines and lines[-1] != '':
+                lines.append('')
+            return
+
+        heading = _HEADING_RE.match(line)
+        if not heading:
+            lines.append(line)
+            return
+
+        normalized_title = normalize_title(heading.group(2).strip())
+        if not normalized_title or normalized_title in self._heading_titles:
+            return
+
+        self._heading_titles.add(normalized_title)
+        if lines and lines[-1] != '':
+            lines.append('')
+        lines.append(f"{'#' * validate_title_level(normalized_title, len(heading.group(1)))} {normalized_title}")
+        lines.append('')
+
+
+def _iter_dict_sections(content_dict: Dict[str, Any]):
+    """按预定义顺序生成字典格式各章节的Markdown文本"""
+    for section_key in _SECTION_ORDER:
+        if section_key in content_dict:
+            yield _format_section(section_key, content_dict[section_key])
+
+    for section_title, section_content in content_dict.items():
+        if section_title not in _SECTION_ORDER:
+            yield _format_section(section_title, section_content)
+
+
+def _format_section(title: str, content: Any) -> str:
+    """格式化字典中的单个章节"""
+    result = f"## {title}\n\n"
+
+    if isinstance(content, str):
+        for line in content.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            if is_sub_title(line):
+                clean_title = clean_title_text(line)
+                if clean_title:
+                    result += f"### {clean_title}\n\n"
+            else:
+                result += line + "\n"
+        result += "\n"
+    elif isinstance(content, list):
+        for item in content:
+            if isinstance(item, str) and item.strip():
+                result += f"- {item.strip()}\n"
+        result += "\n"
+    else:
+        result += str(content).strip() + "\n\n"
+
+    return result
+
+
+def convert_to_markdown(bid_content: Any) -> str:
+    """将完整投标书内容一次性转换为Markdown文档"""
+    formatter = MarkdownFormatter()
+    formatter.feed(bid_content)
+    return formatter.render()
@@ -1,6 +1,7 @@
 import json
 import logging
 import asyncio
+import time
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import sys
@@ -12,6 +13,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 # 导入现有的LLM服务
 from src.llm_service import LLMService
 from .section_manager import SectionManager, BidSection
+from .understanding_cache import understanding_cache, calculate_tender_hash
+from .generation_profiler import GenerationProfiler
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +27,12 @@ class BidProposalGenerator:
     def __init__(self, model_name: str = None):
         self.logger = logging.getLogger(__name__)
         self.section_manager = SectionManager()
+        self.model_name = model_name
         
         # 初始化LLM服务
         try:
             self.llm_service = LLMService(model_name=model_name)
+            self.profiler = GenerationProfiler(self.llm_service.model_manager)
             self.logger.info(f"LLM服务初始化成功，使用模型: {model_name or '默认模型'}")
         except Exception as e:
             self.logger.error(f"LLM服务初始化失败: {str(e)}")
@@ -51,6 +56,11 @@ class BidProposalGenerator:
         try:
             self.logger.info("开始生成投标书文档")
             start_time = datetime.now()
+            # 记录本次生成中每次LLM调用的耗时与token用量
+            self.profiler = GenerationProfiler(self.llm_service.model_manager)
+            
+            # 与附件无关的项目理解按招标文件+模型缓存
+            tender_hash = calculate_tender_hash(tender_document_json)
             
             # 1. 分析招标文件内容
             self.logger.info("步骤1: 分析招标文件内容")
@@ -70,7 +80,7 @@ class BidProposalGenerator:
             
             # 3. 生成项目理解（作为全局上下文）
             self.logger.info("步骤3: 生成项目理解")
-            project_understanding = self._generate_project_understanding(content_analysis)
+            project_understanding = self._generate_project_understanding(content_analysis, tender_hash)
             
             # 4. 分批生成投标书章节内容
             self.logger.info("步骤4: 分批生成投标书章节内容")
@@ -95,6 +105,7 @@ class BidProposalGenerator:
                 "document_length": len(final_document),
                 "batch_size_used": batch_size,
                 "model_used": model_name or "默认模型",
+                "tender_hash": tender_hash,
                 "generation_time": end_time.isoformat(),
                 "content_analysis_summary": {
                     "total_content_blocks": content_analysis.get("total_content_blocks", 0),
@@ -109,6 +120,7 @@ class BidProposalGenerator:
                 "success": True,
                 "bid_proposal": final_document,
                 "statistics": statistics,
+                "profile": self.profiler.summary(),
                 "section_plan": section_plan,
                 "content_analysis": content_analysis,
                 "attachment_info": attachment_info
@@ -123,9 +135,21 @@ class BidProposalGenerator:
                 "statistics": {}
             }
     
-    def _generate_project_understanding(self, content_analysis: Dict[str, Any]) -> str:
-        """生成项目理解，作为后续投标书章节生成的全局上下文"""
+    def _generate_project_understanding(self, content_analysis: Dict[str, Any],
+                                        tender_hash: Optional[str] = None) -> str:
+        """生成项目理解，作为后续投标书章节生成的全局上下文
+        
+        项目理解只依赖招标文件内容，传入tender_hash时按招标文件+模型优先使用缓存结果
+        """
         try:
+            ready_at = time.perf_counter()
+            if tender_hash:
+                cache_key = understanding_cache.make_key(tender_hash, self._model_identity())
+                cached = understanding_cache.get_project_understanding(cache_key)
+                if cached:
+                    self.logger.info("使用缓存的项目理解")
+                    return cached
+            
             tender_requirements = content_analysis.get("tender_requirements", {})
             section_mapping = content_analysis.get("section_mapping", {})
             
@@ -136,7 +160,15 @@ class BidProposalGenerator:
             prompt = self._build_understanding_prompt(tender_requirements, understanding_content)
             
             # 调用LLM生成项目理解
-            understanding = self.llm_service.model_manager.call_model('tender_notice', prompt)
+            understanding = self.profiler.call('project_understanding', 'tender_notice', prompt, ready_at)
+            
+            if tender_hash and understanding:
+                # 按实际生成的提供商和模型保存（主提供商失败时可能由备用提供商生成）
+                info = self.llm_service.model_manager.get_last_call_info()
+                if info.get('provider'):
+                    cache_key = understanding_cache.make_key(
+                        tender_hash, f"{info['provider']}:{info.get('model', '')}")
+                understanding_cache.set_project_understanding(cache_key, understanding)
             
             self.logger.info("项目理解生成完成")
             return understanding
@@ -222,6 +254,8 @@ class BidProposalGenerator:
                                attachment_info: Optional[Dict[str, Any]] = None) -> str:
         """生成单个投标书章节内容"""
         try:
+            # 章节按顺序生成，轮到本章节时即可开始
+            ready_at = time.perf_counter()
             # 获取章节上下文
             section_context = self.section_manager.get_section_context(section_id, content_analysis)
             
@@ -231,7 +265,7 @@ class BidProposalGenerator:
             )
             
             # 调用LLM生成投标书章节内容
-            section_content = self.llm_service.model_manager.call_model('tender_notice', prompt)
+            section_content = self.profiler.call(section_id, 'tender_notice', prompt, ready_at)
             
             return section_content
             
@@ -239,6 +273,16 @@ class BidProposalGenerator:
             self.logger.error(f"生成投标书章节 {section_id} 时出错: {str(e)}")
             raise
     
+    def _model_identity(self) -> str:
+        """项目理解将使用的模型标识（提供商:模型名），作为缓存键的一部分
+        
+        项目理解经 tender_notice 模块调用，取该模块提供商链中的首个提供商（随管理端切换而变化）
+        """
+        model_manager = self.llm_service.model_manager
+        provider = model_manager.get_provider_chain('tender_notice')[0]
+        model = model_manager.config.get('providers', {}).get(provider, {}).get('model', '')
+        return f"{provider}:{model}"
+    
     def _build_bid_section_prompt(self, section_context: Dict[str, Any],
                             project_understanding: str,
                             existing_sections: Dict[str, str],
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+项目理解缓存模块
+
+功能说明：
+- 以"招标文件JSON哈希 + 模型"为键，持久化缓存项目理解（只依赖招标文件内容的LLM调用）
+- 同一招标文件配合不同附件多次生成投标书时，不再重复生成项目理解
+- 每个键对应缓存目录下的一个JSON文件，服务重启后仍然有效
+- 支持按招标文件哈希或全部显式失效
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def calculate_tender_hash(tender_document_json: Dict[str, Any]) -> str:
+    """计算招标文件JSON的哈希（键顺序无关）"""
+    canonical = json.dumps(tender_document_json, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class UnderstandingCache:
+    """项目理解的持久化缓存"""
+
+    def __init__(self, cache_dir: str = "cache/gender_book"):
+        self.cache_dir = cache_dir
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, tender_hash: str, model: str) -> str:
+        """由招标文件哈希和模型生成缓存键"""
+        model_digest = hashlib.md5(model.encode('utf-8')).hexdigest()[:12]
+        return f"{tender_hash}_{model_digest}"
+
+    def get_project_understanding(self, key: str) -> Optional[str]:
+        """获取缓存的项目理解"""
+        understanding = self._load(key).get("project_understanding")
+        self._count(understanding is not None)
+        return understanding
+
+    def set_project_understanding(self, key: str, understanding: str):
+        """缓存项目理解"""
+        with self._lock:
+            self._load(key)["project_understanding"] = understanding
+            self._save(key)
+
+    def invalidate(self, tender_hash: Optional[str] = None) -> int:
+        """使缓存失效
+
+        Args:
+            tender_hash: 招标文件哈希，为空时清除全部缓存
+
+        Returns:
+            删除的缓存条目数量
+        """
+        with self._lock:
+            removed = 0
+            for filename in os.listdir(self.cache_dir):
+                if not filename.endswith(".json"):
+                    continue
+                if tender_hash and not filename.startswith(f"{tender_hash}_"):
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, filename))
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"删除缓存文件失败 {filename}: {str(e)}")
+
+            if tender_hash:
+                for key in [k for k in self._entries if k.startswith(f"{tender_hash}_")]:
+                    del self._entries[key]
+            else:
+                self._entries.clear()
+
+            logger.info(f"项目理解缓存已失效: {tender_hash or '全部'}，删除{removed}条")
+            return removed
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            entries = len([f for f in os.listdir(self.cache_dir) if f.endswith(".json")])
+            total = self.hits + self.misses
+            return {
+                "cache_dir": self.cache_dir,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, key: str) -> Dict[str, Any]:
+        """加载缓存条目（内存中已有则直接返回）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+
+            entry = {"created_at": datetime.now().isoformat()}
+            path = self._path(key)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                except Exception as e:
+                    logger.warning(f"读取缓存文件失败 {path}: {str(e)}")
+            self._entries[key] = entry
+            return entry
+
+    def _save(self, key: str):
+        """写入缓存条目（先写临时文件再替换）"""
+        entry = self._entries[key]
+        entry["updated_at"] = datetime.now().isoformat()
+        path = self._path(key)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.error(f"保存缓存文件失败 {path}: {str(e)}")
+
+
+# 全局缓存实例
+understanding_cache = UnderstandingCache()
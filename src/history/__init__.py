@@ -5,7 +5,7 @@
 
 功能说明：
 - 管理招标文件生成的历史记录
-- 自动保存最近20条生成记录
+- 使用SQLite保存生成记录，支持大量记录的索引查询和游标分页
 - 提供历史记录查询和管理接口
 - 支持历史记录的导出和清理
 """
@@ -4,13 +4,45 @@
 历史记录API接口
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+import re
+import asyncio
+import urllib.parse
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 from .history_manager import history_manager
-from .models import HistoryQueryParams, HistoryListResponse, HistoryStatsResponse, TenderHistoryRecord
+from .retention import retention_engine
+from .models import (HistoryQueryParams, HistoryListResponse, HistoryStatsResponse, TenderHistoryRecord,
+                     ThroughputBucket, HistorySearchResponse)
 
 router = APIRouter()
 
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(range_header: str, size: int) -> Tuple[int, int]:
+    """解析单区间 Range 请求头，返回 [start, end] 字节区间（含end）"""
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        raise HTTPException(status_code=416, detail="无效的Range请求",
+                            headers={"Content-Range": f"bytes */{size}"})
+
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    else:
+        # bytes=-N 表示最后N个字节
+        start = max(size - int(end_text), 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range超出内容范围",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
 @router.get("/records", response_model=HistoryListResponse, summary="获取历史记录列表")
 async def get_history_records(
     limit: Optional[int] = Query(20, ge=1, le=100, description="每页记录数"),
@@ -18,7 +50,8 @@ async def get_history_records(
     status: Optional[str] = Query(None, description="状态过滤 (completed/failed)"),
     model: Optional[str] = Query(None, description="模型过滤"),
     date_from: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
-    date_to: Optional[str] = Query(None, description="结束日期 (ISO格式)")
+    date_to: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor，传入时忽略 offset）")
 ):
     """
     获取招标文件生成历史记录列表
@@ -27,6 +60,7 @@ async def get_history_records(
     - 按状态过滤（成功/失败）
     - 按模型过滤
     - 按日期范围过滤
+    - 游标分页（记录较多时推荐使用）
     """
     try:
         params = HistoryQueryParams(
@@ -35,14 +69,38 @@ async def get_history_records(
             status_filter=status,
             model_filter=model,
             date_from=date_from,
-            date_to=date_to
+            date_to=date_to,
+            cursor=cursor
         )
         
         return history_manager.get_records(params)
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取历史记录失败: {str(e)}")
 
+@router.get("/search", response_model=HistorySearchResponse, summary="全文检索历史记录")
+async def search_history_records(
+    q: str = Query(..., min_length=1, description="检索词，多个词用空格分隔（同时命中）"),
+    limit: Optional[int] = Query(20, ge=1, le=100, description="每页记录数"),
+    offset: Optional[int] = Query(0, ge=0, description="偏移量"),
+    status: Optional[str] = Query(None, description="状态过滤 (completed/failed)"),
+    model: Optional[str] = Query(None, description="模型过滤")
+):
+    """
+    按文件名和招标书内容全文检索历史记录
+
+    结果按相关度排序，每条结果附带命中位置附近的摘要，命中词用 <mark> 标记
+    """
+    try:
+        return history_manager.search_records(q, limit, offset, status, model)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"检索历史记录失败: {str(e)}")
+
 @router.get("/records/{record_id}", response_model=TenderHistoryRecord, summary="获取单个历史记录")
 async def get_history_record(record_id: str):
     """
@@ -60,6 +118,41 @@ async def get_history_record(record_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取记录失败: {str(e)}")
 
+@router.get("/records/{record_id}/content", summary="获取历史记录内容")
+async def get_history_record_content(record_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    流式返回指定历史记录的招标书正文
+    
+    支持 Range 请求头（如 bytes=0-65535），按字节区间分段获取大文档
+    """
+    try:
+        content_info = history_manager.get_content_info(record_id)
+        if not content_info:
+            raise HTTPException(status_code=404, detail="记录不存在")
+        
+        size = content_info["size"]
+        headers = {"Accept-Ranges": "bytes"}
+        status_code = 200
+        start, end = 0, size - 1
+        
+        if range_header and size > 0:
+            start, end = _parse_range(range_header, size)
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(max(end - start + 1, 0))
+        
+        return StreamingResponse(
+            history_manager.iter_content(content_info, start, end),
+            status_code=status_code,
+            media_type="text/markdown; charset=utf-8",
+            headers=headers
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取记录内容失败: {str(e)}")
+
 @router.delete("/records/{record_id}", summary="删除历史记录")
 async def delete_history_record(record_id: str):
     """
@@ -88,6 +181,7 @@ async def get_history_statistics():
     - 最常用模型
     - 平均处理时间
     - 最新生成时间
+    - 按状态/模型的数量、处理时间分位数
     """
     try:
         return history_manager.get_statistics()
@@ -95,6 +189,49 @@ async def get_history_statistics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
+@router.get("/statistics/throughput", response_model=List[ThroughputBucket], summary="按时间统计生成数量")
+async def get_history_throughput(
+    granularity: str = Query("hour", description="时间粒度 (hour/day)"),
+    model: Optional[str] = Query(None, description="模型过滤"),
+    date_from: Optional[str] = Query(None, description="开始时间 (ISO格式)"),
+    date_to: Optional[str] = Query(None, description="结束时间 (ISO格式)")
+):
+    """
+    按小时或天统计各模型的生成数量、成功/失败数量和平均处理时间
+    """
+    try:
+        return [ThroughputBucket(**item) for item in
+                history_manager.get_throughput(granularity, date_from, date_to, model)]
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取吞吐量统计失败: {str(e)}")
+
+@router.get("/retention", summary="获取保留策略状态")
+async def get_retention_status():
+    """
+    获取历史记录保留策略的累计清理统计、当前磁盘占用和生效的配置
+
+    包括：删除/归档的记录数、按策略（age/count/size/archive）释放的字节数、最近一次清理结果
+    """
+    try:
+        return await asyncio.to_thread(retention_engine.get_metrics)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取保留策略状态失败: {str(e)}")
+
+@router.post("/retention/sweep", summary="立即执行保留策略清理")
+async def run_retention_sweep():
+    """
+    立即按保留策略执行一次清理和归档，返回本次清理结果
+    """
+    try:
+        return await asyncio.to_thread(retention_engine.sweep)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"执行清理失败: {str(e)}")
+
 @router.delete("/records", summary="清空所有历史记录")
 async def clear_all_history():
     """
@@ -109,37 +246,63 @@ async def clear_all_history():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"清空记录失败: {str(e)}")
 
+@router.get("/export", summary="批量导出历史记录")
+async def export_history_records(
+    status: Optional[str] = Query(None, description="状态过滤 (completed/failed)"),
+    model: Optional[str] = Query(None, description="模型过滤"),
+    date_from: Optional[str] = Query(None, description="开始日期 (ISO格式)"),
+    date_to: Optional[str] = Query(None, description="结束日期 (ISO格式)"),
+    limit: Optional[int] = Query(None, ge=1, description="最多导出的记录数，不填时导出全部符合条件的记录")
+):
+    """
+    按过滤条件批量导出历史记录为zip
+
+    每条记录包含 metadata.json 和 content.md；zip边生成边下载，服务端内存占用与导出数量无关
+    """
+    try:
+        params = HistoryQueryParams(
+            status_filter=status,
+            model_filter=model,
+            date_from=date_from,
+            date_to=date_to
+        )
+        filename = f"history_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+
+        return StreamingResponse(
+            history_manager.iter_export_zip(params, max_records=limit),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量导出记录失败: {str(e)}")
+
 @router.get("/export/{record_id}", summary="导出历史记录")
 async def export_history_record(record_id: str):
     """
     导出指定历史记录的招标书内容
     """
     try:
-        record = history_manager.get_record_by_id(record_id)
-        if not record:
+        content_info = history_manager.get_content_info(record_id)
+        if not content_info:
             raise HTTPException(status_code=404, detail="记录不存在")
         
-        from fastapi.responses import Response
-        import urllib.parse
-        
-        # 获取招标书内容，如果为空则使用摘要
-        content = record.tender_content
-        if not content or content.strip() == "":
-            content = record.tender_summary or "招标书内容为空"
-        
-        # 确保内容不为None
-        if content is None:
-            content = "招标书内容为空"
-        
         # 使用安全的文件名，避免中文编码问题
-        safe_filename = f"tender_document_{record_id}_{record.generation_time[:10]}.md"
+        safe_filename = f"tender_document_{record_id}_{content_info['generation_time'][:10]}.md"
+        
+        # 内容为空时返回提示文本
+        if content_info["size"] == 0:
+            placeholder = "招标书内容为空".encode('utf-8')
+            content_info = {"size": len(placeholder), "file_path": None, "inline_content": placeholder}
         encoded_filename = urllib.parse.quote(safe_filename)
         
-        return Response(
-            content=content.encode('utf-8'),
+        # 压缩内容边解压边输出，不在内存中保留完整文档
+        return StreamingResponse(
+            history_manager.iter_content(content_info),
             media_type="text/markdown; charset=utf-8",
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
+                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+                "Content-Length": str(content_info["size"])
             }
         )
     
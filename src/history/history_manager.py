@@ -2,68 +2,302 @@
 # -*- coding: utf-8 -*-
 """
 招标文件生成历史记录管理器
+
+功能说明：
+- 历史记录元数据保存在SQLite数据库（history.db）中，按状态、模型、创建时间建立索引
+- 写入在事务中完成，多线程/多进程（多个worker）并发写入不会丢失记录
+- 列表查询支持游标（keyset）分页，记录数增长后查询耗时保持稳定
+- 列表查询只返回元数据；招标书完整内容以gzip压缩保存在 content/ 目录下，按需流式读取
+- 首次启动时自动导入旧版 records.json 中的记录
+- 统计信息由写入/删除时增量维护的聚合表提供，不随记录数增长而变慢
+- 文件名和内容建立FTS5全文索引（中文二元组切分），支持按相关度检索
+- 保存生成输入的MinHash签名并建立LSH索引，用于发现与历史输入近似相同的生成请求
+- 支持按查询条件批量导出为zip，边生成边输出，内存占用与导出记录数无关
+- 记录保存内容文件的磁盘占用（stored_size），供保留策略（retention.py）按时间/容量清理和归档
 """
 
 import os
+import gzip
 import json
+import lzma
 import uuid
+import sqlite3
+import zipfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from pathlib import Path
-from .models import TenderHistoryRecord, HistoryQueryParams, HistoryListResponse, HistoryStatsResponse
+from .models import (TenderHistoryRecord, HistoryRecordMeta, HistoryQueryParams,
+                     HistoryListResponse, HistoryStatsResponse, HistorySearchHit, HistorySearchResponse)
+from .stats_aggregator import HistoryStatsAggregator
+from .search_index import HistorySearchIndex, make_snippet
+from .near_duplicate import HistoryDedupIndex
+
+# 记录表字段（与 TenderHistoryRecord 一致）
+RECORD_COLUMNS = (
+    "record_id", "task_id", "original_filename", "file_size", "model_provider",
+    "quality_level", "generation_time", "processing_duration", "status",
+    "error_message", "tender_content", "tender_summary", "created_at", "file_path",
+    "content_size"
+)
+
+# 列表查询返回的元数据字段（不含正文）
+META_COLUMNS = tuple(column for column in RECORD_COLUMNS if column != "tender_content")
+
+# 更新统计聚合所需的字段
+STATS_COLUMNS = "record_id, file_path, model_provider, status, processing_duration, created_at"
+
+# 写入记录时除 RECORD_COLUMNS 外的内部字段
+INTERNAL_COLUMNS = ("input_signature", "stored_size", "generation_key")
+
+# 流式读取内容时的块大小
+CONTENT_CHUNK_SIZE = 64 * 1024
+
+# 批量导出时每次从数据库读取的记录数
+EXPORT_PAGE_SIZE = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_records (
+    record_id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    original_filename TEXT NOT NULL,
+    file_size INTEGER NOT NULL DEFAULT 0,
+    model_provider TEXT NOT NULL,
+    quality_level TEXT NOT NULL,
+    generation_time TEXT NOT NULL,
+    processing_duration REAL,
+    status TEXT NOT NULL,
+    error_message TEXT,
+    tender_content TEXT NOT NULL DEFAULT '',
+    tender_summary TEXT,
+    created_at TEXT NOT NULL,
+    file_path TEXT,
+    content_size INTEGER,
+    input_signature BLOB,
+    stored_size INTEGER,
+    generation_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_created ON history_records (created_at DESC, record_id DESC);
+CREATE INDEX IF NOT EXISTS idx_history_status ON history_records (status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_history_model ON history_records (model_provider, created_at DESC);
+CREATE TABLE IF NOT EXISTS history_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class _ZipStreamBuffer:
+    """zip流式输出缓冲区
+
+    不提供 seek/tell，zipfile 会以数据描述符方式写入，无需回写本地文件头；
+    每写完一段数据后由 drain() 取出已生成的字节。
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 
 class HistoryManager:
-    """招标文件生成历史记录管理器"""
-    
-    def __init__(self, history_dir: str = "src/history", max_records: int = 20):
+    """招标文件生成历史记录管理器（SQLite存储）"""
+
+    def __init__(self, history_dir: str = "src/history", max_records: Optional[int] = None):
+        """
+        Args:
+            history_dir: 历史记录目录
+            max_records: 写入时立即执行的记录数上限，为空时不限制
+                （常规的按时间/数量/容量清理由保留策略引擎定期执行）
+        """
         self.history_dir = Path(history_dir)
         self.max_records = max_records
+        self.db_file = self.history_dir / "history.db"
         self.records_file = self.history_dir / "records.json"
         self.content_dir = self.history_dir / "content"
-        
+
         # 确保目录存在
         self.history_dir.mkdir(parents=True, exist_ok=True)
         self.content_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 初始化记录文件
+
+        # 每个线程使用独立连接；进程内写操作串行化，跨进程由SQLite锁保证
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.stats = HistoryStatsAggregator()
+        self.search_index = HistorySearchIndex()
+        self.dedup_index = HistoryDedupIndex()
+
+        self._init_database()
+        self._migrate_json_records()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_file), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：BEGIN IMMEDIATE 立即获取写锁，异常时回滚"""
+        with self._write_lock:
+            conn = self._get_connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _init_database(self):
+        """创建表和索引"""
+        with self._write_lock:
+            conn = self._get_connection()
+            conn.executescript(_SCHEMA)
+            # 兼容未包含 content_size、input_signature、generation_key 字段的旧数据库
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(history_records)")}
+            if "content_size" not in columns:
+                conn.execute("ALTER TABLE history_records ADD COLUMN content_size INTEGER")
+            if "input_signature" not in columns:
+                conn.execute("ALTER TABLE history_records ADD COLUMN input_signature BLOB")
+            if "stored_size" not in columns:
+                conn.execute("ALTER TABLE history_records ADD COLUMN stored_size INTEGER")
+            if "generation_key" not in columns:
+                conn.execute("ALTER TABLE history_records ADD COLUMN generation_key TEXT")
+            self.dedup_index.init_schema(conn)
+            self.stats.init_schema(conn)
+            self.search_index.init_schema(conn, self._load_search_documents)
+
+    def _migrate_json_records(self):
+        """导入旧版 records.json 中的记录（只执行一次）"""
         if not self.records_file.exists():
-            self._save_records([])
-    
-    def _load_records(self) -> List[Dict[str, Any]]:
-        """加载历史记录"""
+            return
+
+        conn = self._get_connection()
+        if conn.execute("SELECT 1 FROM history_meta WHERE key = 'json_migrated'").fetchone():
+            return
+
         try:
             with open(self.records_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-    
-    def _save_records(self, records: List[Dict[str, Any]]):
-        """保存历史记录"""
-        with open(self.records_file, 'w', encoding='utf-8') as f:
-            json.dump(records, f, ensure_ascii=False, indent=2)
-    
-    def _save_content_to_file(self, record_id: str, content: str) -> str:
-        """保存招标书内容到文件"""
-        content_file = self.content_dir / f"{record_id}.txt"
-        with open(content_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return str(content_file)
-    
+                records = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            records = []
+        records = [record for record in records if record.get("record_id")]
+
+        # 旧版记录的内容多保存在内容文件中，在事务外读取用于建立全文索引
+        contents = [self._search_content(record) for record in records]
+
+        with self._transaction() as conn:
+            for record, content in zip(records, contents):
+                cursor = conn.execute(
+                    f"INSERT OR IGNORE INTO history_records ({', '.join(RECORD_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(RECORD_COLUMNS))})",
+                    self._record_values(record)
+                )
+                if cursor.rowcount:
+                    self.stats.record_added(conn, record)
+                    self.search_index.add(conn, record["record_id"], record.get("original_filename") or "",
+                                          content)
+            conn.execute("INSERT OR REPLACE INTO history_meta (key, value) VALUES ('json_migrated', ?)",
+                         (datetime.now().isoformat(),))
+
+    @staticmethod
+    def _record_values(record: Dict[str, Any]) -> Tuple:
+        """按表字段顺序取出记录的值"""
+        values = {column: record.get(column) for column in RECORD_COLUMNS}
+        values["tender_content"] = values["tender_content"] or ""
+        values["file_size"] = values["file_size"] or 0
+        return tuple(values[column] for column in RECORD_COLUMNS)
+
+    def _save_content_to_file(self, record_id: str, content: str) -> Tuple[str, int]:
+        """以gzip压缩保存招标书内容，返回文件路径和原始字节数"""
+        data = content.encode('utf-8')
+        content_file = self.content_dir / f"{record_id}.txt.gz"
+        with gzip.open(content_file, 'wb', compresslevel=6) as f:
+            f.write(data)
+        return str(content_file), len(data)
+
+    @staticmethod
+    def _open_content(file_path: str):
+        """打开内容文件（二进制），压缩文件（gzip/归档的xz）透明解压"""
+        if file_path.endswith(".gz"):
+            return gzip.open(file_path, 'rb')
+        if file_path.endswith(".xz"):
+            return lzma.open(file_path, 'rb')
+        return open(file_path, 'rb')
+
     def _load_content_from_file(self, file_path: str) -> Optional[str]:
         """从文件加载招标书内容"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            with self._open_content(file_path) as f:
+                return f.read().decode('utf-8')
         except FileNotFoundError:
             return None
-    
+
+    def _remove_content_files(self, file_paths: List[Optional[str]]) -> int:
+        """删除内容文件，返回释放的字节数"""
+        reclaimed = 0
+        for file_path in file_paths:
+            if file_path and os.path.exists(file_path):
+                try:
+                    size = os.path.getsize(file_path)
+                    os.remove(file_path)
+                    reclaimed += size
+                except OSError:
+                    pass
+        return reclaimed
+
     def _generate_summary(self, content: str, max_length: int = 200) -> str:
         """生成内容摘要"""
         if len(content) <= max_length:
             return content
         return content[:max_length] + "..."
-    
-    def add_record(self, 
+
+    def _load_search_documents(self) -> List[Dict[str, Any]]:
+        """读取现有记录的文件名和内容，用于首次建立全文索引"""
+        rows = self._get_connection().execute(
+            "SELECT record_id, original_filename, tender_content, tender_summary, file_path FROM history_records"
+        ).fetchall()
+        return [{
+            "record_id": row["record_id"],
+            "original_filename": row["original_filename"],
+            "content": self._search_content(dict(row))
+        } for row in rows]
+
+    def _search_content(self, record: Dict[str, Any]) -> str:
+        """记录用于全文索引的内容：正文为空时从内容文件加载，都没有时使用摘要"""
+        content = record.get("tender_content")
+        if not content and record.get("file_path"):
+            content = self._load_content_from_file(record["file_path"])
+        return content or record.get("tender_summary") or ""
+
+    def _row_to_record(self, row: sqlite3.Row) -> TenderHistoryRecord:
+        """数据库行转换为记录对象，内容为空时从文件加载"""
+        record_data = dict(row)
+        if not record_data.get("tender_content") and record_data.get("file_path"):
+            content = self._load_content_from_file(record_data["file_path"])
+            if content:
+                record_data["tender_content"] = content
+        return TenderHistoryRecord(**record_data)
+
+    def add_record(self,
                    task_id: str,
                    original_filename: str,
                    file_size: int,
@@ -72,16 +306,47 @@ class HistoryManager:
                    tender_content: str,
                    status: str = "completed",
                    error_message: Optional[str] = None,
-                   processing_duration: Optional[float] = None) -> str:
-        """添加新的历史记录"""
-        
-        record_id = str(uuid.uuid4())
-        current_time = datetime.now().isoformat()
-        
-        # 保存招标书内容到文件
-        content_file_path = self._save_content_to_file(record_id, tender_content)
-        
-        # 创建记录
+                   processing_duration: Optional[float] = None,
+                   input_signature: Optional[List[int]] = None,
+                   generation_key: Optional[str] = None,
+                   record_id: Optional[str] = None,
+                   created_at: Optional[str] = None) -> str:
+        """添加新的历史记录
+
+        Args:
+            input_signature: 生成输入文本的MinHash签名（见 compute_input_signature），用于近似重复检测
+            generation_key: 生成参数（接口类型、模型、质量等级等）的标识，只有参数相同的记录才可复用
+            record_id: 记录ID，为空时自动生成
+            created_at: 创建时间（ISO格式），为空时使用当前时间
+        """
+        return self.add_records([{
+            "task_id": task_id,
+            "original_filename": original_filename,
+            "file_size": file_size,
+            "model_provider": model_provider,
+            "quality_level": quality_level,
+            "tender_content": tender_content,
+            "status": status,
+            "error_message": error_message,
+            "processing_duration": processing_duration,
+            "input_signature": input_signature,
+            "generation_key": generation_key,
+            "record_id": record_id,
+            "created_at": created_at
+        }])[0]
+
+    def _prepare_record(self, task_id: str, original_filename: str, file_size: int, model_provider: str,
+                        quality_level: str, tender_content: str, status: str = "completed",
+                        error_message: Optional[str] = None, processing_duration: Optional[float] = None,
+                        input_signature: Optional[List[int]] = None, generation_key: Optional[str] = None,
+                        record_id: Optional[str] = None, created_at: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[List[int]]]:
+        """保存内容文件并构建待写入的记录"""
+        record_id = record_id or str(uuid.uuid4())
+        current_time = created_at or datetime.now().isoformat()
+
+        # 压缩保存招标书内容到文件，数据库中只保存元数据和摘要
+        content_file_path, content_size = self._save_content_to_file(record_id, tender_content)
+
         record = {
             "record_id": record_id,
             "task_id": task_id,
@@ -93,170 +358,516 @@ class HistoryManager:
             "processing_duration": processing_duration,
             "status": status,
             "error_message": error_message,
-            "tender_content": tender_content if len(tender_content) <= 1000 else "",  # 只保存短内容
+            "tender_content": "",
             "tender_summary": self._generate_summary(tender_content),
             "created_at": current_time,
-            "file_path": content_file_path
+            "file_path": content_file_path,
+            "content_size": content_size,
+            "stored_size": os.path.getsize(content_file_path),
+            "generation_key": generation_key,
+            # 仅用于建立全文索引，不写入记录表
+            "_search_content": tender_content
         }
-        
-        # 加载现有记录
-        records = self._load_records()
-        
-        # 添加新记录到开头
-        records.insert(0, record)
-        
-        # 保持最大记录数限制
-        if len(records) > self.max_records:
-            # 删除超出限制的记录及其文件
-            for old_record in records[self.max_records:]:
-                if old_record.get("file_path") and os.path.exists(old_record["file_path"]):
-                    try:
-                        os.remove(old_record["file_path"])
-                    except OSError:
-                        pass
-            
-            records = records[:self.max_records]
-        
-        # 保存更新后的记录
-        self._save_records(records)
-        
-        return record_id
-    
-    def get_records(self, params: HistoryQueryParams) -> HistoryListResponse:
-        """获取历史记录列表"""
-        records = self._load_records()
-        
-        # 应用过滤器
-        filtered_records = records
-        
+        return record, input_signature
+
+    def add_records(self, records: List[Dict[str, Any]]) -> List[str]:
+        """在一个事务中批量添加历史记录
+
+        Args:
+            records: 记录参数列表，每项的键与 add_record 的参数相同
+
+        Returns:
+            记录ID列表（与输入顺序一致）
+        """
+        # 内容文件在事务外写入，缩短持有写锁的时间
+        prepared = [self._prepare_record(**kwargs) for kwargs in records]
+
+        try:
+            with self._transaction() as conn:
+                for record, input_signature in prepared:
+                    packed_signature = self.dedup_index.hasher.pack(input_signature) if input_signature else None
+                    conn.execute(
+                        f"INSERT INTO history_records ({', '.join(RECORD_COLUMNS + INTERNAL_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + len(INTERNAL_COLUMNS)))})",
+                        self._record_values(record) + (packed_signature, record["stored_size"], record["generation_key"])
+                    )
+                    self.stats.record_added(conn, record)
+                    self.search_index.add(conn, record["record_id"], record["original_filename"],
+                                          record["_search_content"])
+                    self.dedup_index.add(conn, record["record_id"], input_signature)
+
+                # 设置了最大记录数时，删除超出的最旧记录
+                expired_rows = []
+                if self.max_records:
+                    expired_rows = conn.execute(
+                        f"SELECT {STATS_COLUMNS} FROM history_records "
+                        "ORDER BY created_at DESC, record_id DESC LIMIT -1 OFFSET ?",
+                        (self.max_records,)
+                    ).fetchall()
+                    self._delete_rows(conn, expired_rows)
+        except Exception:
+            # 写入失败时删除已保存的内容文件
+            self._remove_content_files([record["file_path"] for record, _ in prepared])
+            raise
+
+        if expired_rows:
+            self._remove_content_files([row["file_path"] for row in expired_rows])
+
+        return [record["record_id"] for record, _ in prepared]
+
+    def compute_input_signature(self, input_text: str) -> Optional[List[int]]:
+        """计算生成输入文本的MinHash签名，文本为空时返回None"""
+        return self.dedup_index.hasher.signature(input_text)
+
+    def find_similar_inputs(self, input_signature: List[int], threshold: float, limit: int = 5,
+                            generation_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """查找输入与给定签名近似相同的已完成记录
+
+        Args:
+            input_signature: 输入文本的MinHash签名
+            threshold: 相似度阈值（估算的Jaccard相似度，0~1）
+            limit: 最多返回的记录数
+            generation_key: 生成参数标识，指定时只查找生成参数相同的记录
+
+        Returns:
+            按相似度降序的记录列表，包含 record_id、original_filename、generation_time、similarity
+        """
+        if not input_signature:
+            return []
+        matches = self.dedup_index.find_similar(self._get_connection(), input_signature, threshold,
+                                                limit, generation_key)
+        return [{
+            "record_id": row["record_id"],
+            "original_filename": row["original_filename"],
+            "generation_time": row["generation_time"],
+            "similarity": similarity
+        } for row, similarity in matches]
+
+    @staticmethod
+    def encode_cursor(created_at: str, record_id: str) -> str:
+        """生成分页游标（上一页最后一条记录的位置）"""
+        return f"{created_at}|{record_id}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        """解析分页游标"""
+        created_at, _, record_id = cursor.partition("|")
+        if not created_at or not record_id:
+            raise ValueError(f"无效的分页游标: {cursor}")
+        return created_at, record_id
+
+    def _build_filters(self, params: HistoryQueryParams) -> Tuple[List[str], List[Any]]:
+        """根据查询参数构建WHERE条件"""
+        conditions, values = [], []
+
         if params.status_filter:
-            filtered_records = [r for r in filtered_records if r.get("status") == params.status_filter]
-        
+            conditions.append("status = ?")
+            values.append(params.status_filter)
+
         if params.model_filter:
-            filtered_records = [r for r in filtered_records if r.get("model_provider") == params.model_filter]
-        
+            conditions.append("model_provider = ?")
+            values.append(params.model_filter)
+
         if params.date_from:
-            filtered_records = [r for r in filtered_records if r.get("created_at", "") >= params.date_from]
-        
+            conditions.append("created_at >= ?")
+            values.append(params.date_from)
+
         if params.date_to:
-            filtered_records = [r for r in filtered_records if r.get("created_at", "") <= params.date_to]
-        
-        # 分页
-        total_count = len(filtered_records)
-        start_idx = params.offset or 0
-        end_idx = start_idx + (params.limit or 20)
-        
-        paginated_records = filtered_records[start_idx:end_idx]
-        
-        # 转换为模型对象
-        record_objects = []
-        for record_data in paginated_records:
-            # 如果内容为空，尝试从文件加载
-            if not record_data.get("tender_content") and record_data.get("file_path"):
-                content = self._load_content_from_file(record_data["file_path"])
-                if content:
-                    record_data["tender_content"] = content
-            
-            record_objects.append(TenderHistoryRecord(**record_data))
-        
+            conditions.append("created_at <= ?")
+            values.append(params.date_to)
+
+        return conditions, values
+
+    def get_records(self, params: HistoryQueryParams) -> HistoryListResponse:
+        """获取历史记录列表
+
+        传入 cursor 时使用游标分页（从上一页最后一条记录之后继续），
+        否则按 offset 分页。
+        """
+        conn = self._get_connection()
+        conditions, values = self._build_filters(params)
+        limit = params.limit or 20
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        total_count = conn.execute(f"SELECT COUNT(*) FROM history_records {where}", values).fetchone()[0]
+
+        page_conditions, page_values = list(conditions), list(values)
+        offset = 0
+        if params.cursor:
+            created_at, record_id = self.decode_cursor(params.cursor)
+            page_conditions.append("(created_at, record_id) < (?, ?)")
+            page_values.extend([created_at, record_id])
+        else:
+            offset = params.offset or 0
+
+        page_where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+        # 多取一条用于判断是否还有下一页
+        rows = conn.execute(
+            f"SELECT {', '.join(META_COLUMNS)} FROM history_records {page_where} "
+            f"ORDER BY created_at DESC, record_id DESC LIMIT ? OFFSET ?",
+            page_values + [limit + 1, offset]
+        ).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = self.encode_cursor(rows[-1]["created_at"], rows[-1]["record_id"]) if has_more else None
+
         return HistoryListResponse(
             total_count=total_count,
-            records=record_objects,
-            has_more=end_idx < total_count
+            records=[HistoryRecordMeta(**dict(row)) for row in rows],
+            has_more=has_more,
+            next_cursor=next_cursor
+        )
+
+    def search_records(self, query: str, limit: int = 20, offset: int = 0,
+                       status_filter: Optional[str] = None,
+                       model_filter: Optional[str] = None) -> HistorySearchResponse:
+        """全文检索历史记录，按相关度排序并返回高亮摘要
+
+        Raises:
+            ValueError: 查询中没有可检索的词
+            RuntimeError: 当前SQLite不支持全文检索
+        """
+        conditions, values = self._build_filters(
+            HistoryQueryParams(status_filter=status_filter, model_filter=model_filter)
+        )
+        total_count, rows = self.search_index.search(
+            self._get_connection(), query, META_COLUMNS, limit, offset, conditions, values
+        )
+
+        results = []
+        for row in rows:
+            record_data = dict(row)
+            score = record_data.pop("score")
+            content = None
+            if record_data.get("file_path"):
+                content = self._load_content_from_file(record_data["file_path"])
+            snippet = make_snippet(content or record_data.get("tender_summary") or "", query)
+            results.append(HistorySearchHit(**record_data, score=score, snippet=snippet))
+
+        return HistorySearchResponse(
+            total_count=total_count,
+            results=results,
+            has_more=offset + len(results) < total_count
         )
-    
+
     def get_record_by_id(self, record_id: str) -> Optional[TenderHistoryRecord]:
         """根据ID获取单个记录"""
-        records = self._load_records()
-        
-        for record_data in records:
-            if record_data.get("record_id") == record_id:
-                # 如果内容为空，尝试从文件加载
-                if not record_data.get("tender_content") and record_data.get("file_path"):
-                    content = self._load_content_from_file(record_data["file_path"])
-                    if content:
-                        record_data["tender_content"] = content
-                
-                return TenderHistoryRecord(**record_data)
-        
-        return None
-    
+        row = self._get_connection().execute(
+            f"SELECT {', '.join(RECORD_COLUMNS)} FROM history_records WHERE record_id = ?", (record_id,)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def get_content_info(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """获取记录内容的存储信息（不读取正文）
+
+        Returns:
+            包含 size（原始字节数）、file_path、inline_content 的字典，记录不存在时返回None
+        """
+        row = self._get_connection().execute(
+            "SELECT tender_content, tender_summary, file_path, content_size, generation_time "
+            "FROM history_records WHERE record_id = ?", (record_id,)
+        ).fetchone()
+        if not row:
+            return None
+
+        file_path = row["file_path"]
+        if file_path and os.path.exists(file_path):
+            size = row["content_size"]
+            if size is None:
+                # 旧版未压缩的内容文件
+                size = os.path.getsize(file_path)
+            return {"size": size, "file_path": file_path, "inline_content": None,
+                    "generation_time": row["generation_time"]}
+
+        # 内容文件不存在时退回数据库中保存的内容或摘要
+        inline_content = (row["tender_content"] or row["tender_summary"] or "").encode('utf-8')
+        return {"size": len(inline_content), "file_path": None, "inline_content": inline_content,
+                "generation_time": row["generation_time"]}
+
+    def iter_records_meta(self, params: HistoryQueryParams,
+                          page_size: int = EXPORT_PAGE_SIZE) -> Iterator[HistoryRecordMeta]:
+        """按查询条件逐页遍历记录元数据（游标分页，不统计总数，忽略 limit/offset/cursor）
+
+        流式导出时生成器的每次推进可能在不同的线程中执行，每页都取当前线程的连接
+        """
+        conditions, values = self._build_filters(params)
+        cursor = None
+        while True:
+            page_conditions, page_values = list(conditions), list(values)
+            if cursor:
+                page_conditions.append("(created_at, record_id) < (?, ?)")
+                page_values.extend(cursor)
+            where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+            rows = self._get_connection().execute(
+                f"SELECT {', '.join(META_COLUMNS)} FROM history_records {where} "
+                f"ORDER BY created_at DESC, record_id DESC LIMIT ?",
+                page_values + [page_size]
+            ).fetchall()
+            for row in rows:
+                yield HistoryRecordMeta(**dict(row))
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["record_id"])
+
+    def iter_export_zip(self, params: HistoryQueryParams, max_records: Optional[int] = None,
+                        chunk_size: int = CONTENT_CHUNK_SIZE) -> Iterator[bytes]:
+        """将符合条件的记录导出为zip并流式输出
+
+        每条记录对应一个目录 <创建日期>_<记录ID>/，包含 metadata.json 和 content.md（内容为空时省略）。
+        内容文件边解压边压缩写入，内存占用只与块大小有关。
+
+        Args:
+            params: 查询条件（状态、模型、日期范围）
+            max_records: 最多导出的记录数，为空时导出全部
+            chunk_size: 读取内容的块大小
+        """
+        buffer = _ZipStreamBuffer()
+        exported = 0
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+            for meta in self.iter_records_meta(params):
+                if max_records is not None and exported >= max_records:
+                    break
+                folder = f"{(meta.created_at or '')[:10]}_{meta.record_id}"
+
+                metadata = {column: getattr(meta, column, None) for column in META_COLUMNS if column != "file_path"}
+                archive.writestr(f"{folder}/metadata.json",
+                                 json.dumps(metadata, ensure_ascii=False, indent=2))
+
+                content_info = self.get_content_info(meta.record_id)
+                if content_info and content_info["size"] > 0:
+                    # 预先给出原始大小，zipfile 据此判断是否需要zip64
+                    entry_info = zipfile.ZipInfo(f"{folder}/content.md",
+                                                 date_time=datetime.now().timetuple()[:6])
+                    entry_info.compress_type = zipfile.ZIP_DEFLATED
+                    entry_info.file_size = content_info["size"]
+                    with archive.open(entry_info, 'w') as entry:
+                        for chunk in self.iter_content(content_info, chunk_size=chunk_size):
+                            entry.write(chunk)
+                            data = buffer.drain()
+                            if data:
+                                yield data
+
+                data = buffer.drain()
+                if data:
+                    yield data
+                exported += 1
+        yield buffer.drain()
+
+    def iter_content(self, content_info: Dict[str, Any], start: int = 0, end: Optional[int] = None,
+                     chunk_size: int = CONTENT_CHUNK_SIZE) -> Iterator[bytes]:
+        """流式读取内容的 [start, end] 字节区间（含end），压缩文件边解压边输出"""
+        end = content_info["size"] - 1 if end is None else end
+        remaining = end - start + 1
+        if remaining <= 0:
+            return
+
+        if content_info["file_path"] is None:
+            yield content_info["inline_content"][start:end + 1]
+            return
+
+        with self._open_content(content_info["file_path"]) as f:
+            # gzip 文件的 seek 会从头解压到目标位置，内存占用与块大小一致
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def _delete_rows(self, conn: sqlite3.Connection, rows: List[sqlite3.Row]):
+        """在当前事务中删除记录并回退统计和索引（rows 需包含 STATS_COLUMNS）"""
+        if not rows:
+            return
+        record_ids = [row["record_id"] for row in rows]
+        conn.executemany("DELETE FROM history_records WHERE record_id = ?",
+                         [(record_id,) for record_id in record_ids])
+        self.stats.records_removed(conn, [dict(row) for row in rows])
+        self.search_index.remove(conn, record_ids)
+        self.dedup_index.remove(conn, record_ids)
+
+    def delete_records(self, record_ids: List[str]) -> Tuple[int, int]:
+        """在一个事务中批量删除记录
+
+        Returns:
+            (删除的记录数, 释放的磁盘字节数)
+        """
+        if not record_ids:
+            return 0, 0
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT {STATS_COLUMNS} FROM history_records "
+                f"WHERE record_id IN ({', '.join('?' * len(record_ids))})",
+                list(record_ids)
+            ).fetchall()
+            self._delete_rows(conn, rows)
+
+        reclaimed = self._remove_content_files([row["file_path"] for row in rows])
+        return len(rows), reclaimed
+
     def delete_record(self, record_id: str) -> bool:
         """删除指定记录"""
-        records = self._load_records()
-        
-        for i, record in enumerate(records):
-            if record.get("record_id") == record_id:
-                # 删除内容文件
-                if record.get("file_path") and os.path.exists(record["file_path"]):
-                    try:
-                        os.remove(record["file_path"])
-                    except OSError:
-                        pass
-                
-                # 从列表中移除
-                records.pop(i)
-                self._save_records(records)
-                return True
-        
-        return False
-    
+        deleted, _ = self.delete_records([record_id])
+        return deleted > 0
+
+    def find_expired_record_ids(self, before: str, status: Optional[str] = None,
+                                limit: int = 500) -> List[str]:
+        """查找创建时间早于 before 的记录ID（最旧的在前）"""
+        conditions, values = ["created_at < ?"], [before]
+        if status:
+            conditions.append("status = ?")
+            values.append(status)
+        rows = self._get_connection().execute(
+            f"SELECT record_id FROM history_records WHERE {' AND '.join(conditions)} "
+            f"ORDER BY created_at, record_id LIMIT ?",
+            values + [limit]
+        ).fetchall()
+        return [row["record_id"] for row in rows]
+
+    def find_oldest_records(self, limit: int = 500) -> List[Dict[str, Any]]:
+        """最旧的记录ID及其磁盘占用"""
+        rows = self._get_connection().execute(
+            "SELECT record_id, COALESCE(stored_size, 0) AS stored_size FROM history_records "
+            "ORDER BY created_at, record_id LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_archivable_records(self, before: str, limit: int = 500,
+                                after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """查找创建时间早于 before 且内容尚未归档的记录（按创建时间升序）
+
+        Args:
+            after: 上一批最后一条记录的 (created_at, record_id)，从其后继续查找
+        """
+        conditions, values = ["created_at < ?", "file_path IS NOT NULL", "file_path NOT LIKE '%.xz'"], [before]
+        if after:
+            conditions.append("(created_at, record_id) > (?, ?)")
+            values.extend(after)
+        rows = self._get_connection().execute(
+            f"SELECT record_id, created_at FROM history_records WHERE {' AND '.join(conditions)} "
+            f"ORDER BY created_at, record_id LIMIT ?",
+            values + [limit]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_storage_usage(self) -> Dict[str, int]:
+        """记录数和内容文件的磁盘占用（热数据/冷归档）"""
+        row = self._get_connection().execute(
+            "SELECT COUNT(*) AS records, "
+            "COALESCE(SUM(CASE WHEN file_path LIKE '%.xz' THEN 0 ELSE stored_size END), 0) AS hot_bytes, "
+            "COALESCE(SUM(CASE WHEN file_path LIKE '%.xz' THEN stored_size ELSE 0 END), 0) AS cold_bytes "
+            "FROM history_records"
+        ).fetchone()
+        return {"records": row["records"], "hot_bytes": row["hot_bytes"], "cold_bytes": row["cold_bytes"],
+                "total_bytes": row["hot_bytes"] + row["cold_bytes"]}
+
+    def fill_missing_stored_sizes(self, limit: int = 500) -> int:
+        """为旧记录补充磁盘占用（stored_size），返回本次补充的记录数"""
+        rows = self._get_connection().execute(
+            "SELECT record_id, file_path FROM history_records WHERE stored_size IS NULL LIMIT ?", (limit,)
+        ).fetchall()
+        if not rows:
+            return 0
+        sizes = [(os.path.getsize(row["file_path"]) if row["file_path"] and os.path.exists(row["file_path"]) else 0,
+                  row["record_id"]) for row in rows]
+        with self._transaction() as conn:
+            conn.executemany("UPDATE history_records SET stored_size = ? WHERE record_id = ?", sizes)
+        return len(rows)
+
+    def archive_content(self, record_id: str, archive_dir: str, preset: int = 6) -> Optional[int]:
+        """将记录内容转存为xz压缩的冷归档文件
+
+        归档文件按创建月份存放在 archive_dir/<YYYY-MM>/ 下，写入完成并更新记录后删除原文件。
+
+        Returns:
+            节省的磁盘字节数（归档文件不比原文件小时为0）；记录不存在、已归档或内容文件缺失时为None
+        """
+        row = self._get_connection().execute(
+            "SELECT file_path, created_at FROM history_records WHERE record_id = ?", (record_id,)
+        ).fetchone()
+        if not row or not row["file_path"] or row["file_path"].endswith(".xz") \
+                or not os.path.exists(row["file_path"]):
+            return None
+
+        source_path = row["file_path"]
+        target_dir = Path(archive_dir) / (row["created_at"] or "")[:7]
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target_path = target_dir / f"{record_id}.txt.xz"
+        temp_path = target_dir / f"{record_id}.txt.xz.tmp"
+
+        with self._open_content(source_path) as source, lzma.open(temp_path, 'wb', preset=preset) as target:
+            while True:
+                chunk = source.read(CONTENT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+        os.replace(temp_path, target_path)
+
+        stored_size = os.path.getsize(target_path)
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE history_records SET file_path = ?, stored_size = ? WHERE record_id = ? AND file_path = ?",
+                (str(target_path), stored_size, record_id, source_path)
+            ).rowcount
+        if not updated:
+            # 归档期间记录被删除或已被其他进程归档
+            self._remove_content_files([str(target_path)])
+            return None
+
+        return max(self._remove_content_files([source_path]) - stored_size, 0)
+
     def get_statistics(self) -> HistoryStatsResponse:
-        """获取历史记录统计信息"""
-        records = self._load_records()
-        
-        if not records:
+        """获取历史记录统计信息（读取增量聚合，不扫描记录）"""
+        conn = self._get_connection()
+        summary = self.stats.summary(conn)
+
+        if not summary["total_records"]:
             return HistoryStatsResponse(
                 total_records=0,
                 completed_count=0,
                 failed_count=0,
                 most_used_model="N/A"
             )
-        
-        completed_count = len([r for r in records if r.get("status") == "completed"])
-        failed_count = len([r for r in records if r.get("status") == "failed"])
-        
-        # 统计最常用模型
-        model_counts = {}
-        processing_times = []
-        
-        for record in records:
-            model = record.get("model_provider", "unknown")
-            model_counts[model] = model_counts.get(model, 0) + 1
-            
-            if record.get("processing_duration"):
-                processing_times.append(record["processing_duration"])
-        
-        most_used_model = max(model_counts.items(), key=lambda x: x[1])[0] if model_counts else "N/A"
-        avg_processing_time = sum(processing_times) / len(processing_times) if processing_times else None
-        latest_generation = records[0].get("created_at") if records else None
-        
+
+        provider_counts = summary["provider_counts"]
+        # created_at 有索引，MAX 只读取索引的一端
+        latest = conn.execute("SELECT MAX(created_at) FROM history_records").fetchone()[0]
+
         return HistoryStatsResponse(
-            total_records=len(records),
-            completed_count=completed_count,
-            failed_count=failed_count,
-            most_used_model=most_used_model,
-            average_processing_time=avg_processing_time,
-            latest_generation=latest_generation
+            total_records=summary["total_records"],
+            completed_count=summary["status_counts"].get("completed", 0),
+            failed_count=summary["status_counts"].get("failed", 0),
+            most_used_model=max(provider_counts, key=provider_counts.get),
+            average_processing_time=summary["average_processing_time"],
+            latest_generation=latest,
+            status_counts=summary["status_counts"],
+            provider_counts=provider_counts,
+            duration_percentiles=summary["duration_percentiles"]
         )
-    
+
+    def get_throughput(self, granularity: str = "hour", date_from: Optional[str] = None,
+                       date_to: Optional[str] = None, model_provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按小时/天统计各模型提供商的生成数量
+
+        Raises:
+            ValueError: 不支持的时间粒度
+        """
+        return self.stats.throughput(self._get_connection(), granularity, date_from, date_to, model_provider)
+
     def clear_all_records(self) -> int:
         """清空所有历史记录"""
-        records = self._load_records()
-        count = len(records)
-        
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT file_path FROM history_records").fetchall()
+            conn.execute("DELETE FROM history_records")
+            self.stats.reset(conn)
+            self.search_index.reset(conn)
+            self.dedup_index.reset(conn)
+
         # 删除所有内容文件
-        for record in records:
-            if record.get("file_path") and os.path.exists(record["file_path"]):
-                try:
-                    os.remove(record["file_path"])
-                except OSError:
-                    pass
-        
-        # 清空记录
-        self._save_records([])
-        
-        return count
+        self._remove_content_files([row["file_path"] for row in rows])
+
+        return len(rows)
 
 # 全局历史管理器实例
-history_manager = HistoryManager()
\ No newline at end of file
+history_manager = HistoryManager()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史记录后台写入器
+
+功能说明：
+- 生成任务只把记录放入内存队列并立即返回记录ID，任务完成耗时不受历史存储速度影响
+- 后台线程按数量或时间间隔批量取出记录，在一个事务中写入
+- 批量写入失败时逐条重试，单条错误记录不影响同批其他记录
+- 应用关闭时（main.py 的 lifespan）写完队列中剩余的记录再退出
+- 写入器未启动（如脚本中直接使用）或队列已满时退回同步写入
+"""
+
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .history_manager import HistoryManager, history_manager
+
+logger = logging.getLogger(__name__)
+
+# 唤醒标记：停止时放入队列，让等待中的写入线程立即检查停止信号
+_STOP = object()
+
+
+class HistoryWriter:
+    """历史记录后台批量写入器"""
+
+    def __init__(self, manager: HistoryManager, batch_size: int = 50,
+                 flush_interval: float = 1.0, max_queue_size: int = 10000):
+        """
+        Args:
+            manager: 历史记录管理器
+            batch_size: 每批最多写入的记录数，队列中积累到该数量立即写入
+            flush_interval: 最长等待时间（秒），未积累满一批时到时也会写入
+            max_queue_size: 队列容量，队列满时退回同步写入
+        """
+        self.manager = manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        # 写入计数同时由写入线程和同步写入的调用方更新
+        self._stats_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台写入线程"""
+        with self._lock:
+            if self.running:
+                # 上次停止超时、写入线程仍在运行时继续使用该线程，不另起第二个写入线程
+                self._stop_event.clear()
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+            logger.info(f"历史记录后台写入器已启动（批量 {self.batch_size} 条，间隔 {self.flush_interval} 秒）")
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """停止写入线程，等待队列中剩余的记录写完"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stop_event.set()
+            # 队列已满时不放唤醒标记，写入线程取完当前批次后即会检查停止信号；不能阻塞等待，
+            # 写入线程已异常退出时队列不会再被取出
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+            if thread.is_alive():
+                # 保留线程句柄：线程仍在写入，再次 start() 时不能另起写入线程
+                logger.warning(f"历史记录写入器未能在 {timeout} 秒内写完，剩余约 {self._queue.qsize()} 条")
+                return
+            # 停止过程中新提交的记录直接同步写入
+            leftovers = []
+            while True:
+                try:
+                    leftovers.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            leftovers = [item for item in leftovers if item is not _STOP]
+            if leftovers:
+                self._write_batch(leftovers)
+            logger.info(f"历史记录写入器已停止，共写入 {self.written} 条，失败 {self.failed} 条")
+            self._thread = None
+
+    def submit(self, **record: Any) -> str:
+        """提交一条历史记录（参数与 HistoryManager.add_record 相同），立即返回记录ID"""
+        record.setdefault("record_id", None)
+        record["record_id"] = record["record_id"] or str(uuid.uuid4())
+        # 以提交时间作为创建时间，不受排队时间影响
+        record["created_at"] = record.get("created_at") or datetime.now().isoformat()
+
+        if self.running:
+            try:
+                self._queue.put_nowait(record)
+                return record["record_id"]
+            except queue.Full:
+                logger.warning("历史记录写入队列已满，改为同步写入")
+
+        self._write_batch([record])
+        return record["record_id"]
+
+    def get_status(self) -> Dict[str, Any]:
+        """写入器状态"""
+        with self._stats_lock:
+            return {
+                "running": self.running,
+                "pending": self._queue.qsize(),
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches
+            }
+
+    def _run(self):
+        """后台线程：按数量或时间间隔取出一批记录写入，收到停止信号后写完剩余记录退出"""
+        while True:
+            stopping = self._stop_event.is_set()
+            try:
+                item = self._queue.get_nowait() if stopping else self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if stopping:
+                    return
+                continue
+
+            batch: List[Dict[str, Any]] = [] if item is _STOP else [item]
+            # 取出已在队列中的记录，凑满一批
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """在一个事务中写入一批记录，失败时逐条重试"""
+        try:
+            self.manager.add_records(batch)
+            with self._stats_lock:
+                self.written += len(batch)
+                self.batches += 1
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                with self._stats_lock:
+                    self.failed += 1
+                logger.error(f"写入历史记录失败 {batch[0].get('record_id')}: {str(e)}")
+                return
+            logger.warning(f"批量写入 {len(batch)} 条历史记录失败，改为逐条写入: {str(e)}")
+
+        for record in batch:
+            self._write_batch([record])
+
+
+# 全局写入器实例
+history_writer = HistoryWriter(history_manager)
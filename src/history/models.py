@@ -8,8 +8,8 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 
-class TenderHistoryRecord(BaseModel):
-    """招标文件生成历史记录模型"""
+class HistoryRecordMeta(BaseModel):
+    """历史记录元数据（列表接口返回，不含招标书正文）"""
     record_id: str
     task_id: str
     original_filename: str
@@ -20,10 +20,14 @@ class TenderHistoryRecord(BaseModel):
     processing_duration: Optional[float] = None  # 处理耗时（秒）
     status: str  # completed, failed
     error_message: Optional[str] = None
-    tender_content: str
     tender_summary: Optional[str] = None
     created_at: str
     file_path: Optional[str] = None  # 保存的文件路径
+    content_size: Optional[int] = None  # 招标书正文大小（字节）
+
+class TenderHistoryRecord(HistoryRecordMeta):
+    """招标文件生成历史记录模型"""
+    tender_content: str
     
 class HistoryQueryParams(BaseModel):
     """历史记录查询参数"""
@@ -33,12 +37,14 @@ class HistoryQueryParams(BaseModel):
     model_filter: Optional[str] = None
     date_from: Optional[str] = None
     date_to: Optional[str] = None
+    cursor: Optional[str] = None  # 游标分页：上一页返回的 next_cursor
     
 class HistoryListResponse(BaseModel):
     """历史记录列表响应"""
     total_count: int
-    records: List[TenderHistoryRecord]
+    records: List[HistoryRecordMeta]
     has_more: bool
+    next_cursor: Optional[str] = None  # 下一页游标，没有更多记录时为空
     
 class HistoryStatsResponse(BaseModel):
     """历史记录统计响应"""
@@ -47,4 +53,27 @@ class HistoryStatsResponse(BaseModel):
     failed_count: int
     most_used_model: str
     average_processing_time: Optional[float] = None
-    latest_generation: Optional[str] = None
\ No newline at end of file
+    latest_generation: Optional[str] = None
+    status_counts: Dict[str, int] = {}
+    provider_counts: Dict[str, int] = {}
+    duration_percentiles: Dict[str, float] = {}
+
+class ThroughputBucket(BaseModel):
+    """按时间桶统计的生成数量"""
+    period: str
+    model_provider: str
+    count: int
+    completed: int
+    failed: int
+    average_processing_time: Optional[float] = None
+
+class HistorySearchHit(HistoryRecordMeta):
+    """全文检索命中的记录"""
+    score: float  # 相关度（BM25，越大越相关）
+    snippet: str  # 命中位置附近的摘要，命中词用 <mark> 标记
+
+class HistorySearchResponse(BaseModel):
+    """全文检索响应"""
+    total_count: int
+    results: List[HistorySearchHit]
+    has_more: bool
\ No newline at end of file
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史输入近似重复检测
+
+功能说明：
+- 对生成招标书的输入文本计算MinHash签名（字符5-gram切片），与历史记录一同保存
+- 签名按LSH分段（band）建立索引，查询时只比较落入相同分段桶的候选记录
+- 按签名估算的Jaccard相似度判定输入是否与历史输入近似相同
+"""
+
+import re
+import random
+import struct
+import hashlib
+import sqlite3
+import zlib
+from typing import Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，未安装时使用纯Python实现
+    np = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_lsh (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, record_id)
+);
+CREATE INDEX IF NOT EXISTS idx_history_lsh_record ON history_lsh (record_id);
+"""
+
+# 大于 2^32 的素数，(a*h + b) mod p 作为哈希置换
+_MERSENNE_PRIME = 4294967311
+_WHITESPACE_RE = re.compile(r'\s+')
+
+NUM_PERM = 128
+NUM_BANDS = 32
+SHINGLE_SIZE = 5
+
+
+class MinHasher:
+    """MinHash签名计算
+
+    签名长度 num_perm，分为 num_bands 段做LSH：两条输入的真实相似度为 s 时，
+    至少一段完全相同（成为候选）的概率为 1-(1-s^r)^b（r = num_perm/num_bands），
+    默认参数下 s=0.8 时接近 1，s=0.5 时约为 0.87，s=0.3 时约为 0.23。
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        if num_perm % num_bands:
+            raise ValueError("num_perm 必须是 num_bands 的整数倍")
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+        self.shingle_size = shingle_size
+        # 固定随机种子，签名在进程间保持一致，可持久化
+        rng = random.Random(seed)
+        self._perms = [(rng.randint(1, 2 ** 31 - 1), rng.randint(0, 2 ** 31 - 1)) for _ in range(num_perm)]
+
+    def shingles(self, text: str) -> set:
+        """去除空白后按字符 shingle_size-gram 切片，返回切片的32位哈希集合"""
+        normalized = _WHITESPACE_RE.sub('', text or '').lower()
+        size = self.shingle_size
+        if len(normalized) <= size:
+            return {zlib.crc32(normalized.encode('utf-8'))} if normalized else set()
+        encoded = [normalized[i:i + size].encode('utf-8') for i in range(len(normalized) - size + 1)]
+        return {zlib.crc32(shingle) for shingle in encoded}
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        """计算MinHash签名，文本为空时返回None"""
+        hashes = self.shingles(text)
+        if not hashes:
+            return None
+        prime = _MERSENNE_PRIME
+        if np is not None:
+            # a < 2^31、h < 2^32，a*h+b 不会超出 uint64，结果与纯Python实现一致
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+            return [int(((np.uint64(a) * values + np.uint64(b)) % np.uint64(prime)).min())
+                    for a, b in self._perms]
+        return [min((a * h + b) % prime for h in hashes) for a, b in self._perms]
+
+    @staticmethod
+    def similarity(signature_a: List[int], signature_b: List[int]) -> float:
+        """由签名估算Jaccard相似度"""
+        if not signature_a or len(signature_a) != len(signature_b):
+            return 0.0
+        return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+    def bands(self, signature: List[int]) -> List[Tuple[int, str]]:
+        """将签名切分为LSH分段，返回 (分段序号, 分段哈希)"""
+        result = []
+        for band in range(self.num_bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.md5(struct.pack(f'<{self.rows}Q', *values)).hexdigest()[:16]
+            result.append((band, digest))
+        return result
+
+    @staticmethod
+    def pack(signature: List[int]) -> bytes:
+        return struct.pack(f'<{len(signature)}Q', *signature)
+
+    @staticmethod
+    def unpack(data: bytes) -> List[int]:
+        return list(struct.unpack(f'<{len(data) // 8}Q', data))
+
+
+class HistoryDedupIndex:
+    """历史输入的LSH索引，所有写方法需在调用方的事务中执行"""
+
+    def __init__(self):
+        self.hasher = MinHasher()
+
+    def init_schema(self, conn: sqlite3.Connection):
+        conn.executescript(_SCHEMA)
+
+    def add(self, conn: sqlite3.Connection, record_id: str, signature: Optional[List[int]]):
+        """为记录的输入签名建立索引"""
+        if not signature:
+            return
+        conn.executemany(
+            "INSERT OR IGNORE INTO history_lsh (band, bucket, record_id) VALUES (?, ?, ?)",
+            [(band, bucket, record_id) for band, bucket in self.hasher.bands(signature)]
+        )
+
+    def remove(self, conn: sqlite3.Connection, record_ids: List[str]):
+        """删除记录的索引"""
+        if record_ids:
+            conn.executemany("DELETE FROM history_lsh WHERE record_id = ?",
+                             [(record_id,) for record_id in record_ids])
+
+    def reset(self, conn: sqlite3.Connection):
+        """清空索引"""
+        conn.execute("DELETE FROM history_lsh")
+
+    def find_similar(self, conn: sqlite3.Connection, signature: List[int], threshold: float,
+                     limit: int = 5, generation_key: Optional[str] = None) -> List[Tuple[sqlite3.Row, float]]:
+        """查找输入相似度不低于阈值的已完成记录，按相似度降序；指定 generation_key 时只比较生成参数相同的记录
+
+        Returns:
+            [(记录行, 相似度)]，记录行包含 record_id、original_filename、generation_time、input_signature
+        """
+        bands = self.hasher.bands(signature)
+        conditions = ' OR '.join('(band = ? AND bucket = ?)' for _ in bands)
+        values: List[Any] = [value for pair in bands for value in pair]
+        key_condition = ""
+        if generation_key is not None:
+            key_condition = "AND r.generation_key = ? "
+            values.insert(0, generation_key)
+        rows = conn.execute(
+            f"SELECT r.record_id, r.original_filename, r.generation_time, r.input_signature "
+            f"FROM history_records r WHERE r.status = 'completed' AND r.input_signature IS NOT NULL "
+            f"{key_condition}AND r.record_id IN (SELECT DISTINCT record_id FROM history_lsh WHERE {conditions})",
+            values
+        ).fetchall()
+
+        matches = []
+        for row in rows:
+            score = self.hasher.similarity(signature, self.hasher.unpack(row["input_signature"]))
+            if score >= threshold:
+                matches.append((row, score))
+        matches.sort(key=lambda item: (item[1], item[0]["generation_time"]), reverse=True)
+        return matches[:limit]
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史记录保留策略引擎
+
+功能说明：
+- 按 config/history_retention_config.ini 配置的策略定期清理历史记录
+- 时间策略：超过保留天数的记录删除（失败记录可单独设置更短的保留期）；
+  超过归档天数的记录内容转存为xz压缩的冷归档文件
+- 容量策略：记录数和内容文件总磁盘占用超出上限时，从最旧的记录开始删除
+- 清理按批次执行，每批一个事务，不会长时间占用写锁
+- 统计删除/归档的记录数和释放的磁盘字节数
+"""
+
+import os
+import time
+import logging
+import threading
+import configparser
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from .history_manager import HistoryManager, history_manager
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CONFIG_FILE = PROJECT_ROOT / "config" / "history_retention_config.ini"
+
+
+class RetentionConfig:
+    """保留策略配置"""
+
+    def __init__(self, config_file: Optional[str] = None):
+        self.config_file = str(config_file or DEFAULT_CONFIG_FILE)
+        self.config = configparser.ConfigParser()
+        self.reload()
+
+    def reload(self):
+        """重新读取配置文件（文件不存在时使用默认值）"""
+        self.config = configparser.ConfigParser()
+        if os.path.exists(self.config_file):
+            self.config.read(self.config_file, encoding='utf-8')
+        else:
+            logger.warning(f"保留策略配置文件不存在，使用默认配置: {self.config_file}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.getboolean('Retention', 'Enabled', fallback=True)
+
+    @property
+    def sweep_interval(self) -> float:
+        return self.config.getfloat('Retention', 'SweepInterval', fallback=3600)
+
+    @property
+    def batch_size(self) -> int:
+        return self.config.getint('Retention', 'BatchSize', fallback=500)
+
+    @property
+    def max_age_days(self) -> int:
+        return self.config.getint('TimePolicy', 'MaxAgeDays', fallback=0)
+
+    @property
+    def failed_max_age_days(self) -> int:
+        return self.config.getint('TimePolicy', 'FailedMaxAgeDays', fallback=0)
+
+    @property
+    def archive_after_days(self) -> int:
+        return self.config.getint('TimePolicy', 'ArchiveAfterDays', fallback=30)
+
+    @property
+    def max_records(self) -> int:
+        return self.config.getint('SizePolicy', 'MaxRecords', fallback=0)
+
+    @property
+    def max_storage_bytes(self) -> int:
+        return int(self.config.getfloat('SizePolicy', 'MaxStorageMB', fallback=0) * 1024 * 1024)
+
+    @property
+    def archive_dir(self) -> str:
+        """冷归档目录，相对路径按项目根目录解析（与启动时的工作目录无关）"""
+        return str(PROJECT_ROOT / self.config.get('Archive', 'Directory', fallback='src/history/archive'))
+
+    @property
+    def archive_preset(self) -> int:
+        return self.config.getint('Archive', 'Preset', fallback=6)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sweep_interval": self.sweep_interval,
+            "batch_size": self.batch_size,
+            "max_age_days": self.max_age_days,
+            "failed_max_age_days": self.failed_max_age_days,
+            "archive_after_days": self.archive_after_days,
+            "max_records": self.max_records,
+            "max_storage_bytes": self.max_storage_bytes,
+            "archive_dir": self.archive_dir
+        }
+
+
+class RetentionEngine:
+    """历史记录保留策略引擎"""
+
+    def __init__(self, manager: HistoryManager, config: RetentionConfig):
+        self.manager = manager
+        self.config = config
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        # 同一进程内同时只执行一次清理
+        self._sweep_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {
+            "sweeps": 0,
+            "records_deleted": 0,
+            "records_archived": 0,
+            "bytes_reclaimed": 0,
+            "by_policy": {policy: {"records": 0, "bytes": 0} for policy in ("age", "count", "size", "archive")},
+            "last_sweep": None,
+            "last_error": None
+        }
+
+    def start(self):
+        """启动定期清理线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if not self.config.enabled:
+            logger.info("历史记录保留策略未启用")
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="history-retention", daemon=True)
+        self._thread.start()
+        logger.info(f"历史记录保留策略已启动，清理间隔 {self.config.sweep_interval} 秒")
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """停止定期清理线程（正在执行的批次完成后退出）"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"历史记录清理失败: {str(e)}", exc_info=True)
+            self._stop_event.wait(self.config.sweep_interval)
+
+    def sweep(self) -> Dict[str, Any]:
+        """执行一次清理，返回本次清理结果"""
+        with self._sweep_lock:
+            started_at = time.perf_counter()
+            result = {policy: {"records": 0, "bytes": 0} for policy in ("age", "count", "size", "archive")}
+            try:
+                while not self._stopping() and self.manager.fill_missing_stored_sizes(self.config.batch_size):
+                    pass
+                self._expire_by_age(result["age"])
+                self._enforce_max_records(result["count"])
+                # 先归档再检查磁盘占用，归档节省的空间计入容量
+                self._archive_old_content(result["archive"])
+                self._enforce_max_storage(result["size"])
+                error = None
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                summary = {
+                    "finished_at": datetime.now().isoformat(),
+                    "duration": time.perf_counter() - started_at,
+                    "records_deleted": sum(result[p]["records"] for p in ("age", "count", "size")),
+                    "records_archived": result["archive"]["records"],
+                    "bytes_reclaimed": sum(item["bytes"] for item in result.values()),
+                    "by_policy": result,
+                    "error": error
+                }
+                self._record_metrics(summary)
+
+            if summary["records_deleted"] or summary["records_archived"]:
+                logger.info(f"历史记录清理完成：删除 {summary['records_deleted']} 条，"
+                            f"归档 {summary['records_archived']} 条，释放 {summary['bytes_reclaimed']} 字节")
+            return summary
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """累计清理统计、当前磁盘占用和生效的配置"""
+        with self._metrics_lock:
+            metrics = {**self._metrics, "by_policy": {k: dict(v) for k, v in self._metrics["by_policy"].items()}}
+        metrics["running"] = self._thread is not None and self._thread.is_alive()
+        metrics["storage"] = self.manager.get_storage_usage()
+        metrics["config"] = self.config.to_dict()
+        return metrics
+
+    def _stopping(self) -> bool:
+        return self._stop_event.is_set()
+
+    @staticmethod
+    def _cutoff(days: int) -> str:
+        return (datetime.now() - timedelta(days=days)).isoformat()
+
+    def _delete_batches(self, find_ids, counter: Dict[str, int]):
+        """按批删除，直到 find_ids 不再返回记录"""
+        while not self._stopping():
+            record_ids = find_ids()
+            if not record_ids:
+                return
+            deleted, reclaimed = self.manager.delete_records(record_ids)
+            counter["records"] += deleted
+            counter["bytes"] += reclaimed
+            if not deleted:
+                return
+
+    def _expire_by_age(self, counter: Dict[str, int]):
+        """时间策略：删除超过保留天数的记录"""
+        batch_size = self.config.batch_size
+        if self.config.failed_max_age_days > 0:
+            cutoff = self._cutoff(self.config.failed_max_age_days)
+            self._delete_batches(
+                lambda: self.manager.find_expired_record_ids(cutoff, status="failed", limit=batch_size), counter)
+        if self.config.max_age_days > 0:
+            cutoff = self._cutoff(self.config.max_age_days)
+            self._delete_batches(
+                lambda: self.manager.find_expired_record_ids(cutoff, limit=batch_size), counter)
+
+    def _enforce_max_records(self, counter: Dict[str, int]):
+        """容量策略：记录数超出上限时删除最旧的记录"""
+        max_records = self.config.max_records
+        if max_records <= 0:
+            return
+
+        def find_ids():
+            excess = self.manager.get_storage_usage()["records"] - max_records
+            if excess <= 0:
+                return []
+            return [r["record_id"] for r in self.manager.find_oldest_records(min(excess, self.config.batch_size))]
+
+        self._delete_batches(find_ids, counter)
+
+    def _enforce_max_storage(self, counter: Dict[str, int]):
+        """容量策略：内容文件总磁盘占用超出上限时删除最旧的记录"""
+        max_bytes = self.config.max_storage_bytes
+        if max_bytes <= 0:
+            return
+
+        def find_ids():
+            excess = self.manager.get_storage_usage()["total_bytes"] - max_bytes
+            record_ids = []
+            for record in self.manager.find_oldest_records(self.config.batch_size):
+                if excess <= 0:
+                    break
+                record_ids.append(record["record_id"])
+                excess -= record["stored_size"]
+            return record_ids
+
+        self._delete_batches(find_ids, counter)
+
+    def _archive_old_content(self, counter: Dict[str, int]):
+        """时间策略：超过归档天数的记录内容转存到冷归档目录"""
+        if self.config.archive_after_days <= 0:
+            return
+        cutoff = self._cutoff(self.config.archive_after_days)
+        after = None
+        while not self._stopping():
+            records = self.manager.find_archivable_records(cutoff, self.config.batch_size, after)
+            if not records:
+                return
+            # 游标前进，归档失败或被跳过的记录本次不再重复处理
+            after = (records[-1]["created_at"], records[-1]["record_id"])
+            for record in records:
+                try:
+                    saved = self.manager.archive_content(record["record_id"], self.config.archive_dir,
+                                                         self.config.archive_preset)
+                except Exception as e:
+                    # 单条归档失败（如文件损坏）不影响其他记录
+                    logger.warning(f"归档历史记录内容失败 {record['record_id']}: {str(e)}")
+                    continue
+                # 记录不存在、已归档或内容文件缺失时未归档，不计入
+                if saved is not None:
+                    counter["records"] += 1
+                    counter["bytes"] += saved
+
+    def _record_metrics(self, summary: Dict[str, Any]):
+        with self._metrics_lock:
+            self._metrics["sweeps"] += 1
+            self._metrics["records_deleted"] += summary["records_deleted"]
+            self._metrics["records_archived"] += summary["records_archived"]
+            self._metrics["bytes_reclaimed"] += summary["bytes_reclaimed"]
+            for policy, item in summary["by_policy"].items():
+                self._metrics["by_policy"][policy]["records"] += item["records"]
+                self._metrics["by_policy"][policy]["bytes"] += item["bytes"]
+            self._metrics["last_sweep"] = summary
+            self._metrics["last_error"] = summary["error"] or self._metrics["last_error"]
+
+
+# 全局保留策略引擎实例
+retention_engine = RetentionEngine(history_manager, RetentionConfig())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史记录全文检索索引
+
+功能说明：
+- 基于SQLite FTS5建立倒排索引，索引原始文件名和招标书内容
+- 索引表为无内容（contentless）表，只保存倒排索引，不保存切分后的文本副本
+- 中文按字符二元组（bigram）切分，英文/数字按单词切分，无需额外分词依赖
+- 写入/删除记录时在同一事务中增量更新索引
+- 按BM25排序，支持分页，结果附带高亮摘要
+"""
+
+import re
+import logging
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# SQLite 3.43 起无内容表支持按 rowid 直接删除索引项
+CONTENTLESS_DELETE = sqlite3.sqlite_version_info >= (3, 43, 0)
+
+# 无内容表读不回列值，索引项的 rowid 通过映射表对应到记录ID（自增ID不复用，残留索引项不会误关联新记录）
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS history_search_ids (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        record_id TEXT NOT NULL UNIQUE
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS history_search USING fts5(
+        original_filename,
+        content,
+        content = '',
+        {"contentless_delete = 1," if CONTENTLESS_DELETE else ""}
+        tokenize = 'unicode61'
+    )
+    """,
+)
+
+# 索引结构版本，变更后启动时自动重建
+SEARCH_VERSION = "2-delete" if CONTENTLESS_DELETE else "2"
+
+# 连续的中日韩字符 / 连续的字母数字
+_TOKEN_RE = re.compile(r'([㐀-䶿一-鿿豈-﫿]+)|([0-9A-Za-zÀ-ɏ]+)')
+
+# BM25 列权重：文件名、内容
+_BM25_WEIGHTS = (2.0, 1.0)
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+
+def tokenize(text: str) -> List[str]:
+    """索引切分：中文连续片段切为重叠的二元组，并追加末字单字（支持单字前缀查询）"""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(text or ""):
+        if word:
+            tokens.append(word.lower())
+            continue
+        tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        tokens.append(cjk[-1])
+    return tokens
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """将用户查询转换为FTS5 MATCH表达式
+
+    空白分隔的每个词转换为一个短语（中文为相邻二元组序列），各词之间为AND关系；
+    单个汉字使用前缀查询。没有可检索的词时返回None。
+    """
+    phrases = []
+    for term in query.split():
+        for cjk, word in _TOKEN_RE.findall(term):
+            if word:
+                phrases.append(f'"{word.lower()}"')
+            elif len(cjk) == 1:
+                phrases.append(f'"{cjk}"*')
+            else:
+                phrases.append('"' + ' '.join(cjk[i:i + 2] for i in range(len(cjk) - 1)) + '"')
+    return ' AND '.join(phrases) if phrases else None
+
+
+def make_snippet(text: str, query: str, context: int = 60, max_highlights: int = 10) -> str:
+    """截取首个命中位置附近的片段，并用 <mark> 标记命中的查询词"""
+    if not text:
+        return ""
+
+    terms = sorted({m.group(0) for term in query.split() for m in _TOKEN_RE.finditer(term)},
+                   key=len, reverse=True)
+    if not terms:
+        return text[:context * 2]
+
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    first = pattern.search(text)
+    if not first:
+        return text[:context * 2]
+
+    start = max(0, first.start() - context)
+    end = min(len(text), first.end() + context)
+    window = text[start:end]
+
+    highlighted = pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}",
+                              window, count=max_highlights)
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if end < len(text) else ""
+    return f"{prefix}{highlighted}{suffix}".replace("\n", " ")
+
+
+class HistorySearchIndex:
+    """历史记录全文检索索引，所有写方法需在调用方的事务中执行"""
+
+    def __init__(self):
+        self.enabled = True
+
+    def init_schema(self, conn: sqlite3.Connection, load_records: Callable[[], List[Dict[str, Any]]]):
+        """创建索引表；首次启用、版本不一致或残留索引项过多时为现有记录重建索引
+
+        Args:
+            conn: 数据库连接
+            load_records: 返回现有记录（record_id、original_filename、content）的函数
+        """
+        try:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            # SQLite 未编译 FTS5 时禁用检索，其他功能不受影响
+            self.enabled = False
+            logger.warning(f"SQLite不支持FTS5，历史记录全文检索已禁用: {str(e)}")
+            return
+
+        row = conn.execute("SELECT value FROM history_meta WHERE key = 'search_version'").fetchone()
+        if row and row["value"] == SEARCH_VERSION:
+            orphans = conn.execute("SELECT value FROM history_meta WHERE key = 'search_orphans'").fetchone()
+            live = conn.execute("SELECT COUNT(*) FROM history_search_ids").fetchone()[0]
+            if not orphans or int(orphans["value"]) <= live:
+                return
+
+        records = load_records()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 旧版索引为普通FTS5表（保存切分后的全文副本），删除后按当前结构重建
+            conn.execute("DROP TABLE IF EXISTS history_search")
+            conn.execute("DROP TABLE IF EXISTS history_search_ids")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.execute("DELETE FROM history_meta WHERE key = 'search_orphans'")
+            for record in records:
+                self.add(conn, record["record_id"], record["original_filename"], record["content"])
+            conn.execute("INSERT OR REPLACE INTO history_meta (key, value) VALUES ('search_version', ?)",
+                         (SEARCH_VERSION,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"历史记录全文索引已建立，共 {len(records)} 条记录")
+
+    def add(self, conn: sqlite3.Connection, record_id: str, original_filename: str, content: str):
+        """为记录建立索引"""
+        if not self.enabled:
+            return
+        cursor = conn.execute("INSERT INTO history_search_ids (record_id) VALUES (?)", (record_id,))
+        conn.execute(
+            "INSERT INTO history_search (rowid, original_filename, content) VALUES (?, ?, ?)",
+            (cursor.lastrowid, ' '.join(tokenize(original_filename)), ' '.join(tokenize(content)))
+        )
+
+    def remove(self, conn: sqlite3.Connection, record_ids: List[str]):
+        """删除记录的索引
+
+        SQLite 3.43 以下无法按 rowid 删除无内容表的索引项，只删除映射：残留的索引项关联不到记录，
+        检索时被过滤，累计数量超过现有记录数时在下次启动时重建索引清理。
+        """
+        if not self.enabled or not record_ids:
+            return
+        ids = []
+        for record_id in record_ids:
+            row = conn.execute("SELECT id FROM history_search_ids WHERE record_id = ?", (record_id,)).fetchone()
+            if row:
+                ids.append((row["id"],))
+        if not ids:
+            return
+        conn.executemany("DELETE FROM history_search_ids WHERE id = ?", ids)
+        if CONTENTLESS_DELETE:
+            conn.executemany("DELETE FROM history_search WHERE rowid = ?", ids)
+        else:
+            conn.execute(
+                "INSERT INTO history_meta (key, value) VALUES ('search_orphans', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+                (len(ids),)
+            )
+
+    def reset(self, conn: sqlite3.Connection):
+        """清空索引"""
+        if self.enabled:
+            conn.execute("DELETE FROM history_search_ids")
+            conn.execute("INSERT INTO history_search (history_search) VALUES ('delete-all')")
+            conn.execute("DELETE FROM history_meta WHERE key = 'search_orphans'")
+
+    def search(self, conn: sqlite3.Connection, query: str, columns: Tuple[str, ...],
+               limit: int = 20, offset: int = 0,
+               conditions: Optional[List[str]] = None,
+               values: Optional[List[Any]] = None) -> Tuple[int, List[sqlite3.Row]]:
+        """检索记录，按相关度（BM25）排序
+
+        Args:
+            conn: 数据库连接
+            query: 用户查询
+            columns: 返回的 history_records 字段
+            limit: 每页记录数
+            offset: 偏移量
+            conditions: 额外的 history_records 过滤条件
+            values: 过滤条件参数
+
+        Returns:
+            (命中总数, 当前页记录行)，记录行额外包含 score 字段（越大越相关）
+
+        Raises:
+            RuntimeError: 未启用全文检索
+            ValueError: 查询中没有可检索的词
+        """
+        if not self.enabled:
+            raise RuntimeError("当前SQLite不支持FTS5，全文检索不可用")
+
+        match_query = build_match_query(query)
+        if not match_query:
+            raise ValueError(f"查询中没有可检索的词: {query}")
+
+        where = ["history_search MATCH ?"] + [f"r.{condition}" for condition in (conditions or [])]
+        params = [match_query] + list(values or [])
+        base = (f"FROM history_search JOIN history_search_ids i ON i.id = history_search.rowid "
+                f"JOIN history_records r ON r.record_id = i.record_id WHERE {' AND '.join(where)}")
+
+        total = conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+        weights = ', '.join(str(weight) for weight in _BM25_WEIGHTS)
+        rows = conn.execute(
+            f"SELECT {', '.join(f'r.{column}' for column in columns)}, "
+            f"-bm25(history_search, {weights}) AS score {base} "
+            f"ORDER BY score DESC, r.created_at DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return total, rows
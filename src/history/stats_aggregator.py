@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史记录统计聚合器
+
+功能说明：
+- 在记录写入/删除的同一事务中增量维护统计聚合，统计接口不再扫描全部记录
+- 按（模型提供商, 状态）维护总计数和处理耗时总和
+- 按小时维护（时间桶, 模型提供商, 状态）的计数，可按小时/天回答吞吐量问题
+- 处理耗时分位数使用对数分桶草图（相对误差1%，支持删除）
+"""
+
+import math
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_stats_totals (
+    model_provider TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    duration_sum REAL NOT NULL DEFAULT 0,
+    duration_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model_provider, status)
+);
+CREATE TABLE IF NOT EXISTS history_stats_hourly (
+    bucket TEXT NOT NULL,
+    model_provider TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    duration_sum REAL NOT NULL DEFAULT 0,
+    duration_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, model_provider, status)
+);
+CREATE TABLE IF NOT EXISTS history_duration_sketch (
+    model_provider TEXT NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model_provider, bin)
+);
+"""
+
+# 聚合结构版本，变更后启动时自动重建
+STATS_VERSION = "1"
+
+# 分位数草图的相对误差
+SKETCH_RELATIVE_ACCURACY = 0.01
+# 小于该值的耗时（秒）归入同一个最小桶
+SKETCH_MIN_VALUE = 1e-3
+
+# 统计接口返回的分位数
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+class DurationSketch:
+    """对数分桶的分位数草图（DDSketch）
+
+    耗时 x 落入第 ceil(log_gamma(x)) 个桶，gamma = (1+a)/(1-a)，
+    用桶的代表值估计分位数，相对误差不超过 a。桶计数可加可减，
+    因此删除记录时同样可以精确回退。
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+    def bin_of(self, value: float) -> int:
+        return math.ceil(math.log(max(value, SKETCH_MIN_VALUE)) / self._log_gamma)
+
+    def value_of(self, bin_index: int) -> float:
+        return 2 * self.gamma ** bin_index / (self.gamma + 1)
+
+    def quantiles(self, bins: List[tuple], percentiles=DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """根据按桶序号升序排列的 (bin, count) 计算分位数"""
+        total = sum(count for _, count in bins)
+        if total <= 0:
+            return {}
+
+        result = {}
+        targets = sorted(percentiles)
+        cumulative = 0
+        index = 0
+        for bin_index, count in bins:
+            cumulative += count
+            while index < len(targets) and cumulative >= targets[index] / 100 * total:
+                result[f"p{targets[index]}"] = round(self.value_of(bin_index), 3)
+                index += 1
+            if index >= len(targets):
+                break
+        return result
+
+
+class HistoryStatsAggregator:
+    """历史记录统计聚合器，所有写方法需在调用方的事务中执行"""
+
+    def __init__(self):
+        self.sketch = DurationSketch()
+
+    def init_schema(self, conn: sqlite3.Connection):
+        """创建聚合表；版本不一致（或首次启用）时根据现有记录重建"""
+        conn.executescript(_SCHEMA)
+        row = conn.execute("SELECT value FROM history_meta WHERE key = 'stats_version'").fetchone()
+        if not row or row["value"] != STATS_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.rebuild(conn)
+                conn.execute("INSERT OR REPLACE INTO history_meta (key, value) VALUES ('stats_version', ?)",
+                             (STATS_VERSION,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _hour_bucket(created_at: str) -> str:
+        """ISO时间截取到小时，如 2024-01-01T12"""
+        return (created_at or "")[:13]
+
+    def _apply(self, conn: sqlite3.Connection, record: Dict[str, Any], sign: int):
+        provider = record.get("model_provider") or "unknown"
+        status = record.get("status") or "unknown"
+        duration = record.get("processing_duration")
+        has_duration = 1 if duration and duration > 0 else 0
+        duration_value = duration if has_duration else 0.0
+
+        conn.execute(
+            "INSERT INTO history_stats_totals (model_provider, status, count, duration_sum, duration_count) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (model_provider, status) DO UPDATE SET "
+            "count = count + excluded.count, duration_sum = duration_sum + excluded.duration_sum, "
+            "duration_count = duration_count + excluded.duration_count",
+            (provider, status, sign, sign * duration_value, sign * has_duration)
+        )
+        conn.execute(
+            "INSERT INTO history_stats_hourly (bucket, model_provider, status, count, duration_sum, duration_count) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (bucket, model_provider, status) DO UPDATE SET "
+            "count = count + excluded.count, duration_sum = duration_sum + excluded.duration_sum, "
+            "duration_count = duration_count + excluded.duration_count",
+            (self._hour_bucket(record.get("created_at")), provider, status,
+             sign, sign * duration_value, sign * has_duration)
+        )
+        if has_duration:
+            conn.execute(
+                "INSERT INTO history_duration_sketch (model_provider, bin, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (model_provider, bin) DO UPDATE SET count = count + excluded.count",
+                (provider, self.sketch.bin_of(duration), sign)
+            )
+
+    def record_added(self, conn: sqlite3.Connection, record: Dict[str, Any]):
+        """记录写入后更新聚合"""
+        self._apply(conn, record, 1)
+
+    def records_removed(self, conn: sqlite3.Connection, records: List[Dict[str, Any]]):
+        """记录删除后回退聚合，并清理计数归零的行"""
+        for record in records:
+            self._apply(conn, record, -1)
+        if records:
+            conn.execute("DELETE FROM history_stats_totals WHERE count <= 0")
+            conn.execute("DELETE FROM history_stats_hourly WHERE count <= 0")
+            conn.execute("DELETE FROM history_duration_sketch WHERE count <= 0")
+
+    def reset(self, conn: sqlite3.Connection):
+        """清空全部聚合"""
+        conn.execute("DELETE FROM history_stats_totals")
+        conn.execute("DELETE FROM history_stats_hourly")
+        conn.execute("DELETE FROM history_duration_sketch")
+
+    def rebuild(self, conn: sqlite3.Connection):
+        """根据全部记录重建聚合（仅在启用或结构升级时执行一次）"""
+        self.reset(conn)
+        rows = conn.execute(
+            "SELECT model_provider, status, processing_duration, created_at FROM history_records"
+        )
+        for row in rows.fetchall():
+            self._apply(conn, dict(row), 1)
+
+    def summary(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """汇总统计，只读取聚合表，与记录总数无关"""
+        totals = conn.execute(
+            "SELECT model_provider, status, count, duration_sum, duration_count FROM history_stats_totals"
+        ).fetchall()
+
+        status_counts: Dict[str, int] = {}
+        provider_counts: Dict[str, int] = {}
+        duration_sum, duration_count = 0.0, 0
+        for row in totals:
+            status_counts[row["status"]] = status_counts.get(row["status"], 0) + row["count"]
+            provider_counts[row["model_provider"]] = provider_counts.get(row["model_provider"], 0) + row["count"]
+            duration_sum += row["duration_sum"]
+            duration_count += row["duration_count"]
+
+        bins = conn.execute(
+            "SELECT bin, SUM(count) AS count FROM history_duration_sketch GROUP BY bin ORDER BY bin"
+        ).fetchall()
+
+        return {
+            "total_records": sum(status_counts.values()),
+            "status_counts": status_counts,
+            "provider_counts": provider_counts,
+            "average_processing_time": duration_sum / duration_count if duration_count else None,
+            "duration_percentiles": self.sketch.quantiles([(row["bin"], row["count"]) for row in bins])
+        }
+
+    def throughput(self, conn: sqlite3.Connection, granularity: str = "hour",
+                   date_from: Optional[str] = None, date_to: Optional[str] = None,
+                   model_provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按时间桶统计生成数量（按小时或天，按提供商分组）"""
+        if granularity not in ("hour", "day"):
+            raise ValueError(f"不支持的时间粒度: {granularity}，仅支持 hour 或 day")
+
+        bucket_expr = "bucket" if granularity == "hour" else "substr(bucket, 1, 10)"
+        conditions, values = [], []
+        if date_from:
+            conditions.append("bucket >= ?")
+            values.append(self._hour_bucket(date_from))
+        if date_to:
+            conditions.append("bucket <= ?")
+            values.append(self._hour_bucket(date_to))
+        if model_provider:
+            conditions.append("model_provider = ?")
+            values.append(model_provider)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = conn.execute(
+            f"SELECT {bucket_expr} AS period, model_provider, "
+            f"SUM(count) AS count, "
+            f"SUM(CASE WHEN status = 'completed' THEN count ELSE 0 END) AS completed, "
+            f"SUM(CASE WHEN status = 'failed' THEN count ELSE 0 END) AS failed, "
+            f"SUM(duration_sum) AS duration_sum, SUM(duration_count) AS duration_count "
+            f"FROM history_stats_hourly {where} "
+            f"GROUP BY period, model_provider ORDER BY period, model_provider",
+            values
+        ).fetchall()
+
+        return [{
+            "period": row["period"],
+            "model_provider": row["model_provider"],
+            "count": row["count"],
+            "completed": row["completed"],
+            "failed": row["failed"],
+            "average_processing_time": row["duration_sum"] / row["duration_count"] if row["duration_count"] else None
+        } for row in rows]
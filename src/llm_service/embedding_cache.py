@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本向量持久化缓存
+
+功能说明：
+- 以"embedding模型 + 文本SHA-256"为键缓存文本向量，服务重启后仍然有效
+- 向量以float32二进制存储在SQLite中（每维4字节），读取时直接还原为numpy数组
+- 批量读写，一次查询/一个事务处理一批文本
+- 支持按模型或全部显式失效
+"""
+
+import os
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from config.settings import Config
+
+try:
+    import numpy as np
+except ImportError:  # numpy 未安装时以 array('f') 存取，向量以浮点数列表返回
+    np = None
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+"""
+
+# SQLite 单条语句的参数个数上限较低，按批查询
+_QUERY_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    """文本的SHA-256摘要"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def to_float32(vector: Sequence[float]):
+    """转换为float32向量（numpy数组；未安装numpy时为浮点数列表）"""
+    if np is not None:
+        return np.asarray(vector, dtype=np.float32)
+    return list(array.array('f', vector))
+
+
+def _pack(vector) -> bytes:
+    if np is not None:
+        return np.asarray(vector, dtype=np.float32).tobytes()
+    return array.array('f', vector).tobytes()
+
+
+def _unpack(data: bytes):
+    if np is not None:
+        return np.frombuffer(data, dtype=np.float32)
+    values = array.array('f')
+    values.frombytes(data)
+    return list(values)
+
+
+class EmbeddingCache:
+    """文本向量的SQLite持久化缓存"""
+
+    def __init__(self, db_path: str = "cache/embeddings.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """首次使用时打开数据库（连接在线程间共享，由 _lock 串行化）"""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[object]]:
+        """批量读取向量，未缓存的文本对应位置为None"""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, object] = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                unique = list(dict.fromkeys(hashes))
+                for start in range(0, len(unique), _QUERY_BATCH):
+                    batch = unique[start:start + _QUERY_BATCH]
+                    placeholders = ','.join('?' for _ in batch)
+                    rows = conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model] + batch
+                    ).fetchall()
+                    found.update((row[0], _unpack(row[1])) for row in rows)
+        except sqlite3.Error as e:
+            logger.warning(f"读取向量缓存失败: {str(e)}")
+
+        result = [found.get(h) for h in hashes]
+        hits = sum(1 for vector in result if vector is not None)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(result) - hits
+        return result
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """在一个事务中写入一批向量"""
+        rows = [(model, text_hash(text), len(vector), _pack(vector))
+                for text, vector in zip(texts, vectors) if len(vector)]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, dimension, vector) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning(f"写入向量缓存失败: {str(e)}")
+
+    def invalidate(self, model: Optional[str] = None) -> int:
+        """使缓存失效
+
+        Args:
+            model: embedding模型名称，为空时清除全部缓存
+
+        Returns:
+            删除的向量数量
+        """
+        with self._lock:
+            conn = self._connection()
+            if model:
+                removed = conn.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+            else:
+                removed = conn.execute("DELETE FROM embeddings").rowcount
+        logger.info(f"向量缓存已失效: {model or '全部'}，删除{removed}条")
+        return removed
+
+    def get_statistics(self) -> Dict[str, object]:
+        """获取缓存统计信息"""
+        with self._lock:
+            conn = self._connection()
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+            total = self.hits + self.misses
+            return {
+                "db_path": self.db_path,
+                "entries": entries,
+                "vector_bytes": total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局缓存实例
+embedding_cache = EmbeddingCache(Config.EMBEDDING_CACHE_PATH)
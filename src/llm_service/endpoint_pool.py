@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多端点负载均衡
+
+功能说明：
+- 同一提供商配置多个服务地址（如多台CPU Ollama主机）时，在端点间分配请求
+- 最少未完成请求（least outstanding requests）选择端点，并列时选择累计请求较少的端点；
+  流式请求在读取完毕前一直计为未完成
+- 连接失败或5xx响应时换下一个端点重试（读取超时按调用类型的 RetryReadTimeout 决定是否换端点）；连续失败达到阈值的端点暂时摘除，摘除时间按次数指数增长
+- 后台健康检查定期探测所有端点，恢复的端点提前放回；所有端点都被摘除时仍选择最早恢复的端点
+- 负载均衡参数见 config/http_transport_config.ini 的 [LoadBalancing]
+"""
+
+import time
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from .http_transport import HttpTransport, http_transport
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """单个服务端点的状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.last_error: Optional[str] = None
+        self.last_health_check: Optional[float] = None
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "available": self.available(now),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected_for": round(max(0.0, self.ejected_until - now), 1),
+            "last_error": self.last_error
+        }
+
+
+class EndpointPool:
+    """一个提供商的端点池"""
+
+    def __init__(self, name: str, urls: List[str], transport: HttpTransport = http_transport,
+                 health_path: Optional[str] = None):
+        """
+        Args:
+            name: 端点池名称（用于日志和状态）
+            urls: 服务地址列表（至少一个）
+            transport: HTTP传输层
+            health_path: 健康检查路径（GET），为None时不做健康检查
+        """
+        urls = list(dict.fromkeys(url.rstrip('/') for url in urls if url))
+        if not urls:
+            raise ValueError(f"端点池 {name} 没有可用的服务地址")
+        self.name = name
+        self.transport = transport
+        self.health_path = health_path
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        endpoint_health_checker.register(self)
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def call(self, send: Callable[[str], requests.Response], call_type: str = "generate") -> requests.Response:
+        """选择端点发送请求；连接失败或5xx时换下一个端点，直到所有端点都试过
+
+        Args:
+            send: 以端点地址为参数发送请求、返回响应的函数
+            call_type: 调用类型，读取超时时按该类型的 RetryReadTimeout 决定是否换端点
+
+        Returns:
+            第一个非5xx的响应；所有端点都返回5xx时返回最后一个响应
+
+        Raises:
+            requests.RequestException: 所有端点都连接失败，或读取超时且该调用类型不重试
+        """
+        endpoint, response = self._send(send, call_type)
+        if endpoint is not None:
+            self._release(endpoint)
+        return response
+
+    @contextmanager
+    def stream(self, send: Callable[[str], requests.Response],
+               call_type: str = "generate") -> Iterator[requests.Response]:
+        """与 call 相同地发送流式请求；退出 with 时关闭响应，端点在此之前一直计为未完成请求"""
+        endpoint, response = self._send(send, call_type)
+        error = None
+        try:
+            yield response
+        except requests.RequestException as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            response.close()
+            if endpoint is not None:
+                self._release(endpoint, error=error)
+
+    def _send(self, send: Callable[[str], requests.Response],
+              call_type: str) -> Tuple[Optional[Endpoint], requests.Response]:
+        """按端点依次尝试发送请求，返回 (仍计为未完成的端点, 响应)；所有端点都返回5xx时端点为None"""
+        tried = set()
+        last_error: Optional[Exception] = None
+        last_response: Optional[requests.Response] = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self._acquire(tried)
+            tried.add(endpoint.url)
+            self._local.url = endpoint.url
+            try:
+                response = send(endpoint.url)
+            except requests.RequestException as e:
+                self._release(endpoint, error=f"{type(e).__name__}: {str(e)}")
+                # 生成类请求读取超时通常是输出过长，换端点重发只会再等一次
+                if isinstance(e, requests.ReadTimeout) and not self.transport.config.retry_read_timeout(call_type):
+                    raise
+                last_error = e
+                continue
+            except Exception:
+                # 非网络错误（如请求参数错误）与端点无关，不计入失败
+                self._release(endpoint)
+                raise
+            if response.status_code >= 500:
+                self._release(endpoint, error=f"HTTP {response.status_code}")
+                last_response = response
+                continue
+            return endpoint, response
+
+        if last_response is not None:
+            return None, last_response
+        raise last_error
+
+    def last_url(self) -> Optional[str]:
+        """当前线程最近一次请求使用的端点"""
+        return getattr(self._local, 'url', None)
+
+    def check_health(self):
+        """探测所有端点：成功则放回被摘除的端点，失败计入连续失败"""
+        if not self.health_path:
+            return
+        for endpoint in list(self.endpoints):
+            try:
+                response = self.transport.get(f"{endpoint.url}{self.health_path}", "health")
+                healthy = response.status_code == 200
+                error = None if healthy else f"HTTP {response.status_code}"
+            except Exception as e:
+                healthy, error = False, f"{type(e).__name__}: {str(e)}"
+            with self._lock:
+                endpoint.last_health_check = time.time()
+                if healthy:
+                    if not endpoint.available(time.monotonic()):
+                        logger.info(f"端点 {endpoint.url}（{self.name}）健康检查恢复，重新加入")
+                    endpoint.ejected_until = 0.0
+                    endpoint.consecutive_failures = 0
+                else:
+                    self._record_failure(endpoint, error)
+
+    def get_status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {"name": self.name, "endpoints": [endpoint.to_dict(now) for endpoint in self.endpoints]}
+
+    def _acquire(self, exclude: set) -> Endpoint:
+        """最少未完成请求优先；可用端点都已尝试过时选择最早恢复的端点"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude and e.available(now)]
+            if candidates:
+                endpoint = min(candidates, key=lambda e: (e.outstanding, e.requests))
+            else:
+                endpoint = min((e for e in self.endpoints if e.url not in exclude),
+                               key=lambda e: (e.ejected_until, e.outstanding))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, error: Optional[str] = None):
+        if error is not None:
+            logger.warning(f"端点 {endpoint.url}（{self.name}）请求失败: {error}")
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+            else:
+                endpoint.failures += 1
+                self._record_failure(endpoint, error)
+
+    def _record_failure(self, endpoint: Endpoint, error: Optional[str]):
+        """记录一次失败（调用方持有锁），连续失败达到阈值时摘除"""
+        config = self.transport.config
+        endpoint.last_error = error
+        endpoint.consecutive_failures += 1
+        if len(self.endpoints) < 2 or endpoint.consecutive_failures < config.eject_after_failures:
+            return
+        seconds = min(config.max_eject_seconds, config.eject_seconds * (2 ** endpoint.ejections))
+        endpoint.ejected_until = time.monotonic() + seconds
+        endpoint.ejections += 1
+        endpoint.consecutive_failures = 0
+        logger.warning(f"端点 {endpoint.url}（{self.name}）连续失败，摘除 {seconds:.0f} 秒")
+
+
+class EndpointHealthChecker:
+    """所有端点池的后台健康检查"""
+
+    def __init__(self):
+        self._pools: "weakref.WeakSet[EndpointPool]" = weakref.WeakSet()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def register(self, pool: EndpointPool):
+        self._pools.add(pool)
+
+    def start(self):
+        """启动健康检查线程（间隔取自传输层配置）"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="endpoint-health", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        return [pool.get_status() for pool in list(self._pools)]
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            interval = http_transport.config.health_check_interval
+            for pool in list(self._pools):
+                # 只有一个端点时不需要健康检查
+                if len(pool.endpoints) > 1:
+                    try:
+                        pool.check_health()
+                    except Exception as e:
+                        logger.warning(f"端点池 {pool.name} 健康检查失败: {str(e)}")
+            self._stop_event.wait(interval)
+
+
+# 全局健康检查实例
+endpoint_health_checker = EndpointHealthChecker()
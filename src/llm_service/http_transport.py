@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型HTTP传输层
+
+功能说明：
+- 项目中所有Ollama / OpenAI兼容接口的HTTP请求共用一个requests会话，连接保持（keep-alive）并按主机复用连接池
+- 按调用类型（health、embed、generate、preload、chat）分别设置连接超时和读取超时
+- 连接失败、可重试状态码（429/5xx）时按指数退避加随机抖动（full jitter）重试，429/503 遵循 Retry-After
+- 配置见 config/http_transport_config.ini，按调用类型统计请求、重试和失败次数
+- 每个线程最近一次请求的重试次数可供模型管理器记录到调用信息中
+- [LoadBalancing] 为多端点负载均衡（endpoint_pool）的摘除和健康检查参数
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+import configparser
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_FILE = Path(__file__).resolve().parents[2] / "config" / "http_transport_config.ini"
+
+# 未在配置文件中设置时各调用类型的默认值：(连接超时, 读取超时, 读取超时后是否重试)
+_DEFAULT_TIMEOUTS = {
+    "health": (3.0, 5.0, True),
+    "embed": (5.0, 120.0, True),
+    "generate": (5.0, 600.0, False),
+    "preload": (5.0, 300.0, False),
+    "chat": (10.0, 300.0, False),
+}
+
+
+class TransportConfig:
+    """传输层配置"""
+
+    def __init__(self, config_file: Optional[str] = None):
+        self.config_file = str(config_file or DEFAULT_CONFIG_FILE)
+        self.config = configparser.ConfigParser()
+        self.reload()
+
+    def reload(self):
+        """重新读取配置文件（文件不存在时使用默认值）"""
+        self.config = configparser.ConfigParser()
+        if os.path.exists(self.config_file):
+            self.config.read(self.config_file, encoding='utf-8')
+        else:
+            logger.warning(f"HTTP传输层配置文件不存在，使用默认配置: {self.config_file}")
+
+    @property
+    def pool_connections(self) -> int:
+        return self.config.getint('Pool', 'PoolConnections', fallback=10)
+
+    @property
+    def pool_maxsize(self) -> int:
+        return self.config.getint('Pool', 'PoolMaxSize', fallback=20)
+
+    @property
+    def max_retries(self) -> int:
+        return self.config.getint('Retry', 'MaxRetries', fallback=2)
+
+    @property
+    def backoff_base(self) -> float:
+        return self.config.getfloat('Retry', 'BackoffBase', fallback=0.5)
+
+    @property
+    def backoff_max(self) -> float:
+        return self.config.getfloat('Retry', 'BackoffMax', fallback=8.0)
+
+    @property
+    def retry_statuses(self) -> frozenset:
+        value = self.config.get('Retry', 'RetryStatuses', fallback='429,500,502,503,504')
+        return frozenset(int(code) for code in value.split(',') if code.strip())
+
+    @property
+    def eject_after_failures(self) -> int:
+        return self.config.getint('LoadBalancing', 'EjectAfterFailures', fallback=3)
+
+    @property
+    def eject_seconds(self) -> float:
+        return self.config.getfloat('LoadBalancing', 'EjectSeconds', fallback=30)
+
+    @property
+    def max_eject_seconds(self) -> float:
+        return self.config.getfloat('LoadBalancing', 'MaxEjectSeconds', fallback=300)
+
+    @property
+    def health_check_interval(self) -> float:
+        return self.config.getfloat('LoadBalancing', 'HealthCheckInterval', fallback=15)
+
+    def timeout(self, call_type: str) -> Tuple[float, float]:
+        """调用类型的 (连接超时, 读取超时)"""
+        connect, read, _ = _DEFAULT_TIMEOUTS.get(call_type, _DEFAULT_TIMEOUTS["generate"])
+        section = f"Timeout.{call_type}"
+        return (self.config.getfloat(section, 'Connect', fallback=connect),
+                self.config.getfloat(section, 'Read', fallback=read))
+
+    def retry_read_timeout(self, call_type: str) -> bool:
+        """读取超时后是否重试"""
+        default = _DEFAULT_TIMEOUTS.get(call_type, _DEFAULT_TIMEOUTS["generate"])[2]
+        return self.config.getboolean(f"Timeout.{call_type}", 'RetryReadTimeout', fallback=default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "max_retries": self.max_retries,
+            "backoff_base": self.backoff_base,
+            "backoff_max": self.backoff_max,
+            "retry_statuses": sorted(self.retry_statuses),
+            "load_balancing": {
+                "eject_after_failures": self.eject_after_failures,
+                "eject_seconds": self.eject_seconds,
+                "max_eject_seconds": self.max_eject_seconds,
+                "health_check_interval": self.health_check_interval
+            },
+            "timeouts": {call_type: self.timeout(call_type) for call_type in _DEFAULT_TIMEOUTS}
+        }
+
+
+class HttpTransport:
+    """共享的HTTP传输层"""
+
+    def __init__(self, config: TransportConfig):
+        self.config = config
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def session(self) -> requests.Session:
+        """首次使用时创建会话（连接池大小取自配置）"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # 重试由本模块处理，适配器本身不重试
+                    adapter = HTTPAdapter(pool_connections=self.config.pool_connections,
+                                          pool_maxsize=self.config.pool_maxsize, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def request(self, method: str, url: str, call_type: str = "generate",
+                max_retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """发送请求，连接失败或返回可重试状态码时按抖动退避重试
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            call_type: 调用类型（health、embed、generate、preload、chat），决定超时和读取超时后是否重试
+            max_retries: 本次请求的最大重试次数，不指定时使用配置（多端点时由端点池换主机代替重试）
+            **kwargs: 传给 requests 的其他参数（json、headers 等）；未指定 timeout 时使用调用类型的超时
+
+        Returns:
+            最后一次请求的响应（状态码由调用方检查）
+
+        Raises:
+            requests.RequestException: 重试次数用完后仍然连接失败或超时
+        """
+        kwargs.setdefault("timeout", self.config.timeout(call_type))
+        if max_retries is None:
+            max_retries = self.config.max_retries
+        retry_statuses = self.config.retry_statuses
+        self._local.retries = 0
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # ConnectTimeout 同时属于 ConnectionError，始终可重试；ReadTimeout 按调用类型决定
+                retryable = (not isinstance(e, requests.ReadTimeout)
+                             or self.config.retry_read_timeout(call_type))
+                if not retryable or attempt >= max_retries:
+                    self._count(call_type, attempt, failed=True)
+                    raise
+                reason = f"{type(e).__name__}: {str(e)}"
+            else:
+                if response.status_code not in retry_statuses or attempt >= max_retries:
+                    self._count(call_type, attempt, failed=response.status_code >= 400)
+                    return response
+                reason = f"HTTP {response.status_code}"
+                retry_after = self._retry_after(response)
+                response.close()
+
+            delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            self._local.retries = attempt
+            logger.warning(f"{call_type} 请求失败（{reason}），{delay:.2f} 秒后第 {attempt} 次重试: {url}")
+            time.sleep(delay)
+
+    def post_json(self, url: str, payload: Dict[str, Any], call_type: str = "generate",
+                  headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        """POST JSON请求"""
+        return self.request("POST", url, call_type, json=payload, headers=headers, **kwargs)
+
+    def get(self, url: str, call_type: str = "health", **kwargs) -> requests.Response:
+        """GET请求"""
+        return self.request("GET", url, call_type, **kwargs)
+
+    def get_last_retries(self) -> int:
+        """当前线程最近一次请求的重试次数"""
+        return getattr(self._local, 'retries', 0)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """按调用类型统计的请求、重试和失败次数，以及生效的配置"""
+        with self._lock:
+            by_type = {call_type: dict(stats) for call_type, stats in self._stats.items()}
+        return {"by_call_type": by_type, "config": self.config.to_dict()}
+
+    def close(self):
+        """关闭会话中的所有连接"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """full jitter：在 0 与指数上限之间随机等待，避免多个请求同时重试"""
+        cap = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.config.backoff_max))
+        return delay
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        try:
+            return max(0.0, float(value)) if value else None
+        except ValueError:
+            # HTTP日期格式的 Retry-After 不解析，按退避时间等待
+            return None
+
+    def _count(self, call_type: str, retries: int, failed: bool):
+        with self._lock:
+            stats = self._stats.setdefault(call_type, {"requests": 0, "retries": 0, "failures": 0})
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["failures"] += int(failed)
+
+
+# 全局传输层实例
+http_transport = HttpTransport(TransportConfig())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量JSON解析
+
+功能说明：
+- 逐段接收模型流式输出的文本，按字符推进状态机解析顶层JSON对象，不必等待完整响应
+- 每个字段的值一结束就用 json.loads 校验；指定期望字段列表时只保留列表中的字段
+- 输出格式错误（字段名、冒号、分隔符位置不对，值不是合法JSON，对象前的说明文字过长）时立即抛出
+  JsonStreamError，调用方随即关闭连接，不再为错误输出消耗token
+- 顶层对象结束后 feed 返回True，调用方可以停止读取，对象之后的解释性文字不再生成
+- extract_json_object 用同一状态机从完整文本中提取第一个合法的JSON对象，替代贪婪的正则匹配
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 顶层对象之前允许的说明文字（如 ```json 代码块标记）长度
+DEFAULT_MAX_PREAMBLE = 4000
+
+_WHITESPACE = " \t\r\n"
+
+
+class JsonStreamError(ValueError):
+    """流式JSON输出格式错误"""
+
+
+class IncrementalJsonParser:
+    """顶层JSON对象的增量解析器
+
+    Args:
+        fields: 期望的字段列表；指定时不在列表中的字段被忽略（记录在 unknown_keys 中）
+        max_preamble: 顶层对象之前允许的字符数
+        on_field: 每个字段的值校验通过后的回调 (字段名, 值)
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None, max_preamble: int = DEFAULT_MAX_PREAMBLE,
+                 on_field: Optional[Callable[[str, Any], None]] = None):
+        self.fields = set(fields) if fields is not None else None
+        self.max_preamble = max_preamble
+        self.on_field = on_field
+        self.values: Dict[str, Any] = {}
+        self.unknown_keys: List[str] = []
+        self.done = False
+        self._chars: List[str] = []
+        self._state = "preamble"
+        self._preamble = 0
+        self._token_start = 0
+        self._key: Optional[str] = None
+        self._value_depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> bool:
+        """接收一段输出，返回顶层对象是否已经结束
+
+        Raises:
+            JsonStreamError: 输出格式错误
+        """
+        if self.done or not chunk:
+            return self.done
+        for ch in chunk:
+            self._step(ch)
+            if self.done:
+                break
+        return self.done
+
+    def text(self) -> str:
+        """顶层对象的JSON文本（不含对象前后的说明文字）"""
+        if not self.done:
+            raise JsonStreamError("JSON输出不完整" if self._chars else "输出中没有JSON对象")
+        return "".join(self._chars)
+
+    def result(self) -> Dict[str, Any]:
+        """解析后的顶层对象"""
+        return json.loads(self.text())
+
+    def _fail(self, message: str):
+        raise JsonStreamError(f"{message}（已解析 {len(self.values)} 个字段）")
+
+    def _step(self, ch: str):
+        state = self._state
+        if state == "preamble":
+            if ch == "{":
+                self._chars.append(ch)
+                self._state = "key_or_end"
+                return
+            self._preamble += 1
+            if self._preamble > self.max_preamble:
+                self._fail(f"JSON对象之前的文字超过 {self.max_preamble} 个字符")
+            return
+
+        self._chars.append(ch)
+        if state == "key":
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._key = json.loads("".join(self._chars[self._token_start:]))
+                self._state = "colon"
+            return
+        if state == "value":
+            self._scan_value(ch)
+            return
+        if ch in _WHITESPACE:
+            return
+
+        if state in ("key_or_end", "next_key"):
+            if ch == '"':
+                self._token_start = len(self._chars) - 1
+                self._state = "key"
+            elif ch == "}" and state == "key_or_end":
+                self._finish()
+            else:
+                self._fail(f"应为字段名，实际为 {ch!r}")
+        elif state == "colon":
+            if ch != ":":
+                self._fail(f"字段 {self._key} 后应为冒号，实际为 {ch!r}")
+            self._state = "value_start"
+        elif state == "value_start":
+            self._token_start = len(self._chars) - 1
+            self._value_depth = 0
+            self._in_string = False
+            self._escape = False
+            self._state = "value"
+            self._scan_value(ch)
+        elif state == "comma_or_end":
+            if ch == ",":
+                self._state = "next_key"
+            elif ch == "}":
+                self._finish()
+            else:
+                self._fail(f"字段 {self._key} 的值之后应为逗号或 }}，实际为 {ch!r}")
+
+    def _scan_value(self, ch: str):
+        """扫描字段值：字符串和嵌套结构按配对结束，数字、布尔、null 遇到分隔符结束"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._value_depth == 0:
+                    self._end_value(len(self._chars))
+            return
+        if ch == '"':
+            self._in_string = True
+        elif ch in "[{":
+            self._value_depth += 1
+        elif ch in "]}":
+            if self._value_depth == 0:
+                # 数字、布尔、null 之后直接是顶层对象的结束括号
+                self._end_value(len(self._chars) - 1)
+                if ch != "}":
+                    self._fail(f"字段 {self._key} 之后出现多余的 {ch!r}")
+                self._finish()
+                return
+            self._value_depth -= 1
+            if self._value_depth == 0:
+                self._end_value(len(self._chars))
+        elif self._value_depth == 0 and (ch == "," or ch in _WHITESPACE):
+            self._end_value(len(self._chars) - 1)
+            if ch == ",":
+                self._state = "next_key"
+
+    def _end_value(self, end: int):
+        raw = "".join(self._chars[self._token_start:end])
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            self._fail(f"字段 {self._key} 的值不是合法的JSON: {raw[:50]!r}")
+        self._state = "comma_or_end"
+        self._accept(self._key, value)
+
+    def _accept(self, key: str, value: Any):
+        if self.fields is not None and key not in self.fields:
+            self.unknown_keys.append(key)
+            return
+        self.values[key] = value
+        if self.on_field is not None:
+            self.on_field(key, value)
+
+    def _finish(self):
+        self.done = True
+        self._state = "done"
+        if self.unknown_keys:
+            logger.debug(f"JSON输出包含未请求的字段: {self.unknown_keys}")
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """提取文本中第一个合法的JSON对象
+
+    从某个 { 开始解析失败时，从解析器已读取部分之后的下一个 { 重试，
+    不会把失败对象内部的嵌套对象当作结果；对象不完整时返回None
+    """
+    if not text:
+        return None
+    start = text.find("{")
+    while start != -1:
+        parser = IncrementalJsonParser(max_preamble=0)
+        try:
+            if parser.feed(text[start:]):
+                return parser.result()
+        except JsonStreamError:
+            pass
+        start = text.find("{", start + max(len(parser._chars), 1))
+    return None
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型提供商延迟统计
+
+功能说明：
+- 在进程内按提供商记录最近若干次成功调用的耗时，计算 p50 / p95 等分位数
+- 模型管理器用某提供商的 p95 作为对冲请求（hedged request）的触发阈值
+- 同时统计调用次数和失败次数，供接口查看各提供商的延迟与错误率
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# 每个提供商保留的最近成功调用耗时数量
+DEFAULT_WINDOW = 200
+
+
+class LatencyTracker:
+    """按提供商统计调用延迟"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, provider: str, seconds: float, success: bool = True):
+        """记录一次调用；失败的调用只计数，不计入延迟样本"""
+        with self._lock:
+            counts = self._counts.setdefault(provider, {"calls": 0, "failures": 0})
+            counts["calls"] += 1
+            if success:
+                self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+            else:
+                counts["failures"] += 1
+
+    def percentile(self, provider: str, percent: float, min_samples: int = 1) -> Optional[float]:
+        """最近成功调用耗时的分位数（nearest-rank），样本不足 min_samples 时返回None"""
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        rank = max(1, math.ceil(percent / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """各提供商的调用次数、失败次数和延迟分位数（秒）"""
+        with self._lock:
+            providers = list(self._counts)
+            counts = {provider: dict(self._counts[provider]) for provider in providers}
+            sizes = {provider: len(self._samples.get(provider, ())) for provider in providers}
+        stats = {}
+        for provider in providers:
+            p50, p95 = self.percentile(provider, 50), self.percentile(provider, 95)
+            stats[provider] = {
+                **counts[provider],
+                "samples": sizes[provider],
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None
+            }
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+# 全局延迟统计实例
+latency_tracker = LatencyTracker()
@@ -40,7 +40,7 @@
     - 缓存机制减少重复调用
 
 依赖库:
-    - requests: HTTP请求处理
+    - http_transport: 共享的HTTP传输层（基于requests）
     - json: JSON数据解析
     - logging: 日志记录
     - re: 正则表达式处理
@@ -51,11 +51,18 @@
 版本: 1.0.0
 """
 
+import re
 import json
-import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from config.settings import Config
 from .model_manager import model_manager
+from .llm_utils import clean_field_value, merge_chunk_extractions
+from .embedding_cache import embedding_cache, to_float32
+from .http_transport import http_transport
+from .provider_clients import OllamaClient
+from .ollama_residency import residency_manager
+from .json_stream import extract_json_object
 
 class LLMService:
     """
@@ -138,16 +145,23 @@ class LLMService:
             ... )
         """
         # 保持向后兼容性的同时，使用新的模型管理器
-        self.ollama_url = Config.OLLAMA_URL
+        self.ollama_url = ollama_url or Config.OLLAMA_URL
+        # 显式指定服务地址时只连接该地址，不使用模型管理器的共享客户端
+        self._explicit_ollama_url = bool(ollama_url)
         self.model_name = Config.MODEL_NAME
         self.embedding_model = embedding_model or Config.EMBEDDING_MODEL
         self.logger = logging.getLogger(__name__)
         self.model_manager = model_manager
+        self.embedding_cache = embedding_cache
+        # 所有HTTP请求经过共享传输层（连接池复用、分类型超时、抖动退避重试）
+        self.transport = http_transport
+        self._legacy_embed_api = False
+        self._fallback_ollama_client = None
         
         # 记录初始化信息
         self.logger.info(f"LLM服务初始化完成 - 模型: {self.model_name}, Embedding: {self.embedding_model}")
     
-    def extract_tender_info(self, document_content):
+    def extract_tender_info(self, document_content, chunked=None):
         """
         从招标文档中提取结构化信息
         
@@ -159,6 +173,9 @@ class LLMService:
         document_content : str
             招标文档的文本内容
             支持的文档类型: 招标公告、招标文件、合同文本等
+        chunked : bool, optional
+            是否分块提取，默认（None）在文档超过 Config.EXTRACTION_CHUNK_SIZE 时自动分块，
+            分块提取的流程见 _extract_in_chunks
         
         Returns
         -------
@@ -193,12 +210,24 @@ class LLMService:
             >>> print(result['项目名称'])  # 输出: "某某道路建设项目"
             >>> print(result['招标编号'])  # 输出: "2024-001"
         """
+        if self._should_chunk(document_content, chunked):
+            self.logger.info("开始分块提取招标信息")
+            result = self._extract_in_chunks(
+                document_content,
+                self._tender_info_fields(),
+                # 第一批块使用完整的招标信息提示词（含字段格式要求），之后只请求尚未提取到的字段
+                lambda chunk, fields, all_fields: (self._build_extraction_prompt(chunk) if all_fields
+                                                   else self._build_dynamic_extraction_prompt(chunk, fields))
+            )
+            self.logger.info(f"招标信息提取完成，提取到 {len([k for k, v in result.items() if v is not None])} 个有效字段")
+            return result
+        
         prompt = self._build_extraction_prompt(document_content)
         
         try:
             # 使用模型管理器调用当前配置的模型
             self.logger.info("开始提取招标信息")
-            response = self.model_manager.call_model('tender_notice', prompt)
+            response = self._call_json('tender_notice', prompt, self._tender_info_fields())
             result = self._parse_response(response)
             self.logger.info(f"招标信息提取完成，提取到 {len([k for k, v in result.items() if v is not None])} 个有效字段")
             return result
@@ -206,7 +235,7 @@ class LLMService:
             self.logger.error(f"招标信息提取失败: {str(e)}")
             raise Exception(f"大模型调用失败: {str(e)}")
     
-    def extract_dynamic_info(self, document_content, field_list):
+    def extract_dynamic_info(self, document_content, field_list, chunked=None, retrieval=None):
         """
         根据用户指定的动态字段列表从文档中提取信息
         
@@ -221,6 +250,12 @@ class LLMService:
                 - 字段名应具有明确的语义含义
                 - 支持中文和英文字段名
                 - 建议使用具体、明确的字段描述
+            chunked (bool, optional): 是否分块提取
+                - 默认（None）在文档超过 Config.EXTRACTION_CHUNK_SIZE 时自动分块
+                - 分块提取的流程见 _extract_in_chunks
+            retrieval (bool, optional): 分块提取时是否使用向量检索
+                - 默认（None）在可用时使用：每个字段只把最相关的 top-k 块发给模型，见 _extract_with_retrieval
+                - embedding服务或numpy不可用时回退到 _extract_in_chunks
         
         Returns:
             dict: 提取的字段信息字典
@@ -261,15 +296,236 @@ class LLMService:
             - 提取结果的准确性依赖于文档内容的完整性
             - 支持嵌套字段和复杂数据结构的提取
         """
+        if self._should_chunk(document_content, chunked):
+            if retrieval is not False:
+                result = self._extract_with_retrieval(document_content, list(field_list))
+                if result is not None:
+                    return result
+            return self._extract_in_chunks(
+                document_content,
+                list(field_list),
+                lambda chunk, fields, all_fields: self._build_dynamic_extraction_prompt(chunk, fields)
+            )
+        
         prompt = self._build_dynamic_extraction_prompt(document_content, field_list)
         
         try:
             # 使用模型管理器调用当前配置的模型
-            response = self.model_manager.call_model('tender_notice', prompt)
+            response = self._call_json('tender_notice', prompt, list(field_list))
             return self._parse_response(response)
         except Exception as e:
             raise Exception(f"大模型调用失败: {str(e)}")
     
+    def _call_json(self, module, prompt, fields):
+        """以JSON输出模式调用模型：提供商支持时请求JSON格式输出，流式增量解析，格式错误时提前中止"""
+        return self.model_manager.call_model(module, prompt, response_format='json', json_fields=fields)
+    
+    def _should_chunk(self, document_content, chunked):
+        """未指定时，文档超过一个分块大小才使用分块提取"""
+        if chunked is None:
+            return len(document_content or "") > Config.EXTRACTION_CHUNK_SIZE
+        return chunked
+    
+    def _tender_info_fields(self):
+        """招标信息提取提示词中JSON模板的字段列表（去重并保持顺序）"""
+        return list(dict.fromkeys(re.findall(r'"([^"]+)": null', self._build_extraction_prompt(""))))
+    
+    def _extract_in_chunks(self, document_content, field_list, build_prompt):
+        """
+        长文档分块提取（map-reduce）
+        
+        map: 文档按 Config.EXTRACTION_CHUNK_SIZE 分块，同时最多 Config.EXTRACTION_MAX_WORKERS
+             个块并行调用模型；每个块提交时只请求此前已完成的块尚未提取到的字段
+        reduce: merge_chunk_extractions 按各块结果的置信度加权投票，解决同一字段的取值冲突
+        
+        所有字段都已提取到时不再提交剩余的块（提前结束），正在执行的调用结果不再等待。
+        单次调用的输入长度固定，总耗时约为 块数/并行数 次调用，不再随文档长度无限增长。
+        
+        Args:
+            document_content (str): 文档内容
+            field_list (list): 需要提取的字段列表
+            build_prompt (callable): (块内容, 待提取字段列表, 是否为全部字段) -> 提示词
+        
+        Returns:
+            dict: 以 field_list 为键的提取结果，未提取到的字段为None
+        
+        Raises:
+            Exception: 所有块的模型调用都失败时抛出
+        """
+        from ..tender_generation_core.chunker import chunk_text
+        
+        chunks = chunk_text(document_content, Config.EXTRACTION_CHUNK_SIZE, Config.EXTRACTION_CHUNK_OVERLAP)
+        if not chunks:
+            return {field: None for field in field_list}
+        
+        chunk_results = [{} for _ in chunks]
+        filled = set()
+        errors = []
+        next_index = 0
+        completed = 0
+        
+        def extract_chunk(chunk, fields):
+            prompt = build_prompt(chunk, fields, len(fields) == len(field_list))
+            return self._parse_response(self._call_json('tender_notice', prompt, fields))
+        
+        max_workers = max(1, Config.EXTRACTION_MAX_WORKERS)
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-extract")
+        running = {}
+        try:
+            while True:
+                # 按文档顺序补充提交，直到并行数上限
+                while next_index < len(chunks) and len(running) < max_workers:
+                    remaining = [field for field in field_list if field not in filled]
+                    if not remaining:
+                        break
+                    future = executor.submit(extract_chunk, chunks[next_index], remaining)
+                    running[future] = next_index
+                    next_index += 1
+                
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    completed += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(str(e))
+                        self.logger.warning(f"第 {index + 1}/{len(chunks)} 块提取失败: {str(e)}")
+                        continue
+                    if isinstance(result, dict):
+                        chunk_results[index] = result
+                        filled.update(field for field, value in result.items()
+                                      if field in field_list and clean_field_value(value) is not None)
+                
+                if len(filled) == len(field_list):
+                    break
+                # 第一轮调用全部失败（如模型服务不可用）时不再继续提交
+                if len(errors) == completed >= max_workers:
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if errors and len(errors) == completed:
+            raise Exception(f"大模型调用失败: {errors[0]}")
+        
+        self.logger.info(f"分块提取完成：共 {len(chunks)} 块，调用 {completed} 块，失败 {len(errors)} 块，"
+                         f"提取到 {len(filled)}/{len(field_list)} 个字段")
+        return merge_chunk_extractions(chunk_results, field_list)
+    
+    def _extract_with_retrieval(self, document_content, field_list):
+        """
+        基于向量检索的字段提取
+        
+        文档按 Config.RETRIEVAL_CHUNK_SIZE 分块并计算embedding，建立文档内的向量索引；
+        每个字段名的embedding检索最相关的 Config.RETRIEVAL_TOP_K 个块。相关块重合的字段
+        合并为一组（每组的块数不超过 Config.RETRIEVAL_MAX_CHUNKS_PER_PROMPT），每组一次模型调用，
+        各组并行执行。模型输入只包含相关块，不再随文档长度增长。
+        
+        Args:
+            document_content (str): 文档内容
+            field_list (list): 需要提取的字段列表
+        
+        Returns:
+            dict | None: 以 field_list 为键的提取结果，未提取到的字段为None；
+                embedding或向量索引不可用时返回None，由调用方回退到 _extract_in_chunks
+        
+        Raises:
+            Exception: 所有分组的模型调用都失败时抛出
+        """
+        from ..tender_generation_core.chunker import chunk_text
+        from .vector_index import build_chunk_index, is_available
+        
+        if not field_list or not is_available():
+            return None
+        
+        chunks = chunk_text(document_content, Config.RETRIEVAL_CHUNK_SIZE, Config.EXTRACTION_CHUNK_OVERLAP)
+        if not chunks:
+            return None
+        
+        chunk_embeddings = self._embed_texts(chunks)
+        field_embeddings = self._embed_texts(field_list) if chunk_embeddings else None
+        index = build_chunk_index(chunk_embeddings, Config.RETRIEVAL_INDEX_BACKEND) if field_embeddings else None
+        if index is None:
+            self.logger.warning("向量检索不可用，改为逐块提取")
+            return None
+        try:
+            hits = index.search_many(field_embeddings, Config.RETRIEVAL_TOP_K)
+        except ValueError as e:
+            self.logger.warning(f"向量检索失败，改为逐块提取: {str(e)}")
+            return None
+        
+        groups = self._group_fields_by_chunks(
+            field_list, [[chunk_index for chunk_index, _ in field_hits] for field_hits in hits])
+        
+        def extract_group(fields, chunk_indices):
+            # 相关块按文档顺序拼接，保持上下文连贯
+            context = "\n\n".join(chunks[chunk_index] for chunk_index in sorted(chunk_indices))
+            prompt = self._build_dynamic_extraction_prompt(context, fields)
+            return self._parse_response(self._call_json('tender_notice', prompt, fields))
+        
+        result = {field: None for field in field_list}
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, Config.EXTRACTION_MAX_WORKERS),
+                                thread_name_prefix="llm-retrieve") as executor:
+            futures = {executor.submit(extract_group, fields, chunk_indices): fields
+                       for fields, chunk_indices in groups}
+            for future, fields in futures.items():
+                try:
+                    group_result = future.result()
+                except Exception as e:
+                    errors.append(str(e))
+                    self.logger.warning(f"字段 {fields} 检索提取失败: {str(e)}")
+                    continue
+                if isinstance(group_result, dict):
+                    for field in fields:
+                        result[field] = group_result.get(field)
+        
+        if len(errors) == len(groups):
+            raise Exception(f"大模型调用失败: {errors[0]}")
+        
+        used_chunks = len(set().union(*(chunk_indices for _, chunk_indices in groups)))
+        self.logger.info(f"检索提取完成：共 {len(chunks)} 块，{len(field_list)} 个字段分 {len(groups)} 组调用，"
+                         f"使用 {used_chunks} 块，失败 {len(errors)} 组（索引后端 {index.backend}）")
+        return result
+    
+    @staticmethod
+    def _group_fields_by_chunks(field_list, field_chunks):
+        """
+        将相关块重合的字段合并为一组，减少模型调用次数
+        
+        按字段顺序贪心分配：放入新增块数最少、且合并后块数不超过
+        Config.RETRIEVAL_MAX_CHUNKS_PER_PROMPT 的已有分组，否则新建分组。
+        
+        Returns:
+            list: [(字段列表, 块序号集合)]
+        """
+        max_chunks = max(Config.RETRIEVAL_MAX_CHUNKS_PER_PROMPT, Config.RETRIEVAL_TOP_K, 1)
+        groups = []
+        for field, chunk_indices in zip(field_list, field_chunks):
+            chunk_indices = set(chunk_indices)
+            best, best_added = None, None
+            for group in groups:
+                added = len(chunk_indices - group[1])
+                if len(group[1]) + added <= max_chunks and (best is None or added < best_added):
+                    best, best_added = group, added
+            if best is None:
+                groups.append(([field], chunk_indices))
+            else:
+                best[0].append(field)
+                best[1].update(chunk_indices)
+        return groups
+    
+    def _embed_texts(self, texts):
+        """批量计算embedding，失败时返回None"""
+        try:
+            return self.get_text_embeddings(texts)
+        except Exception as e:
+            self.logger.warning(f"批量获取 embedding 失败: {str(e)}")
+            return None
+    
     def _build_dynamic_extraction_prompt(self, content, field_list):
         """
         根据字段列表动态构建信息提取提示词
@@ -556,6 +812,17 @@ class LLMService:
 """
         return prompt
     
+    @property
+    def ollama_client(self):
+        """Ollama客户端：未显式指定 ollama_url 时优先使用模型管理器的客户端（可配置多台主机负载均衡），
+        否则连接 ollama_url"""
+        client = None if self._explicit_ollama_url else self.model_manager.clients.get('ollama')
+        if client is None:
+            if self._fallback_ollama_client is None:
+                self._fallback_ollama_client = OllamaClient(self.ollama_url, self.transport)
+            client = self._fallback_ollama_client
+        return client
+    
     def _call_ollama(self, prompt):
         """
         调用Ollama本地模型API进行文本生成
@@ -581,7 +848,8 @@ class LLMService:
         
         API Configuration:
             - 使用非流式模式（stream: false）
-            - 超时设置为600秒，适应长文档处理
+            - 经共享传输层发送，超时和重试按 generate 调用类型配置（默认读取超时600秒，适应长文档处理）
+            - 配置多台Ollama主机时按最少未完成请求选择主机
             - 使用配置的模型名称
         
         Request Format:
@@ -610,14 +878,11 @@ class LLMService:
         payload = {
             "model": self.model_name,
             "prompt": prompt,
-            "stream": False
+            "stream": False,
+            **residency_manager.call_params('tender_notice')
         }
         
-        response = requests.post(
-            f"{self.ollama_url}/api/generate",
-            json=payload,
-            timeout=600
-        )
+        response = self.ollama_client.post("/api/generate", payload, "generate")
         
         if response.status_code == 200:
             return response.json()['response']
@@ -648,15 +913,10 @@ class LLMService:
                 - 响应中不包含有效的JSON数据
         
         Parsing Strategy:
-            1. 首先尝试直接解析整个响应为JSON
-            2. 如果失败，使用正则表达式提取JSON部分
+            1. 首先尝试直接解析整个响应为JSON（JSON输出模式下的响应即为完整的JSON对象）
+            2. 如果失败，用 extract_json_object 提取第一个合法的JSON对象
             3. 支持多行JSON和嵌套结构
-            4. 处理常见的格式问题和特殊字符
-        
-        Regex Pattern:
-            - 使用 r'\{.*\}' 匹配大括号包围的JSON内容
-            - DOTALL标志支持跨行匹配
-            - 贪婪匹配确保获取完整JSON结构
+            4. 对象前后的说明文字、代码块标记和其他大括号内容不影响提取
         
         Example:
             >>> response = '''这是提取的信息：
@@ -683,13 +943,11 @@ class LLMService:
             # 尝试直接解析JSON
             return json.loads(response)
         except json.JSONDecodeError:
-            # 如果直接解析失败，尝试提取JSON部分
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
+            # 如果直接解析失败，提取第一个合法的JSON对象
+            result = extract_json_object(response)
+            if result is None:
                 raise Exception("无法解析大模型返回的JSON格式")
+            return result
 
     def summarize_document_purpose(self, doc_text: str) -> str:
         """
@@ -799,7 +1057,7 @@ class LLMService:
         
         API Configuration:
             - 使用配置的embedding模型（如nomic-embed-text）
-            - 超时设置为30秒
+            - 超时和重试按 embed 调用类型配置（见 http_transport_config.ini）
             - 标准的JSON格式请求
         
         Request Format:
@@ -851,28 +1109,78 @@ class LLMService:
             - 适用于多种NLP下游任务
         """
         try:
-            # 调用 Ollama 的 embedding API
-            url = f"{self.ollama_url}/api/embeddings"
-            
-            payload = {
-                "model": self.embedding_model,
-                "prompt": text
-            }
-            
-            response = requests.post(
-                url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('embedding', [])
-            else:
-                self.logger.error(f"Embedding API 调用失败: {response.status_code}")
-                return []
-                
+            return [float(value) for value in self.get_text_embeddings([text])[0]]
         except Exception as e:
             self.logger.error(f"获取 embedding 时出错: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    def get_text_embeddings(self, texts):
+        """
+        批量获取文本的向量表示
+        
+        先查持久化向量缓存（键为embedding模型 + 文本哈希），未命中的文本去重后
+        按 Config.EMBEDDING_BATCH_SIZE 分批调用 Ollama 的 /api/embed（一次请求多条文本），
+        请求经共享传输层复用连接池中的连接；结果写回缓存。Ollama 版本过旧不支持 /api/embed 时
+        改用 /api/embeddings 逐条请求。
+        
+        Args:
+            texts (list): 文本列表
+        
+        Returns:
+            list: 与 texts 一一对应的float32向量（numpy数组；未安装numpy时为浮点数列表）
+        
+        Raises:
+            Exception: embedding服务调用失败或返回的向量数量不符时抛出
+                （与 get_text_embedding 不同，不会以空向量静默返回）
+        """
+        texts = list(texts)
+        vectors = self.embedding_cache.get_many(self.embedding_model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        
+        if missing:
+            computed = {}
+            batch_size = max(1, Config.EMBEDDING_BATCH_SIZE)
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                batch_vectors = [to_float32(vector) for vector in self._request_embeddings(batch)]
+                self.embedding_cache.put_many(self.embedding_model, batch, batch_vectors)
+                computed.update(zip(batch, batch_vectors))
+            cached = sum(1 for vector in vectors if vector is not None)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+            self.logger.info(f"获取 embedding：共 {len(texts)} 条，缓存命中 {cached} 条，请求 {len(missing)} 条")
+        return vectors
+    
+    def _request_embeddings(self, texts):
+        """调用embedding API计算一批文本的向量"""
+        if not self._legacy_embed_api:
+            response = self.ollama_client.post(
+                "/api/embed",
+                {"model": self.embedding_model, "input": texts,
+                 "keep_alive": residency_manager.config.keep_alive('embedding')},
+                "embed"
+            )
+            if response.status_code != 404:
+                if response.status_code != 200:
+                    raise Exception(f"Embedding API 调用失败: {response.status_code} {response.text[:200]}")
+                embeddings = response.json().get('embeddings') or []
+                if len(embeddings) != len(texts) or not all(embeddings):
+                    raise Exception(f"Embedding API 返回 {len(embeddings)} 条向量，请求 {len(texts)} 条")
+                return embeddings
+            self.logger.warning("Ollama 不支持 /api/embed，改用 /api/embeddings 逐条请求")
+            self._legacy_embed_api = True
+        
+        embeddings = []
+        for text in texts:
+            response = self.ollama_client.post(
+                "/api/embeddings",
+                {"model": self.embedding_model, "prompt": text,
+                 "keep_alive": residency_manager.config.keep_alive('embedding')},
+                "embed"
+            )
+            if response.status_code != 200:
+                raise Exception(f"Embedding API 调用失败: {response.status_code}")
+            embedding = response.json().get('embedding')
+            if not embedding:
+                raise Exception("Embedding API 返回空向量")
+            embeddings.append(embedding)
+        return embeddings
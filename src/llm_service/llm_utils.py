@@ -3,6 +3,8 @@ import json
 import re
 from typing import Dict, List, Any, Optional
 
+from .json_stream import extract_json_object
+
 def validate_json_response(response: str) -> bool:
     """
     验证响应是否为有效的JSON格式
@@ -74,15 +76,8 @@ def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
     提取策略
     --------
     1. 直接解析：首先尝试将整个文本作为JSON解析
-    2. 正则提取：使用正则表达式匹配大括号包围的JSON片段
-    3. 递归解析：对提取的片段再次进行JSON解析
-    4. 失败处理：所有策略失败时返回None
-    
-    正则表达式
-    ----------
-    - 模式：r'\{.*\}'
-    - 标志：re.DOTALL（匹配换行符）
-    - 匹配：从第一个'{'到最后一个'}'的内容
+    2. 对象提取：用 extract_json_object 按JSON语法扫描，返回第一个合法的JSON对象
+    3. 失败处理：所有策略失败时返回None
     
     示例
     ----
@@ -104,7 +99,7 @@ def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
     --------
     - 仅返回字典类型的JSON对象
     - 不支持JSON数组的提取
-    - 嵌套大括号可能影响提取准确性
+    - 文本中有多个JSON对象时只返回第一个合法的对象
     - 建议配合validate_json_response使用
     """
     try:
@@ -112,13 +107,7 @@ def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
         return json.loads(text)
     except json.JSONDecodeError:
         # 尝试提取JSON部分
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
-                pass
-        return None
+        return extract_json_object(text)
 
 def clean_field_value(value: Any) -> Any:
     """
@@ -521,4 +510,65 @@ def format_extraction_result(extracted_data: Dict[str, Any], confidence: float =
     else:
         result['confidence'] = calculate_extraction_confidence(extracted_data)
     
-    return result
\ No newline at end of file
+    return result
+
+def merge_chunk_extractions(chunk_results: List[Dict[str, Any]], field_list: List[str]) -> Dict[str, Any]:
+    """
+    合并分块提取的结果（map-reduce 的 reduce 阶段）
+    
+    长文档按块分别提取后，同一字段可能在多个块中提取到不同的值。
+    该函数对每个字段的候选值投票：每个块的投票权重为该块提取到的字段占全部字段的比例，
+    相同的值（清理空白后）权重累加，取权重最高的值；权重相同时取文档中更靠前的块的值。
+    
+    Parameters
+    ----------
+    chunk_results : List[Dict[str, Any]]
+        按块在文档中的顺序排列的提取结果，解析失败的块传入空字典
+    field_list : List[str]
+        需要提取的字段列表，决定返回结果的键及顺序
+        
+    Returns
+    -------
+    Dict[str, Any]
+        合并后的字段字典，所有块都未提取到的字段为None
+        
+    投票规则
+    --------
+    - 块权重：该块提取到的有效字段数 / field_list 的字段总数；
+      按完整字段列表计算，后续块只被要求提取剩余字段时，其权重不会因请求字段少而虚高
+    - 候选值：clean_field_value 清理后非空的值
+    - 比较键：字符串直接比较，其他类型按 JSON 序列化后比较
+    
+    示例
+    ----
+    >>> merge_chunk_extractions([
+    ...     {'项目名称': '某某工程', '联系人': None},
+    ...     {'项目名称': '某某 工程二期', '联系人': '张三'},
+    ...     {'项目名称': '某某工程', '联系人': None}
+    ... ], ['项目名称', '联系人'])
+    {'项目名称': '某某工程', '联系人': '张三'}
+    """
+    candidates: Dict[str, Dict[str, List[Any]]] = {field: {} for field in field_list}
+    
+    for chunk_index, result in enumerate(chunk_results):
+        if not result:
+            continue
+        values = {field: clean_field_value(result.get(field)) for field in field_list}
+        filled = sum(value is not None for value in values.values())
+        if not filled:
+            continue
+        weight = filled / len(field_list)
+        for field, value in values.items():
+            if value is None:
+                continue
+            key = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+            # [累计权重, 首次出现的块序号, 值]
+            entry = candidates[field].setdefault(key, [0.0, chunk_index, value])
+            entry[0] += weight
+    
+    merged = {}
+    for field in field_list:
+        entries = candidates[field].values()
+        best = max(entries, key=lambda entry: (entry[0], -entry[1])) if entries else None
+        merged[field] = best[2] if best else None
+    return merged
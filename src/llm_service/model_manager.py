@@ -14,6 +14,8 @@
     4. 客户端管理 - 统一管理不同提供商的API客户端
     5. 可用性检查 - 实时检查模型服务的可用性和响应时间
     6. 统一调用接口 - 提供一致的模型调用API
+    7. 故障转移与对冲请求 - 按模块配置备用提供商顺序，可在调用超过p95延迟时向下一个提供商发送对冲请求
+    8. 结构化输出 - JSON输出模式下流式增量解析，格式错误时提前中止
 
 技术特点:
     - 插件化架构设计，易于扩展新的模型提供商
@@ -59,11 +61,11 @@
 
 依赖库:
     - json: JSON配置文件处理
-    - requests: HTTP请求处理
+    - http_transport: 共享的HTTP传输层（连接池、分类型超时、抖动退避重试）
+    - provider_clients: Ollama / OpenAI兼容接口的HTTP客户端（不依赖 ollama / openai SDK）
+    - latency_tracker: 进程内按提供商统计调用延迟分位数（对冲请求阈值）
     - logging: 日志记录
     - typing: 类型注解支持
-    - ollama: Ollama客户端（可选）
-    - openai: OpenAI兼容客户端（可选）
 
 作者: TenderInformationExtractor Team
 创建时间: 2024
@@ -73,20 +75,41 @@
 
 import json
 import os
-import requests
+import time
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional, List, Tuple
 from config.settings import Config
+from .http_transport import http_transport
+from .latency_tracker import latency_tracker
+from .provider_clients import OllamaClient, OpenAICompatibleClient
+from .ollama_residency import residency_manager
+from .json_stream import IncrementalJsonParser
+
+# 对冲请求默认参数（可在 model_config.json 的 hedging 中覆盖）
+DEFAULT_HEDGING = {"percentile": 95, "min_samples": 20, "min_delay": 1.0, "max_workers": 32}
+
+# 各提供商默认是否请求JSON输出模式（可在提供商配置中用 json_mode 覆盖）
+DEFAULT_JSON_MODE = {"ollama": True, "deepseek": True, "siliconcloud": False}
+
+# OpenAI兼容接口流式调用时默认是否请求用量事件 stream_options.include_usage（可在提供商配置中用 stream_usage 覆盖）
+DEFAULT_STREAM_USAGE = {"deepseek": True, "siliconcloud": False}
+
+# JSON对象结束后最多再读取的流式消息数，用于等待流末尾的token统计（Ollama 的 done 消息、OpenAI兼容接口的用量事件）
+JSON_STREAM_TAIL_CHUNKS = 16
+
+
+@dataclass(frozen=True)
+class ModelContext:
+    """单次请求的模型选择
+
+    随请求传给 call_model，覆盖模块当前配置的提供商；不修改共享配置、不写配置文件，
+    使用不同提供商的请求可以并发执行。provider 为None时使用模块当前配置的提供商。
+    """
+    provider: Optional[str] = None
 
-try:
-    import ollama
-except ImportError:
-    ollama = None
-    
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
 
 class ModelManager:
     """
@@ -122,6 +145,8 @@ class ModelManager:
         >>> manager = ModelManager()
         >>> response = manager.call_model('tender_notice', '提取招标信息')
         >>> manager.set_current_model('tender_notice', 'deepseek')
+        >>> context = manager.create_context('tender_generation', 'siliconcloud')
+        >>> response = manager.call_model('tender_generation', '总结以下内容', context=context)
         >>> availability = manager.check_model_availability('ollama')
     
     注意事项:
@@ -142,8 +167,12 @@ class ModelManager:
         5. 初始化各模型提供商的客户端
         
         配置文件结构:
-            - models: 各模块的模型配置（当前使用的模型、可选项）
+            - models: 各模块的模型配置（当前使用的模型、可选项、备用提供商 fallback、是否对冲 hedge）
+            - hedging: 对冲请求参数（percentile、min_samples、min_delay、max_workers）
             - providers: 各提供商的连接配置（URL、API密钥等）
+              Ollama 可用 urls 配置多台主机（如 ["http://10.0.0.1:11434", "http://10.0.0.2:11434"]），
+              请求按最少未完成请求在主机间分配；未配置 urls 时使用 url
+              json_mode 覆盖提供商是否支持JSON输出模式（默认 Ollama、DeepSeek 支持）
         
         Raises
         ------
@@ -165,6 +194,13 @@ class ModelManager:
         self.config = self._load_config()
         self.clients = {}
         self._initialize_clients()
+        # 最近一次调用的信息（提供商、模型、token用量），按线程隔离
+        self._call_info = threading.local()
+        # 对冲请求线程池（首次对冲调用时创建）
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()
+        # 管理接口切换模型时保护配置修改和写文件
+        self._config_lock = threading.Lock()
         
         # 记录初始化完成信息
         self.logger.info(f"模型管理器初始化完成，已加载 {len(self.clients)} 个客户端")
@@ -207,69 +243,66 @@ class ModelManager:
         # 初始化Ollama客户端
         if 'ollama' in providers:
             try:
-                if ollama is None:
-                    self.logger.warning("ollama模块未安装，无法初始化Ollama客户端")
-                else:
-                    ollama_config = providers['ollama']
-                    self.clients['ollama'] = ollama.Client(host=ollama_config.get('url', 'http://localhost:11434'))
-                    self.logger.info("Ollama客户端初始化成功")
+                ollama_config = providers['ollama']
+                client = OllamaClient(self._ollama_hosts(ollama_config))
+                self.clients['ollama'] = client
+                self.logger.info(f"Ollama客户端初始化成功，服务地址: {', '.join(client.hosts)}")
             except Exception as e:
                 self.logger.error(f"Ollama客户端初始化失败: {e}")
         
         # 初始化DeepSeek客户端
         if 'deepseek' in providers:
             try:
-                if OpenAI is None:
-                    self.logger.warning("openai模块未安装，无法初始化DeepSeek客户端")
+                deepseek_config = providers['deepseek']
+                api_key = deepseek_config.get('api_key')
+                if api_key and api_key != 'your_api_key_here':
+                    self.clients['deepseek'] = OpenAICompatibleClient(
+                        deepseek_config.get('base_url', 'https://api.deepseek.com'),
+                        api_key,
+                        name="DeepSeek"
+                    )
+                    self.logger.info("DeepSeek客户端初始化成功")
                 else:
-                    deepseek_config = providers['deepseek']
-                    api_key = deepseek_config.get('api_key')
-                    if api_key and api_key != 'your_api_key_here':
-                        self.clients['deepseek'] = OpenAI(
-                            api_key=api_key,
-                            base_url=deepseek_config.get('base_url', 'https://api.deepseek.com')
-                        )
-                        self.logger.info("DeepSeek客户端初始化成功")
-                    else:
-                        self.logger.warning("DeepSeek API Key未配置")
+                    self.logger.warning("DeepSeek API Key未配置")
             except Exception as e:
                 self.logger.error(f"DeepSeek客户端初始化失败: {e}")
         
         # 初始化SiliconCloud客户端
         if 'siliconcloud' in providers:
             try:
-                if OpenAI is None:
-                    self.logger.warning("openai模块未安装，无法初始化SiliconCloud客户端")
+                siliconcloud_config = providers['siliconcloud']
+                api_key = siliconcloud_config.get('api_key')
+                if api_key and api_key != 'your_siliconcloud_api_key_here':
+                    self.clients['siliconcloud'] = OpenAICompatibleClient(
+                        siliconcloud_config.get('base_url', 'https://api.siliconflow.cn/v1'),
+                        api_key,
+                        name="SiliconCloud"
+                    )
+                    self.logger.info("SiliconCloud客户端初始化成功")
                 else:
-                    siliconcloud_config = providers['siliconcloud']
-                    api_key = siliconcloud_config.get('api_key')
-                    if api_key and api_key != 'your_siliconcloud_api_key_here':
-                        self.clients['siliconcloud'] = OpenAI(
-                            api_key=api_key,
-                            base_url=siliconcloud_config.get('base_url', 'https://api.siliconflow.cn/v1')
-                        )
-                        self.logger.info("SiliconCloud客户端初始化成功")
-                    else:
-                        self.logger.warning("SiliconCloud API Key未配置")
+                    self.logger.warning("SiliconCloud API Key未配置")
             except Exception as e:
                 self.logger.error(f"SiliconCloud客户端初始化失败: {e}")
     
+    @staticmethod
+    def _ollama_hosts(ollama_config: Dict[str, Any]) -> List[str]:
+        """Ollama 服务地址列表：优先使用 urls，未配置时使用 url"""
+        return ollama_config.get('urls') or [ollama_config.get('url', 'http://localhost:11434')]
+
     def get_current_model(self, module: str) -> str:
         """获取指定模块当前使用的模型"""
         return self.config.get('models', {}).get(module, {}).get('current', 'ollama')
     
     def set_current_model(self, module: str, provider: str) -> bool:
-        """设置指定模块使用的模型"""
+        """设置指定模块默认使用的模型（修改全局配置并写入配置文件，仅供管理接口使用；
+        单次请求使用其他提供商时用 create_context）"""
         try:
-            if module not in self.config.get('models', {}):
-                return False
-            
-            available_options = self.config['models'][module].get('options', [])
-            if provider not in available_options:
+            if not self.is_provider_allowed(module, provider):
                 return False
             
-            self.config['models'][module]['current'] = provider
-            self._save_config()
+            with self._config_lock:
+                self.config['models'][module]['current'] = provider
+                self._save_config()
             self.logger.info(f"模块 {module} 的模型已切换为 {provider}")
             return True
         except Exception as e:
@@ -284,73 +317,289 @@ class ModelManager:
         except Exception as e:
             self.logger.error(f"保存配置失败: {e}")
     
-    def call_model(self, module: str, prompt: str, **kwargs) -> str:
-        """统一的模型调用接口"""
-        provider = self.get_current_model(module)
+    def is_provider_allowed(self, module: str, provider: str) -> bool:
+        """提供商是否在模块的可选项中"""
+        return provider in self.config.get('models', {}).get(module, {}).get('options', [])
+    
+    def create_context(self, module: str, provider: Optional[str]) -> ModelContext:
+        """创建单次请求的模型选择；提供商不在模块可选项中时忽略（使用模块当前配置的提供商）"""
+        if provider and not self.is_provider_allowed(module, provider):
+            self.logger.warning(f"模块 {module} 不支持模型提供商 {provider}，使用当前配置的提供商")
+            provider = None
+        return ModelContext(provider=provider or None)
+    
+    def get_provider_chain(self, module: str, context: Optional[ModelContext] = None) -> List[str]:
+        """模块的提供商调用顺序：当前提供商（context 指定时使用其提供商）在前，
+        随后是 fallback 中配置且客户端已初始化的备用提供商"""
+        current = context.provider if context is not None and context.provider else self.get_current_model(module)
+        fallback = self.config.get('models', {}).get(module, {}).get('fallback', [])
+        chain = list(dict.fromkeys([current] + list(fallback)))
+        return chain[:1] + [provider for provider in chain[1:] if provider in self.clients]
+    
+    def call_model(self, module: str, prompt: str, context: Optional[ModelContext] = None, **kwargs) -> str:
+        """统一的模型调用接口
         
-        if provider == 'ollama':
-            return self._call_ollama(prompt, **kwargs)
-        elif provider == 'deepseek':
-            return self._call_deepseek(prompt, **kwargs)
-        elif provider == 'siliconcloud':
-            return self._call_siliconcloud(prompt, **kwargs)
+        context 为单次请求的模型选择（见 create_context），未指定时使用模块当前配置的提供商。
+        response_format="json" 时按提供商能力请求JSON输出模式，并流式增量解析输出：格式错误时立即中止
+        （换下一个提供商），返回值为顶层JSON对象的文本；json_fields 为期望的字段列表，输出中未请求的字段记录到调试日志。
+        按 get_provider_chain 的顺序调用：当前提供商失败时依次换备用提供商。
+        模块配置 "hedge": true 时启用对冲请求：调用超过该提供商最近调用耗时的分位数（默认p95）仍未返回时，
+        同时向下一个提供商发送相同请求，采用先返回的结果。
+        """
+        chain = self.get_provider_chain(module, context)
+        hedge = bool(self.config.get('models', {}).get(module, {}).get('hedge', False)) and len(chain) > 1
+        if hedge:
+            text, error, info, attempts = self._call_hedged(chain, module, prompt, **kwargs)
         else:
-            raise ValueError(f"不支持的模型提供商: {provider}")
+            text, error, info, attempts = self._call_with_fallback(chain, module, prompt, **kwargs)
+        
+        # 调用信息取采用结果（或最后一次失败）的提供商，attempts 为实际发出请求的提供商
+        self._call_info.last = {**info, 'attempts': attempts}
+        if error is not None:
+            if len(attempts) > 1:
+                raise Exception(f"所有模型提供商调用失败（{' → '.join(attempts)}）: {error}")
+            raise error
+        return text
+    
+    def _call_with_fallback(self, chain: List[str], module: str, prompt: str, **kwargs):
+        """依次调用各提供商，直到成功"""
+        attempts = []
+        for provider in chain:
+            attempts.append(provider)
+            text, error, info = self._attempt(provider, module, prompt, **kwargs)
+            if error is None:
+                return text, None, info, attempts
+            if provider != chain[-1]:
+                self.logger.warning(f"模块 {module} 调用 {provider} 失败，改用下一个提供商: {error}")
+        return None, error, info, attempts
     
-    def _call_ollama(self, prompt: str, **kwargs) -> str:
-        """调用Ollama模型"""
+    def _call_hedged(self, chain: List[str], module: str, prompt: str, **kwargs):
+        """对冲调用：最近发出的请求超过其提供商的延迟阈值仍未返回时，向下一个提供商发送相同请求，采用先返回的成功结果；
+        失败时立即换下一个提供商。未采用的请求在后台完成（结果丢弃，耗时仍计入延迟统计）"""
+        executor = self._get_hedge_executor()
+        attempts: List[str] = []
+        pending = {}
+        launched_at = 0.0
+        error, info = None, {}
+        
+        def launch():
+            nonlocal launched_at
+            provider = chain[len(attempts)]
+            attempts.append(provider)
+            pending[executor.submit(self._attempt, provider, module, prompt, **kwargs)] = provider
+            launched_at = time.perf_counter()
+        
+        launch()
+        while pending:
+            delay = self._hedge_delay(attempts[-1]) if len(attempts) < len(chain) else None
+            timeout = None if delay is None else max(0.0, launched_at + delay - time.perf_counter())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                self.logger.info(f"模块 {module} 调用 {attempts[-1]} 超过 {delay:.1f} 秒未返回，"
+                                 f"对冲请求 {chain[len(attempts)]}")
+                launch()
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                text, error, info = future.result()
+                if error is None:
+                    return text, None, info, attempts
+                self.logger.warning(f"模块 {module} 调用 {provider} 失败: {error}")
+            if not pending and len(attempts) < len(chain):
+                launch()
+        return None, error, info, attempts
+    
+    def _hedging_config(self) -> Dict[str, Any]:
+        """对冲请求参数：percentile 为触发阈值使用的分位数，样本数少于 min_samples 时不对冲，阈值不低于 min_delay 秒"""
+        return {**DEFAULT_HEDGING, **self.config.get('hedging', {})}
+    
+    def _hedge_delay(self, provider: str) -> Optional[float]:
+        """提供商的对冲触发阈值（秒），延迟样本不足时返回None（不对冲，只在失败时换提供商）"""
+        config = self._hedging_config()
+        threshold = latency_tracker.percentile(provider, config['percentile'], config['min_samples'])
+        return None if threshold is None else max(threshold, config['min_delay'])
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        if self._hedge_executor is None:
+            with self._hedge_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=self._hedging_config()['max_workers'], thread_name_prefix="llm-hedge")
+        return self._hedge_executor
+    
+    def _attempt(self, provider: str, module: str, prompt: str, **kwargs) -> Tuple[Optional[str], Optional[Exception], Dict[str, Any]]:
+        """在当前线程调用一个提供商，返回 (响应, 异常, 调用信息)，并记录耗时到延迟统计"""
+        self._call_info.last = {
+            'provider': provider,
+            'model': self.config.get('providers', {}).get(provider, {}).get('model', ''),
+            'prompt_tokens': None,
+            'completion_tokens': None,
+            'retries': 0
+        }
+        
+        started_at = time.perf_counter()
+        text, error = None, None
+        try:
+            if provider == 'ollama':
+                text = self._call_ollama(prompt, module=module, **kwargs)
+            elif provider == 'deepseek':
+                text = self._call_deepseek(prompt, **kwargs)
+            elif provider == 'siliconcloud':
+                text = self._call_siliconcloud(prompt, **kwargs)
+            else:
+                raise ValueError(f"不支持的模型提供商: {provider}")
+        except Exception as e:
+            error = e
+        finally:
+            # 传输层记录的本线程最近一次请求的重试次数
+            self._call_info.last['retries'] = http_transport.get_last_retries()
+        latency_tracker.record(provider, time.perf_counter() - started_at, success=error is None)
+        return text, error, dict(self._call_info.last)
+    
+    def _call_ollama(self, prompt: str, module: Optional[str] = None, response_format: Optional[str] = None,
+                     json_fields: Optional[List[str]] = None, **kwargs) -> str:
+        """调用Ollama模型（按模块附带 keep_alive 和运行参数）"""
         try:
             if 'ollama' not in self.clients:
                 raise Exception("Ollama客户端未初始化")
             
             client = self.clients['ollama']
             model_name = self.config['providers']['ollama']['model']
+            messages = [{'role': 'user', 'content': prompt}]
+            params = residency_manager.call_params(module)
             
-            response = client.chat(
-                model=model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            return response['message']['content']
+            if response_format == 'json':
+                if self._supports_json_mode('ollama'):
+                    params['format'] = 'json'
+                content, response = self._consume_json_stream(
+                    client.chat_stream(model=model_name, messages=messages, **params),
+                    lambda chunk: (chunk.get('message') or {}).get('content') or '',
+                    lambda chunk: bool(chunk.get('done')),
+                    json_fields
+                )
+            else:
+                response = client.chat(model=model_name, messages=messages, **params)
+                content = response['message']['content']
+            residency_manager.record_call(model_name, response, client.last_host())
+            self._record_usage(response.get('prompt_eval_count'), response.get('eval_count'))
+            return content
         except Exception as e:
             self.logger.error(f"Ollama调用失败: {e}")
             raise Exception(f"Ollama调用失败: {e}")
     
-    def _call_deepseek(self, prompt: str, **kwargs) -> str:
+    def _call_deepseek(self, prompt: str, response_format: Optional[str] = None,
+                     json_fields: Optional[List[str]] = None, **kwargs) -> str:
         """调用DeepSeek模型"""
         try:
             if 'deepseek' not in self.clients:
                 raise Exception("DeepSeek客户端未初始化")
             
-            client = self.clients['deepseek']
-            model_name = self.config['providers']['deepseek']['model']
-            
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            return response.choices[0].message.content
+            return self._call_openai_compatible('deepseek', prompt, response_format, json_fields)
         except Exception as e:
             self.logger.error(f"DeepSeek调用失败: {e}")
             raise Exception(f"DeepSeek调用失败: {e}")
     
-    def _call_siliconcloud(self, prompt: str, **kwargs) -> str:
+    def _call_siliconcloud(self, prompt: str, response_format: Optional[str] = None,
+                     json_fields: Optional[List[str]] = None, **kwargs) -> str:
         """调用SiliconCloud模型"""
         try:
             if 'siliconcloud' not in self.clients:
                 raise Exception("SiliconCloud客户端未初始化")
             
-            client = self.clients['siliconcloud']
-            model_name = self.config['providers']['siliconcloud']['model']
-            
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            return response.choices[0].message.content
+            return self._call_openai_compatible('siliconcloud', prompt, response_format, json_fields)
         except Exception as e:
             self.logger.error(f"SiliconCloud调用失败: {e}")
             raise Exception(f"SiliconCloud调用失败: {e}")
     
+    def _call_openai_compatible(self, provider: str, prompt: str, response_format: Optional[str] = None,
+                                json_fields: Optional[List[str]] = None) -> str:
+        """调用OpenAI兼容接口；JSON输出时请求 response_format 并流式增量解析"""
+        client = self.clients[provider]
+        model_name = self.config['providers'][provider]['model']
+        messages = [{'role': 'user', 'content': prompt}]
+        
+        if response_format == 'json':
+            params = {'response_format': {'type': 'json_object'}} if self._supports_json_mode(provider) else {}
+            if self._supports_stream_usage(provider):
+                params['stream_options'] = {'include_usage': True}
+            content, usage_event = self._consume_json_stream(
+                client.chat_completions_stream(model=model_name, messages=messages, **params),
+                lambda event: ((event.get('choices') or [{}])[0].get('delta') or {}).get('content') or '',
+                lambda event: bool(event.get('usage')),
+                json_fields
+            )
+            self._record_openai_usage(usage_event)
+            return content
+        
+        response = client.chat_completions(model=model_name, messages=messages)
+        self._record_openai_usage(response)
+        return response['choices'][0]['message']['content']
+    
+    def _supports_json_mode(self, provider: str) -> bool:
+        """提供商是否支持JSON输出模式（Ollama 的 format、OpenAI兼容接口的 response_format），
+        可在 model_config.json 的提供商配置中用 json_mode 覆盖"""
+        provider_config = self.config.get('providers', {}).get(provider, {})
+        return bool(provider_config.get('json_mode', DEFAULT_JSON_MODE.get(provider, False)))
+    
+    def _supports_stream_usage(self, provider: str) -> bool:
+        """OpenAI兼容接口流式调用时是否请求用量事件，可在提供商配置中用 stream_usage 覆盖"""
+        provider_config = self.config.get('providers', {}).get(provider, {})
+        return bool(provider_config.get('stream_usage', DEFAULT_STREAM_USAGE.get(provider, False)))
+    
+    def _consume_json_stream(self, stream, get_text, has_usage,
+                             json_fields: Optional[List[str]] = None) -> Tuple[str, Dict[str, Any]]:
+        """边接收流式输出边增量解析JSON：格式错误时立即中止
+        
+        顶层对象结束后最多再读取 JSON_STREAM_TAIL_CHUNKS 条消息，等待流末尾带token统计的消息；
+        模型在对象之后仍继续输出时关闭连接，不再等待，本次调用没有token统计。
+        
+        Args:
+            stream: 流式消息迭代器（生成器）
+            get_text: 取出消息中输出片段的函数
+            has_usage: 判断消息是否带token统计的函数
+            json_fields: 期望的字段列表
+        
+        Returns:
+            (JSON对象文本, 最后一条带token统计的消息，没有收到时为空dict)
+        
+        Raises:
+            JsonStreamError: 输出格式错误或输出结束时JSON对象仍不完整
+        """
+        parser = IncrementalJsonParser(json_fields)
+        usage: Dict[str, Any] = {}
+        tail = 0
+        try:
+            for chunk in stream:
+                if has_usage(chunk):
+                    usage = chunk
+                if not parser.done:
+                    parser.feed(get_text(chunk))
+                    continue
+                tail += 1
+                if tail > JSON_STREAM_TAIL_CHUNKS:
+                    self.logger.debug("JSON对象之后模型仍在输出，停止读取，本次调用没有token统计")
+                    break
+        finally:
+            # 关闭生成器即关闭连接，服务端停止生成
+            stream.close()
+        return parser.text(), usage
+    
+    def get_last_call_info(self) -> Dict[str, Any]:
+        """获取当前线程最近一次模型调用的提供商、模型和token用量"""
+        return dict(getattr(self._call_info, 'last', {}))
+    
+    def _record_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        """记录本次调用的token用量（提供商未返回时为None）"""
+        info = getattr(self._call_info, 'last', None)
+        if info is not None:
+            info['prompt_tokens'] = prompt_tokens
+            info['completion_tokens'] = completion_tokens
+    
+    def _record_openai_usage(self, response: Dict[str, Any]):
+        """从OpenAI兼容接口的响应中记录token用量"""
+        usage = response.get('usage') or {}
+        self._record_usage(usage.get('prompt_tokens'), usage.get('completion_tokens'))
+    
     def check_model_availability(self, provider: str) -> Dict[str, Any]:
         """检查模型可用性"""
         result = {
@@ -382,29 +631,33 @@ class ModelManager:
     def _check_ollama_availability(self) -> Dict[str, Any]:
         """检查Ollama可用性"""
         try:
+            if 'ollama' not in self.clients:
+                return {'available': False, 'message': 'Ollama客户端未初始化'}
             ollama_config = self.config['providers']['ollama']
-            url = ollama_config['url']
+            client = self.clients['ollama']
             
-            # 检查Ollama服务是否运行
-            response = requests.get(f"{url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                # 检查指定模型是否存在
-                models = response.json().get('models', [])
-                model_name = ollama_config['model']
-                
-                # 检查完整模型名称或基础名称匹配
-                model_exists = any(
-                    model.get('name', '') == model_name or 
-                    model.get('name', '').startswith(model_name.split(':')[0]) 
-                    for model in models
-                )
-                
-                if model_exists:
-                    return {'available': True, 'message': 'Ollama服务正常，模型可用'}
-                else:
-                    return {'available': False, 'message': f'模型 {model_name} 未找到'}
+            # 检查Ollama服务是否运行（多台主机时由任一可用主机返回）
+            try:
+                models = client.list_models()
+            except Exception:
+                return {'available': False, 'message': 'Ollama服务连接失败',
+                        'endpoints': client.pool.get_status()['endpoints']}
+            
+            # 检查指定模型是否存在
+            model_name = ollama_config['model']
+            
+            # 检查完整模型名称或基础名称匹配
+            model_exists = any(
+                model.get('name', '') == model_name or 
+                model.get('name', '').startswith(model_name.split(':')[0]) 
+                for model in models
+            )
+            
+            result = {'endpoints': client.pool.get_status()['endpoints']}
+            if model_exists:
+                return {'available': True, 'message': 'Ollama服务正常，模型可用', **result}
             else:
-                return {'available': False, 'message': 'Ollama服务连接失败'}
+                return {'available': False, 'message': f'模型 {model_name} 未找到', **result}
         except Exception as e:
             return {'available': False, 'message': f'Ollama检查失败: {str(e)}'}
     
@@ -416,13 +669,13 @@ class ModelManager:
             
             # 发送一个简单的测试请求
             client = self.clients['deepseek']
-            response = client.chat.completions.create(
+            response = client.chat_completions(
                 model=self.config['providers']['deepseek']['model'],
                 messages=[{'role': 'user', 'content': '测试'}],
                 max_tokens=10
             )
             
-            if response.choices and len(response.choices) > 0:
+            if response.get('choices'):
                 return {'available': True, 'message': 'DeepSeek API正常'}
             else:
                 return {'available': False, 'message': 'DeepSeek API响应异常'}
@@ -437,19 +690,33 @@ class ModelManager:
             
             # 发送一个简单的测试请求
             client = self.clients['siliconcloud']
-            response = client.chat.completions.create(
+            response = client.chat_completions(
                 model=self.config['providers']['siliconcloud']['model'],
                 messages=[{'role': 'user', 'content': '测试'}],
                 max_tokens=10
             )
             
-            if response.choices and len(response.choices) > 0:
+            if response.get('choices'):
                 return {'available': True, 'message': 'SiliconCloud API正常'}
             else:
                 return {'available': False, 'message': 'SiliconCloud API响应异常'}
         except Exception as e:
             return {'available': False, 'message': f'SiliconCloud检查失败: {str(e)}'}
     
+    def start_ollama_residency(self):
+        """启动Ollama模型驻留管理（每台主机分别预加载）：预加载Embedding模型，有模块使用Ollama时同时预加载Ollama生成模型"""
+        ollama_config = self.config.get('providers', {}).get('ollama')
+        if not ollama_config or 'ollama' not in self.clients:
+            return
+        ollama_modules = [module for module, item in self.config.get('models', {}).items()
+                          if item.get('current') == 'ollama']
+        residency_manager.start(
+            self.clients['ollama'].hosts,
+            [ollama_config.get('model')] if ollama_modules else [],
+            [Config.EMBEDDING_MODEL],
+            ollama_modules[0] if ollama_modules else None
+        )
+    
     def get_model_info(self) -> Dict[str, Any]:
         """获取模型信息"""
         return {
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ollama模型驻留管理
+
+功能说明：
+- 应用启动时在后台预加载配置的模型，首个任务不再承担模型加载耗时
+- 每次调用按模块附带 keep_alive，任务间隔较长时模型不会被 Ollama 卸载后重新加载
+- 每次调用附带 config/ollama_speed_config.ini 中的运行参数（num_ctx、num_predict、num_thread、num_batch）
+- 定期通过 /api/ps 刷新模型加载状态；根据响应中的 load_duration 统计冷加载次数和耗时
+- 配置多台Ollama主机时，每台主机分别预加载、刷新，加载状态按主机记录
+"""
+
+import os
+import time
+import logging
+import threading
+import configparser
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+from .http_transport import HttpTransport, http_transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_FILE = Path(__file__).resolve().parents[2] / "config" / "ollama_speed_config.ini"
+
+# 暴露给配置文件的运行参数及其类型
+RUNTIME_OPTIONS = {"num_ctx": int, "num_predict": int, "num_thread": int, "num_batch": int}
+
+# load_duration 超过该值（秒）的调用视为冷加载（模型此前未驻留）
+COLD_LOAD_SECONDS = 1.0
+
+
+class ResidencyConfig:
+    """驻留管理配置"""
+
+    def __init__(self, config_file: Optional[str] = None):
+        self.config_file = str(config_file or DEFAULT_CONFIG_FILE)
+        self.config = configparser.ConfigParser()
+        self.reload()
+
+    def reload(self):
+        """重新读取配置文件（文件不存在时使用默认值）"""
+        self.config = configparser.ConfigParser()
+        if os.path.exists(self.config_file):
+            self.config.read(self.config_file, encoding='utf-8')
+        else:
+            logger.warning(f"Ollama驻留配置文件不存在，使用默认配置: {self.config_file}")
+
+    @property
+    def preload_on_startup(self) -> bool:
+        return self.config.getboolean('Residency', 'PreloadOnStartup', fallback=True)
+
+    @property
+    def preload_models(self) -> List[str]:
+        value = self.config.get('Residency', 'PreloadModels', fallback='')
+        return [model.strip() for model in value.split(',') if model.strip()]
+
+    @property
+    def refresh_interval(self) -> float:
+        return self.config.getfloat('Residency', 'RefreshInterval', fallback=60)
+
+    def keep_alive(self, module: Optional[str] = None) -> str:
+        """模块的 keep_alive（未单独配置时使用 Default）"""
+        default = self.config.get('KeepAlive', 'Default', fallback='30m')
+        if module:
+            return self.config.get('KeepAlive', module, fallback=default)
+        return default
+
+    def runtime_options(self, module: Optional[str] = None) -> Dict[str, int]:
+        """模块的运行参数：[RuntimeOptions] 为基础，[RuntimeOptions.<模块>] 覆盖，留空的参数不传"""
+        options = {}
+        sections = ['RuntimeOptions'] + ([f'RuntimeOptions.{module}'] if module else [])
+        for section in sections:
+            if not self.config.has_section(section):
+                continue
+            for name, cast in RUNTIME_OPTIONS.items():
+                value = self.config.get(section, name, fallback='').strip()
+                if not value:
+                    continue
+                try:
+                    options[name] = cast(value)
+                except ValueError:
+                    logger.warning(f"Ollama运行参数无效 [{section}] {name} = {value}")
+        return options
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "preload_on_startup": self.preload_on_startup,
+            "preload_models": self.preload_models,
+            "refresh_interval": self.refresh_interval,
+            "keep_alive": dict(self.config.items('KeepAlive')) if self.config.has_section('KeepAlive') else {},
+            "runtime_options": self.runtime_options()
+        }
+
+
+class OllamaResidencyManager:
+    """Ollama模型驻留管理器"""
+
+    def __init__(self, config: ResidencyConfig, transport: HttpTransport = http_transport):
+        self.config = config
+        self.transport = transport
+        self.hosts: List[str] = []
+        self._models: List[str] = []
+        self._embedding_models: List[str] = []
+        self._module: Optional[str] = None
+        self._last_refresh: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        # 主机 -> 模型名 -> 加载状态
+        self._state: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def call_params(self, module: Optional[str] = None) -> Dict[str, Any]:
+        """调用 Ollama 时附加的请求参数（keep_alive 和 options）"""
+        params: Dict[str, Any] = {"keep_alive": self.config.keep_alive(module)}
+        options = self.config.runtime_options(module)
+        if options:
+            params["options"] = options
+        return params
+
+    def start(self, hosts: Union[str, List[str]], models: List[str], embedding_models: Optional[List[str]] = None,
+              module: Optional[str] = None):
+        """启动后台线程：预加载模型，并定期刷新加载状态
+
+        Args:
+            hosts: Ollama 服务地址，或多台主机的服务地址列表
+            models: 配置中未指定 PreloadModels 时预加载的生成模型
+            embedding_models: 配置中未指定 PreloadModels 时预加载的embedding模型
+            module: 使用生成模型的模块，预加载时使用该模块调用时的运行参数
+        """
+        if self.running:
+            return
+        if isinstance(hosts, str):
+            hosts = [hosts]
+        self.hosts = list(dict.fromkeys(host.rstrip('/') for host in hosts if host))
+        if self.config.preload_models:
+            self._models, self._embedding_models = self.config.preload_models, []
+        else:
+            self._models = list(dict.fromkeys(model for model in models if model))
+            self._embedding_models = [model for model in dict.fromkeys(embedding_models or []) if model]
+        self._module = module
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-residency", daemon=True)
+        self._thread.start()
+        preload = self._models + self._embedding_models if self.config.preload_on_startup else '未启用'
+        logger.info(f"Ollama驻留管理已启动，预加载模型: {preload}")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """停止后台线程（正在进行的预加载请求不等待）"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def preload(self, models: Optional[List[str]] = None,
+                embedding_models: Optional[List[str]] = None) -> Dict[str, Dict[str, bool]]:
+        """预加载模型（只加载不生成），各主机并行，返回各主机各模型是否加载成功；不指定模型时预加载启动时确定的模型"""
+        if not self.hosts:
+            logger.warning("Ollama驻留管理未启动，无法预加载模型")
+            return {}
+        if models is None and embedding_models is None:
+            models, embedding_models = self._models, self._embedding_models
+        targets = [(model, False) for model in models or []] + [(model, True) for model in embedding_models or []]
+
+        def preload_host(host: str) -> Dict[str, bool]:
+            results = {}
+            for model, embedding in targets:
+                if self._stop_event.is_set():
+                    break
+                results[model] = self._preload_model(host, model, embedding)
+            return results
+
+        with ThreadPoolExecutor(max_workers=len(self.hosts), thread_name_prefix="ollama-preload") as executor:
+            return dict(zip(self.hosts, executor.map(preload_host, self.hosts)))
+
+    def refresh(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """通过各主机的 /api/ps 刷新模型加载状态（单台主机失败不影响其他主机）"""
+        errors = []
+        for host in self.hosts:
+            try:
+                self._refresh_host(host)
+            except Exception as e:
+                errors.append(f"{host}: {str(e)}")
+        if errors and len(errors) == len(self.hosts):
+            raise Exception(f"Ollama /api/ps 调用失败: {'; '.join(errors)}")
+        with self._lock:
+            self._last_refresh = datetime.now().isoformat()
+        return self.get_state()
+
+    def record_call(self, model: str, response: Dict[str, Any], host: Optional[str] = None):
+        """记录一次调用：模型已驻留，load_duration 较长时计为冷加载
+
+        Args:
+            model: 模型名
+            response: Ollama 接口返回的JSON
+            host: 处理该请求的主机（不指定时记到第一台主机）
+        """
+        load_seconds = (response.get('load_duration') or 0) / 1e9
+        host = host or (self.hosts[0] if self.hosts else "")
+        with self._lock:
+            state = self._entry(host, model)
+            state["loaded"] = True
+            state["calls"] += 1
+            state["last_used"] = datetime.now().isoformat()
+            if load_seconds >= COLD_LOAD_SECONDS:
+                state["cold_loads"] += 1
+                state["last_load_seconds"] = round(load_seconds, 2)
+        if load_seconds >= COLD_LOAD_SECONDS:
+            logger.info(f"Ollama模型 {model}（{host}）冷加载，耗时 {load_seconds:.1f} 秒")
+
+    def get_state(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """各主机各模型的加载状态"""
+        with self._lock:
+            return {host: {model: dict(state) for model, state in models.items()}
+                    for host, models in self._state.items()}
+
+    def get_status(self) -> Dict[str, Any]:
+        """驻留管理状态、各模型加载状态和生效的配置"""
+        return {
+            "running": self.running,
+            "hosts": self.hosts,
+            "models": self.get_state(),
+            "last_refresh": self._last_refresh,
+            "config": self.config.to_dict()
+        }
+
+    @staticmethod
+    def _model_key(model: str) -> str:
+        """Ollama 对未带标签的模型名补全 :latest，状态以补全后的名称记录"""
+        return model if ':' in model else f"{model}:latest"
+
+    def _entry(self, host: str, model: str) -> Dict[str, Any]:
+        return self._state.setdefault(host, {}).setdefault(self._model_key(model), {
+            "loaded": False, "expires_at": None, "size_vram": None, "calls": 0,
+            "cold_loads": 0, "last_load_seconds": None, "last_used": None, "last_preload": None
+        })
+
+    def _refresh_host(self, host: str):
+        response = self.transport.get(f"{host}/api/ps", "health")
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}")
+        loaded = {item.get('name') or item.get('model'): item for item in response.json().get('models', [])}
+        with self._lock:
+            loaded = {self._model_key(model): item for model, item in loaded.items() if model}
+            for model, state in self._state.get(host, {}).items():
+                if model not in loaded:
+                    state["loaded"] = False
+                    state["expires_at"] = None
+            for model, item in loaded.items():
+                state = self._entry(host, model)
+                state["loaded"] = True
+                state["expires_at"] = item.get('expires_at')
+                state["size_vram"] = item.get('size_vram')
+
+    def _preload_model(self, host: str, model: str, embedding: bool = False) -> bool:
+        """发送不含提示词的请求，Ollama 只加载模型并按 keep_alive 保留
+
+        生成模型附带与模块调用相同的运行参数（num_ctx、num_batch 等不同时 Ollama 会重新加载模型）
+        """
+        # embedding 模型不支持 /api/generate，使用 /api/embed 加载
+        if embedding:
+            endpoint = "/api/embed"
+            payload = {"model": model, "keep_alive": self.config.keep_alive('embedding'), "input": []}
+        else:
+            endpoint = "/api/generate"
+            payload = {"model": model, **self.call_params(self._module)}
+        started_at = time.perf_counter()
+        try:
+            response = self.transport.post_json(f"{host}{endpoint}", payload, "preload")
+            if response.status_code != 200:
+                raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+        except Exception as e:
+            logger.warning(f"Ollama模型 {model}（{host}）预加载失败: {str(e)}")
+            return False
+
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            state = self._entry(host, model)
+            state["loaded"] = True
+            state["last_preload"] = datetime.now().isoformat()
+            state["last_load_seconds"] = round(elapsed, 2)
+        logger.info(f"Ollama模型 {model}（{host}）预加载完成，耗时 {elapsed:.1f} 秒")
+        return True
+
+    def _run(self):
+        if self.config.preload_on_startup:
+            self.preload()
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.debug(f"刷新Ollama模型加载状态失败: {str(e)}")
+            self._stop_event.wait(self.config.refresh_interval)
+
+
+# 全局驻留管理器实例
+residency_manager = OllamaResidencyManager(ResidencyConfig())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型提供商HTTP客户端
+
+功能说明：
+- Ollama 与 OpenAI兼容接口（DeepSeek、SiliconCloud）的轻量客户端，请求全部经过共享的HTTP传输层
+- 不依赖 ollama / openai SDK，返回接口的原始JSON（dict）
+- 非200响应抛出异常，异常信息包含状态码和响应内容摘要
+- Ollama 可配置多个服务地址，请求经端点池按最少未完成请求分配，失败时换下一台主机
+- 流式接口逐条返回输出片段（Ollama 为NDJSON，OpenAI兼容接口为SSE），调用方停止读取时关闭连接；
+  Ollama 流式请求在关闭前一直占用所在主机的未完成请求计数
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import requests
+
+from .http_transport import HttpTransport, http_transport
+from .endpoint_pool import EndpointPool
+
+
+def _raise_for_status(response, name: str):
+    if response.status_code != 200:
+        raise Exception(f"{name} HTTP {response.status_code}: {response.text[:200]}")
+
+
+class OllamaClient:
+    """Ollama API客户端"""
+
+    def __init__(self, hosts: Union[str, List[str]], transport: HttpTransport = http_transport):
+        """
+        Args:
+            hosts: Ollama 服务地址，或多个服务地址的列表
+            transport: HTTP传输层
+        """
+        if isinstance(hosts, str):
+            hosts = [hosts]
+        self.transport = transport
+        self.pool = EndpointPool("ollama", hosts, transport, health_path="/api/tags")
+
+    @property
+    def host(self) -> str:
+        """第一个服务地址"""
+        return self.pool.urls[0]
+
+    @property
+    def hosts(self) -> List[str]:
+        return self.pool.urls
+
+    def last_host(self) -> Optional[str]:
+        """当前线程最近一次请求使用的服务地址"""
+        return self.pool.last_url()
+
+    def post(self, path: str, payload: Dict[str, Any], call_type: str = "generate", **kwargs) -> requests.Response:
+        """经端点池发送POST请求，返回原始响应（状态码由调用方检查）"""
+        return self.pool.call(self._sender(path, payload, call_type, **kwargs), call_type)
+
+    def _sender(self, path: str, payload: Dict[str, Any], call_type: str,
+                **kwargs) -> Callable[[str], requests.Response]:
+        """以服务地址为参数发送POST请求的函数"""
+        # 多台主机时失败直接换主机，不在同一台主机上退避重试
+        max_retries = None if len(self.pool.endpoints) == 1 else 0
+        return lambda host: self.transport.post_json(
+            f"{host}{path}", payload, call_type, max_retries=max_retries, **kwargs)
+
+    def chat(self, model: str, messages: List[Dict[str, str]], call_type: str = "generate",
+             **params: Any) -> Dict[str, Any]:
+        """调用 /api/chat（非流式），params 透传到请求体（如 options、keep_alive）"""
+        payload = {"model": model, "messages": messages, "stream": False, **params}
+        response = self.post("/api/chat", payload, call_type)
+        _raise_for_status(response, "Ollama")
+        return response.json()
+
+    def chat_stream(self, model: str, messages: List[Dict[str, str]], call_type: str = "generate",
+                    **params: Any) -> Iterator[Dict[str, Any]]:
+        """流式调用 /api/chat，逐条返回输出片段（message.content），最后一条 done 为True并包含token统计"""
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        with self.pool.stream(self._sender("/api/chat", payload, call_type, stream=True), call_type) as response:
+            _raise_for_status(response, "Ollama")
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def generate(self, model: str, prompt: str, call_type: str = "generate", **params: Any) -> Dict[str, Any]:
+        """调用 /api/generate（非流式）"""
+        payload = {"model": model, "prompt": prompt, "stream": False, **params}
+        response = self.post("/api/generate", payload, call_type)
+        _raise_for_status(response, "Ollama")
+        return response.json()
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """调用 /api/tags，返回已下载的模型列表（多台主机时由任一可用主机返回）"""
+        response = self.pool.call(lambda host: self.transport.get(f"{host}/api/tags", "health"), "health")
+        _raise_for_status(response, "Ollama")
+        return response.json().get('models', [])
+
+
+class OpenAICompatibleClient:
+    """OpenAI兼容接口客户端"""
+
+    def __init__(self, base_url: str, api_key: str, name: str = "OpenAI", transport: HttpTransport = http_transport):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.name = name
+        self.transport = transport
+
+    def chat_completions(self, model: str, messages: List[Dict[str, str]], call_type: str = "chat",
+                         **params: Any) -> Dict[str, Any]:
+        """调用 /chat/completions（非流式），params 透传到请求体（如 max_tokens、temperature）"""
+        payload = {"model": model, "messages": messages, **params}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        response = self.transport.post_json(f"{self.base_url}/chat/completions", payload, call_type, headers=headers)
+        _raise_for_status(response, self.name)
+        return response.json()
+
+    def chat_completions_stream(self, model: str, messages: List[Dict[str, str]], call_type: str = "chat",
+                                **params: Any) -> Iterator[Dict[str, Any]]:
+        """流式调用 /chat/completions，逐条返回SSE事件（choices[0].delta.content 为输出片段）"""
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        response = self.transport.post_json(f"{self.base_url}/chat/completions", payload, call_type,
+                                            headers=headers, stream=True)
+        _raise_for_status(response, self.name)
+        try:
+            for line in response.iter_lines():
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                yield json.loads(data)
+        finally:
+            response.close()
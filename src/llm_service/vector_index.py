@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档分块向量索引
+
+功能说明：
+- 为单个文档的分块建立内存向量索引，用完即弃，不做持久化
+- 向量归一化后以内积计算余弦相似度，返回与查询最相关的 top-k 分块
+- 默认使用numpy矩阵运算；安装 faiss-cpu 时可使用 FAISS 的精确内积索引
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 未安装时向量检索不可用，调用方回退到全文提取
+    np = None
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu 为可选依赖
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "numpy", "faiss")
+
+
+def is_available() -> bool:
+    """当前环境是否支持向量检索"""
+    return np is not None
+
+
+class ChunkVectorIndex:
+    """文档分块的余弦相似度索引"""
+
+    def __init__(self, embeddings: Sequence[Sequence[float]], backend: str = "auto"):
+        """
+        Args:
+            embeddings: 各分块的向量，顺序即分块序号，维度必须一致
+            backend: auto（有 faiss 时使用 faiss）、numpy 或 faiss
+
+        Raises:
+            RuntimeError: numpy 未安装，或指定 faiss 但未安装
+            ValueError: 向量为空或维度不一致
+        """
+        if np is None:
+            raise RuntimeError("numpy未安装，无法建立向量索引")
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的向量索引后端: {backend}")
+        if backend == "faiss" and faiss is None:
+            raise RuntimeError("faiss未安装，无法使用faiss后端")
+        if not len(embeddings):
+            raise ValueError("向量列表为空")
+        if len({len(vector) for vector in embeddings}) != 1:
+            raise ValueError("向量维度不一致")
+
+        self.matrix = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        self.backend = "faiss" if backend == "faiss" or (backend == "auto" and faiss is not None) else "numpy"
+        self._faiss_index = None
+        if self.backend == "faiss":
+            self._faiss_index = faiss.IndexFlatIP(self.matrix.shape[1])
+            self._faiss_index.add(self.matrix)
+
+    @property
+    def size(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        return self.matrix.shape[1]
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """返回与查询向量最相似的 k 个分块 [(分块序号, 余弦相似度)]，按相似度降序"""
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries: Sequence[Sequence[float]], k: int) -> List[List[Tuple[int, float]]]:
+        """批量查询，每个查询返回 [(分块序号, 余弦相似度)]
+
+        Raises:
+            ValueError: 查询向量维度与索引不一致
+        """
+        if not len(queries):
+            return []
+        query_matrix = self._normalize(np.asarray(queries, dtype=np.float32).reshape(len(queries), -1))
+        if query_matrix.shape[1] != self.dimension:
+            raise ValueError(f"查询向量维度 {query_matrix.shape[1]} 与索引维度 {self.dimension} 不一致")
+        k = max(1, min(k, self.size))
+
+        if self._faiss_index is not None:
+            scores, indices = self._faiss_index.search(query_matrix, k)
+        else:
+            similarity = query_matrix @ self.matrix.T
+            if k < self.size:
+                # argpartition 取出 top-k 后再排序，避免对全部分块排序
+                indices = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            else:
+                indices = np.tile(np.arange(self.size), (len(queries), 1))
+            scores = np.take_along_axis(similarity, indices, axis=1)
+            order = np.argsort(-scores, axis=1, kind="stable")
+            indices = np.take_along_axis(indices, order, axis=1)
+            scores = np.take_along_axis(scores, order, axis=1)
+
+        return [[(int(index), float(score)) for index, score in zip(row_indices, row_scores) if index >= 0]
+                for row_indices, row_scores in zip(indices, scores)]
+
+
+def build_chunk_index(embeddings: Sequence[Sequence[float]], backend: str = "auto") -> Optional[ChunkVectorIndex]:
+    """建立分块索引，向量缺失或环境不支持时返回None（调用方回退到不使用检索的提取方式）"""
+    if not is_available() or not embeddings or any(vector is None or not len(vector) for vector in embeddings):
+        return None
+    try:
+        return ChunkVectorIndex(embeddings, backend)
+    except (RuntimeError, ValueError) as e:
+        logger.warning(f"建立分块向量索引失败: {str(e)}")
+        return None
@@ -11,22 +11,29 @@
 """
 
 import os
+import json
 import uuid
 import asyncio
+import hashlib
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
 import logging
-from docx import Document
-from docx.shared import Inches
 
 # 导入核心处理模块
-from .processor import process_document
+from .processor import process_document, config as tender_config
+from .parser import parse_document_text
 from .batch_processor import process_multiple_documents_async
-from ..llm_service.model_manager import model_manager
+from .chunk_dedup import get_dedup_config, get_dedup_statistics
+from ..llm_service.model_manager import model_manager, ModelContext
+from ..llm_service.ollama_residency import residency_manager
+from ..llm_service.endpoint_pool import endpoint_health_checker
+from ..llm_service.latency_tracker import latency_tracker
 from ..history.history_manager import history_manager
+from ..history.history_writer import history_writer
+from ..utils.docx_renderer import docx_renderer
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -41,6 +48,12 @@ router = APIRouter()
 # 全局任务状态存储（生产环境建议使用Redis等持久化存储）
 task_status = {}
 
+# 生成文件保存目录
+DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "download")
+
+# 影响生成结果的请求参数（模型另按实际使用的提供商和模型计入），参数不同的历史记录不可复用
+GENERATION_KEY_FIELDS = ("quality_level", "project_name", "include_sections", "custom_requirements")
+
 # 请求模型
 class TenderGenerationRequest(BaseModel):
     """招标文件生成请求模型"""
@@ -57,6 +70,7 @@ class TextTenderGenerationRequest(BaseModel):
     project_name: Optional[str] = "招标项目"
     include_sections: Optional[List[str]] = None
     custom_requirements: Optional[str] = None
+    force_regenerate: Optional[bool] = False  # 为True时跳过相似输入检查，强制重新生成
 
 class MultipleTenderGenerationRequest(BaseModel):
     """多文件招标文件生成请求模型"""
@@ -130,6 +144,99 @@ def update_task_status(task_id: str, status: str, progress: int = 0, message: st
             "updated_at": datetime.now().isoformat()
         })
 
+def compute_input_signature(text: str) -> Optional[List[int]]:
+    """计算输入文本的MinHash签名，失败时返回None（不影响生成）"""
+    try:
+        return history_manager.compute_input_signature(text)
+    except Exception as e:
+        logger.warning(f"计算输入签名失败: {str(e)}")
+        return None
+
+def compute_generation_key(source: str, config: Dict[str, Any], context: Optional[ModelContext] = None) -> str:
+    """计算生成参数标识：接口类型（file/text）、影响生成结果的请求参数，以及本次请求解析出的提供商和模型
+
+    请求通常不指定 model_provider，因此按 context 解析提供商链中的首个提供商及其配置的模型
+    """
+    params = {field: config.get(field) for field in GENERATION_KEY_FIELDS}
+    provider = model_manager.get_provider_chain("tender_generation", context)[0]
+    params["provider"] = provider
+    params["model"] = model_manager.config.get("providers", {}).get(provider, {}).get("model")
+    params["source"] = source
+    encoded = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+def find_reusable_record(input_signature: Optional[List[int]], generation_key: str,
+                         config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """生成前检查：查找输入与历史输入近似相同、且生成参数相同的已完成记录
+
+    Returns:
+        可复用的记录信息（含历史生成内容），没有时返回None
+    """
+    if (not input_signature or config.get("force_regenerate")
+            or not tender_config.getboolean("Deduplication", "Enabled", fallback=True)):
+        return None
+
+    threshold = tender_config.getfloat("Deduplication", "Threshold", fallback=0.9)
+    try:
+        for match in history_manager.find_similar_inputs(input_signature, threshold,
+                                                         generation_key=generation_key):
+            record = history_manager.get_record_by_id(match["record_id"])
+            if record and record.tender_content:
+                return {**match, "tender_content": record.tender_content}
+    except Exception as e:
+        logger.warning(f"相似输入检查失败: {str(e)}")
+    return None
+
+def save_result_files(task_id: str, content: str) -> Dict[str, Any]:
+    """保存生成的Markdown文件，返回下载信息（Word文档在首次下载时由Markdown文件渲染生成）"""
+    markdown_dir = os.path.join(DOWNLOAD_DIR, "markdown")
+    os.makedirs(os.path.join(DOWNLOAD_DIR, "word"), exist_ok=True)
+    os.makedirs(markdown_dir, exist_ok=True)
+
+    # 生成文件名（使用时间戳确保唯一性）
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_filename = f"tender_{timestamp}_{task_id[:8]}"
+
+    md_filename = f"{base_filename}.md"
+    with open(os.path.join(markdown_dir, md_filename), 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    doc_filename = f"{base_filename}.docx"
+    return {
+        "word": {
+            "filename": doc_filename,
+            "download_url": f"/api/tender/download/word/{doc_filename}"
+        },
+        "markdown": {
+            "filename": md_filename,
+            "download_url": f"/api/tender/download/markdown/{md_filename}"
+        }
+    }
+
+def complete_with_reused_record(task_id: str, reusable: Dict[str, Any], start_time: datetime):
+    """直接使用历史生成结果完成任务"""
+    content = reusable["tender_content"]
+    logger.info(f"任务 {task_id} 输入与历史记录 {reusable['record_id']} 相似度 "
+                f"{reusable['similarity']:.2f}，直接返回历史生成结果")
+    update_task_status(
+        task_id, "completed", 100,
+        f"检测到相似度 {reusable['similarity']:.0%} 的历史输入，已直接返回历史生成结果"
+        f"（如需重新生成请设置 force_regenerate=true）",
+        {
+            "tender_document": content,
+            "file_size": len(content),
+            "generation_time": datetime.now().isoformat(),
+            "processing_duration": (datetime.now() - start_time).total_seconds(),
+            "files": save_result_files(task_id, content),
+            "reused_from": {
+                "record_id": reusable["record_id"],
+                "original_filename": reusable["original_filename"],
+                "generation_time": reusable["generation_time"],
+                "similarity": reusable["similarity"]
+            }
+        }
+    )
+
 async def process_document_async(task_id: str, file_path: str, config: Dict[str, Any]):
     """异步处理文档生成招标书"""
     start_time = datetime.now()
@@ -139,14 +246,28 @@ async def process_document_async(task_id: str, file_path: str, config: Dict[str,
     try:
         update_task_status(task_id, "processing", 10, "开始处理文档...")
         
-        # 设置模型配置
-        if config.get("model_provider"):
-            model_manager.set_current_model("tender_generation", config["model_provider"])
+        # 本次请求的模型选择（不修改全局配置，并发任务互不影响）
+        context = model_manager.create_context("tender_generation", config.get("model_provider"))
+        
+        update_task_status(task_id, "processing", 20, "正在解析文档内容...")
+        text = await asyncio.to_thread(parse_document_text, file_path)
+        if not text:
+            raise ValueError("无法从文档中提取文本内容")
         
-        update_task_status(task_id, "processing", 30, "正在解析文档内容...")
+        # 生成前检查：输入与历史输入近似相同时直接返回历史结果（签名计算和查询不占用事件循环）
+        input_signature = await asyncio.to_thread(compute_input_signature, text)
+        generation_key = compute_generation_key("file", config, context)
+        reusable = await asyncio.to_thread(find_reusable_record, input_signature, generation_key, config)
+        if reusable:
+            complete_with_reused_record(task_id, reusable, start_time)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            return
+        
+        update_task_status(task_id, "processing", 30, "正在生成招标书内容...")
         
         # 调用核心处理函数
-        result = process_document(file_path)
+        result = process_document(file_path, text, context)
         
         update_task_status(task_id, "processing", 90, "正在生成最终文档...")
         
@@ -155,7 +276,7 @@ async def process_document_async(task_id: str, file_path: str, config: Dict[str,
         
         # 保存历史记录
         try:
-            history_manager.add_record(
+            history_writer.submit(
                 task_id=task_id,
                 original_filename=original_filename,
                 file_size=file_size,
@@ -163,7 +284,9 @@ async def process_document_async(task_id: str, file_path: str, config: Dict[str,
                 quality_level=config.get("quality_level", "standard"),
                 tender_content=result,
                 status="completed",
-                processing_duration=processing_duration
+                processing_duration=processing_duration,
+                input_signature=input_signature,
+                generation_key=generation_key
             )
         except Exception as history_error:
             logger.warning(f"保存历史记录失败: {str(history_error)}")
@@ -172,60 +295,13 @@ async def process_document_async(task_id: str, file_path: str, config: Dict[str,
         if os.path.exists(file_path):
             os.remove(file_path)
         
-        # 保存生成的招标文件到download目录
-        download_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "download")
-        word_dir = os.path.join(download_dir, "word")
-        markdown_dir = os.path.join(download_dir, "markdown")
-        os.makedirs(word_dir, exist_ok=True)
-        os.makedirs(markdown_dir, exist_ok=True)
-        
-        # 生成文件名（使用时间戳确保唯一性）
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = f"tender_{timestamp}_{task_id[:8]}"
-        
-        # 保存Markdown文件
-        md_filename = f"{base_filename}.md"
-        md_path = os.path.join(markdown_dir, md_filename)
-        with open(md_path, 'w', encoding='utf-8') as f:
-            f.write(result)
-        
-        # 生成Word文档
-        doc = Document()
-        doc.add_heading('招标文件', 0)
-        
-        # 将结果按段落分割并添加到文档
-        paragraphs = result.split('\n\n')
-        for paragraph in paragraphs:
-            if paragraph.strip():
-                if paragraph.startswith('#'):
-                    # 处理标题
-                    level = len(paragraph) - len(paragraph.lstrip('#'))
-                    title_text = paragraph.lstrip('# ').strip()
-                    doc.add_heading(title_text, level)
-                else:
-                    doc.add_paragraph(paragraph.strip())
-        
-        # 保存Word文档
-        doc_filename = f"{base_filename}.docx"
-        doc_path = os.path.join(word_dir, doc_filename)
-        doc.save(doc_path)
-        
         # 完成任务
         update_task_status(task_id, "completed", 100, "招标文件生成完成", {
             "tender_document": result,
             "file_size": len(result),
             "generation_time": datetime.now().isoformat(),
             "processing_duration": processing_duration,
-            "files": {
-                "word": {
-                    "filename": doc_filename,
-                    "download_url": f"/api/tender/download/word/{doc_filename}"
-                },
-                "markdown": {
-                    "filename": md_filename,
-                    "download_url": f"/api/tender/download/markdown/{md_filename}"
-                }
-            }
+            "files": save_result_files(task_id, result)
         })
         
     except Exception as e:
@@ -236,7 +312,7 @@ async def process_document_async(task_id: str, file_path: str, config: Dict[str,
         
         # 保存失败记录到历史
         try:
-            history_manager.add_record(
+            history_writer.submit(
                 task_id=task_id,
                 original_filename=original_filename,
                 file_size=file_size,
@@ -258,6 +334,10 @@ async def process_document_async(task_id: str, file_path: str, config: Dict[str,
 
 async def process_multiple_documents_async_task(task_id: str, file_paths: List[str], config: Dict[str, Any]):
     """异步处理多个文档的后台任务"""
+    start_time = datetime.now()
+    original_filename = ", ".join(os.path.basename(fp) for fp in file_paths)
+    file_size = sum(os.path.getsize(fp) for fp in file_paths if os.path.exists(fp))
+    
     try:
         update_task_status(task_id, "processing", 10, "开始处理多个文档...")
         
@@ -272,7 +352,8 @@ async def process_multiple_documents_async_task(task_id: str, file_paths: List[s
         
         # 调用批量处理函数
         result_content = await process_multiple_documents_async(
-            file_paths, config, progress_callback
+            file_paths, config, progress_callback,
+            model_manager.create_context("tender_generation", config.get("model_provider"))
         )
         
         update_task_status(task_id, "processing", 90, "正在保存生成的招标文件...")
@@ -290,48 +371,20 @@ async def process_multiple_documents_async_task(task_id: str, file_paths: List[s
         with open(markdown_path, 'w', encoding='utf-8') as f:
             f.write(result_content)
         
-        # 保存为Word文档
-        word_dir = multi_file_config.get_word_output_dir()
-        os.makedirs(word_dir, exist_ok=True)
+        # Word文档在首次下载时由Markdown文件渲染生成
         word_filename = f"{base_filename}.docx"
-        word_path = os.path.join(word_dir, word_filename)
-        
-        # 创建Word文档
-        doc = Document()
-        
-        # 解析Markdown内容并添加到Word文档
-        lines = result_content.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('# '):
-                # 一级标题
-                doc.add_heading(line[2:], level=1)
-            elif line.startswith('## '):
-                # 二级标题
-                doc.add_heading(line[3:], level=2)
-            elif line.startswith('### '):
-                # 三级标题
-                doc.add_heading(line[4:], level=3)
-            elif line == '---':
-                # 分隔线，跳过
-                continue
-            elif line:
-                # 普通段落
-                doc.add_paragraph(line)
-        
-        doc.save(word_path)
         
         # 记录成功历史
         try:
-            file_names = [os.path.basename(fp) for fp in file_paths]
-            history_manager.save_success_record(
+            history_writer.submit(
                 task_id=task_id,
-                file_paths=file_paths,
-                file_names=file_names,
-                markdown_path=markdown_path,
-                word_path=word_path,
-                config=config,
-                content_preview=result_content[:500] + "..." if len(result_content) > 500 else result_content
+                original_filename=original_filename,
+                file_size=file_size,
+                model_provider=config.get("model_provider", "unknown"),
+                quality_level=config.get("quality_level", "standard"),
+                tender_content=result_content,
+                status="completed",
+                processing_duration=(datetime.now() - start_time).total_seconds()
             )
         except Exception as history_error:
             logger.warning(f"保存成功历史记录失败: {str(history_error)}")
@@ -353,11 +406,16 @@ async def process_multiple_documents_async_task(task_id: str, file_paths: List[s
         
         # 记录失败历史
         try:
-            history_manager.save_failed_record(
+            history_writer.submit(
                 task_id=task_id,
-                file_path=",".join(file_paths),
+                original_filename=original_filename,
+                file_size=file_size,
+                model_provider=config.get("model_provider", "unknown"),
+                quality_level=config.get("quality_level", "standard"),
+                tender_content="",
+                status="failed",
                 error_message=str(e),
-                config=config
+                processing_duration=(datetime.now() - start_time).total_seconds()
             )
         except Exception as history_error:
             logger.warning(f"保存失败历史记录失败: {str(history_error)}")
@@ -371,9 +429,16 @@ async def process_text_content_async(task_id: str, text_content: str, config: Di
     try:
         update_task_status(task_id, "processing", 10, "开始处理文本内容...")
         
-        # 设置模型配置
-        if config.get("model_provider"):
-            model_manager.set_current_model("tender_generation", config["model_provider"])
+        # 本次请求的模型选择（不修改全局配置，并发任务互不影响）
+        context = model_manager.create_context("tender_generation", config.get("model_provider"))
+        
+        # 生成前检查：输入与历史输入近似相同时直接返回历史结果（签名计算和查询不占用事件循环）
+        input_signature = await asyncio.to_thread(compute_input_signature, text_content)
+        generation_key = compute_generation_key("text", config, context)
+        reusable = await asyncio.to_thread(find_reusable_record, input_signature, generation_key, config)
+        if reusable:
+            complete_with_reused_record(task_id, reusable, start_time)
+            return
         
         update_task_status(task_id, "processing", 30, "正在分析文本内容...")
         
@@ -381,7 +446,7 @@ async def process_text_content_async(task_id: str, text_content: str, config: Di
         from .processor import process_text_content
         
         # 调用文本处理函数
-        result = process_text_content(text_content, config)
+        result = process_text_content(text_content, config, context)
         
         update_task_status(task_id, "processing", 90, "正在生成最终文档...")
         
@@ -390,7 +455,7 @@ async def process_text_content_async(task_id: str, text_content: str, config: Di
         
         # 保存历史记录
         try:
-            history_manager.add_record(
+            history_writer.submit(
                 task_id=task_id,
                 original_filename=f"文本输入_{config.get('project_name', '招标项目')}",
                 file_size=len(text_content),
@@ -398,65 +463,20 @@ async def process_text_content_async(task_id: str, text_content: str, config: Di
                 quality_level=config.get("quality_level", "standard"),
                 tender_content=result,
                 status="completed",
-                processing_duration=processing_duration
+                processing_duration=processing_duration,
+                input_signature=input_signature,
+                generation_key=generation_key
             )
         except Exception as history_error:
             logger.warning(f"保存历史记录失败: {str(history_error)}")
         
-        # 保存生成的招标文件到download目录
-        download_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "download")
-        word_dir = os.path.join(download_dir, "word")
-        markdown_dir = os.path.join(download_dir, "markdown")
-        os.makedirs(word_dir, exist_ok=True)
-        os.makedirs(markdown_dir, exist_ok=True)
-        
-        # 生成文件名（使用时间戳确保唯一性）
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = f"tender_{timestamp}_{task_id[:8]}"
-        
-        # 保存Markdown文件
-        md_filename = f"{base_filename}.md"
-        md_path = os.path.join(markdown_dir, md_filename)
-        with open(md_path, 'w', encoding='utf-8') as f:
-            f.write(result)
-        
-        # 生成Word文档
-        doc = Document()
-        doc.add_heading('招标文件', 0)
-        
-        # 将结果按段落分割并添加到文档
-        paragraphs = result.split('\n\n')
-        for paragraph in paragraphs:
-            if paragraph.strip():
-                if paragraph.startswith('#'):
-                    # 处理标题
-                    level = len(paragraph) - len(paragraph.lstrip('#'))
-                    title_text = paragraph.lstrip('# ').strip()
-                    doc.add_heading(title_text, level)
-                else:
-                    doc.add_paragraph(paragraph.strip())
-        
-        # 保存Word文档
-        doc_filename = f"{base_filename}.docx"
-        doc_path = os.path.join(word_dir, doc_filename)
-        doc.save(doc_path)
-        
         # 完成任务
         update_task_status(task_id, "completed", 100, "招标文件生成完成", {
             "tender_document": result,
             "file_size": len(result),
             "generation_time": datetime.now().isoformat(),
             "processing_duration": processing_duration,
-            "files": {
-                "word": {
-                    "filename": doc_filename,
-                    "download_url": f"/api/tender/download/word/{doc_filename}"
-                },
-                "markdown": {
-                    "filename": md_filename,
-                    "download_url": f"/api/tender/download/markdown/{md_filename}"
-                }
-            }
+            "files": save_result_files(task_id, result)
         })
         
     except Exception as e:
@@ -467,7 +487,7 @@ async def process_text_content_async(task_id: str, text_content: str, config: Di
         
         # 保存失败记录到历史
         try:
-            history_manager.add_record(
+            history_writer.submit(
                 task_id=task_id,
                 original_filename=f"文本输入_{config.get('project_name', '招标项目')}",
                 file_size=len(text_content),
@@ -489,9 +509,14 @@ async def generate_tender_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="要处理的文档文件（支持PDF、DOCX格式）"),
     model_provider: Optional[str] = None,
-    quality_level: Optional[str] = "standard"
+    quality_level: Optional[str] = "standard",
+    force_regenerate: bool = False
 ):
-    """生成招标书接口"""
+    """生成招标书接口
+
+    输入文档与历史输入近似相同时（阈值见 tender_generation_config.ini 的 [Deduplication]），
+    直接返回历史生成结果；设置 force_regenerate=true 可强制重新生成。
+    """
     try:
         # 验证文件格式
         if not file.filename:
@@ -524,7 +549,8 @@ async def generate_tender_document(
         
         config = {
             "model_provider": model_provider,
-            "quality_level": quality_level
+            "quality_level": quality_level,
+            "force_regenerate": force_regenerate
         }
         
         # 添加后台任务
@@ -677,7 +703,8 @@ async def generate_tender_from_text(
             "quality_level": request.quality_level,
             "project_name": request.project_name,
             "include_sections": request.include_sections,
-            "custom_requirements": request.custom_requirements
+            "custom_requirements": request.custom_requirements,
+            "force_regenerate": request.force_regenerate
         }
         
         # 添加后台任务
@@ -723,7 +750,7 @@ async def get_available_models():
 
 @router.post("/models/switch", summary="切换模型")
 async def switch_model(request: ModelConfigRequest):
-    """切换当前使用的模型"""
+    """切换模块默认使用的模型（修改全局配置并写入配置文件；生成请求通过 model_provider 参数单独指定模型）"""
     try:
         model_manager.set_current_model(request.module_name, request.provider)
         return {
@@ -734,6 +761,59 @@ async def switch_model(request: ModelConfigRequest):
         logger.error(f"切换模型失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"切换模型失败: {str(e)}")
 
+@router.get("/models/residency", summary="Ollama模型驻留状态")
+async def get_model_residency():
+    """获取Ollama模型的加载状态、冷加载统计和驻留配置"""
+    try:
+        return residency_manager.get_status()
+    except Exception as e:
+        logger.error(f"获取模型驻留状态失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取模型驻留状态失败: {str(e)}")
+
+@router.post("/models/residency/preload", summary="预加载Ollama模型")
+async def preload_models():
+    """立即预加载驻留管理配置的模型，并刷新加载状态"""
+    try:
+        results = await asyncio.to_thread(residency_manager.preload)
+        await asyncio.to_thread(residency_manager.refresh)
+        return {"results": results, "models": residency_manager.get_state()}
+    except Exception as e:
+        logger.error(f"预加载模型失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"预加载模型失败: {str(e)}")
+
+@router.get("/models/endpoints", summary="模型服务端点状态")
+async def get_model_endpoints():
+    """获取各提供商端点池中每台主机的未完成请求数、失败次数和摘除状态"""
+    try:
+        return {"running": endpoint_health_checker.running, "pools": endpoint_health_checker.get_status()}
+    except Exception as e:
+        logger.error(f"获取模型服务端点状态失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取模型服务端点状态失败: {str(e)}")
+
+@router.get("/models/latency", summary="模型提供商延迟统计")
+async def get_model_latency():
+    """获取各提供商的调用次数、失败次数和延迟分位数，以及各模块的故障转移顺序"""
+    try:
+        modules = model_manager.config.get('models', {})
+        return {
+            "providers": latency_tracker.get_statistics(),
+            "chains": {module: model_manager.get_provider_chain(module) for module in modules},
+            "hedge": {module: bool(config.get('hedge', False)) for module, config in modules.items()}
+        }
+    except Exception as e:
+        logger.error(f"获取模型延迟统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取模型延迟统计失败: {str(e)}")
+
+@router.get("/chunk-dedup", summary="文本块去重统计")
+async def get_chunk_dedup_statistics():
+    """获取文本块近似重复过滤的配置，以及累计的去重次数、文本块数和跳过的块数"""
+    try:
+        enabled, threshold = get_dedup_config()
+        return {"enabled": enabled, "threshold": threshold, **get_dedup_statistics()}
+    except Exception as e:
+        logger.error(f"获取文本块去重统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取文本块去重统计失败: {str(e)}")
+
 @router.get("/health", summary="健康检查")
 async def health_check():
     """招标生成服务健康检查"""
@@ -789,18 +869,28 @@ async def download_tender_file(file_type: str, filename: str):
     if file_type not in ["word", "markdown"]:
         raise HTTPException(status_code=400, detail="不支持的文件类型，仅支持 word 或 markdown")
     
+    # 验证文件名格式（安全检查）
+    if not filename.startswith("tender_") or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="无效的文件名")
+    
     # 构建文件路径
-    download_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "download")
-    file_dir = os.path.join(download_dir, file_type)
+    file_dir = os.path.join(DOWNLOAD_DIR, file_type)
     file_path = os.path.join(file_dir, filename)
     
+    # Word文档在首次下载时由同名Markdown文件渲染生成
+    if file_type == "word" and filename.endswith(".docx") and not os.path.exists(file_path):
+        markdown_path = os.path.join(DOWNLOAD_DIR, "markdown", os.path.splitext(filename)[0] + ".md")
+        try:
+            await docx_renderer.ensure_docx(markdown_path, file_path, title="招标文件")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"渲染Word文档失败: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"渲染Word文档失败: {str(e)}")
+    
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="文件不存在")
     
-    # 验证文件名格式（安全检查）
-    if not filename.startswith("tender_"):
-        raise HTTPException(status_code=400, detail="无效的文件名")
-    
     # 根据文件类型设置媒体类型
     if file_type == "word":
         if not filename.endswith(".docx"):
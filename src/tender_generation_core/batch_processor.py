@@ -13,21 +13,23 @@
 import os
 import asyncio
 import concurrent.futures
+from functools import partial
 from typing import List, Dict, Any, Optional
 from .parser import parse_document_text
 from .chunker import chunk_text
+from .chunk_dedup import deduplicate_chunks
 from .performance_optimizer import optimize_document_processing, content_cache
-from ..llm_service.model_manager import model_manager
+from ..llm_service.model_manager import model_manager, ModelContext
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.multi_file_settings import multi_file_config
 
 
-def get_llm_response(prompt: str) -> Optional[str]:
-    """获取大模型响应"""
+def get_llm_response(prompt: str, context: Optional[ModelContext] = None) -> Optional[str]:
+    """获取大模型响应（context 为单次请求的模型选择）"""
     try:
-        response = model_manager.call_model('tender_generation', prompt)
+        response = model_manager.call_model('tender_generation', prompt, context=context)
         return response
     except Exception as e:
         print(f"调用大模型时出错: {e}")
@@ -110,7 +112,7 @@ def merge_document_contents(document_contents: Dict[str, str]) -> str:
     return merged_content
 
 
-def summarize_chunk(chunk: str) -> Optional[str]:
+def summarize_chunk(chunk: str, context: Optional[ModelContext] = None) -> Optional[str]:
     """对单个文本块进行总结 (Map 步骤)"""
     prompt = f"""请你作为一个专业的招标项目经理，详细总结以下内容的核心要点、关键需求和技术指标。
 请确保总结内容清晰、准确，抓住重点。内容如下：
@@ -118,10 +120,10 @@ def summarize_chunk(chunk: str) -> Optional[str]:
 ---
 {chunk}
 ---"""
-    return get_llm_response(prompt)
+    return get_llm_response(prompt, context)
 
 
-def reduce_summaries(summaries: List[str]) -> str:
+def reduce_summaries(summaries: List[str], context: Optional[ModelContext] = None) -> str:
     """将所有块总结合并成一个最终的全局概述 (Reduce 步骤)"""
     # 过滤掉None值和空字符串
     valid_summaries = [summary for summary in summaries if summary is not None and summary.strip()]
@@ -141,10 +143,11 @@ def reduce_summaries(summaries: List[str]) -> str:
 ---
 {combined_summary}
 ---"""
-    return get_llm_response(prompt)
+    return get_llm_response(prompt, context)
 
 
-def generate_tender_section(overall_summary: str, section_title: str) -> Optional[str]:
+def generate_tender_section(overall_summary: str, section_title: str,
+                            context: Optional[ModelContext] = None) -> Optional[str]:
     """根据全局概述生成招标书的单个章节"""
     prompt = f"""你是一位资深的标书撰写专家。请根据以下项目的总体需求概述，撰写招标书的'{section_title}'部分。
 内容要求专业、详细、符合标准格式，语言严谨。
@@ -157,15 +160,17 @@ def generate_tender_section(overall_summary: str, section_title: str) -> Optiona
 ---
 
 请开始撰写'{section_title}'的内容："""
-    return get_llm_response(prompt)
+    return get_llm_response(prompt, context)
 
 
-def process_multiple_documents(file_paths: List[str], config: Optional[Dict[str, Any]] = None) -> str:
+def process_multiple_documents(file_paths: List[str], config: Optional[Dict[str, Any]] = None,
+                               context: Optional[ModelContext] = None) -> str:
     """处理多个文档并生成一份完整的招标书
     
     Args:
         file_paths: 文档文件路径列表
         config: 配置参数
+        context: 本次请求的模型选择（未指定时使用模块当前配置的模型）
         
     Returns:
         str: 生成的招标书内容
@@ -186,13 +191,16 @@ def process_multiple_documents(file_paths: List[str], config: Optional[Dict[str,
     
     print("3. 开始文本分块...")
     chunks = chunk_text(merged_content)
+    chunks, skipped = deduplicate_chunks(chunks)
+    if skipped:
+        print(f"   - 跳过 {skipped} 个近似重复的文本块")
     
     print(f"4. 开始对 {len(chunks)} 个文本块进行并行总结 (Map)...")
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        chunk_summaries = list(executor.map(summarize_chunk, chunks))
+        chunk_summaries = list(executor.map(partial(summarize_chunk, context=context), chunks))
     
     print("5. 开始整合所有总结 (Reduce)...")
-    overall_summary = reduce_summaries(chunk_summaries)
+    overall_summary = reduce_summaries(chunk_summaries, context)
     
     print("6. 开始迭代生成招标书...")
     tender_sections = [
@@ -220,7 +228,7 @@ def process_multiple_documents(file_paths: List[str], config: Optional[Dict[str,
     # 生成各章节内容
     for section_title in tender_sections:
         print(f"   - 正在生成: {section_title}")
-        section_content = generate_tender_section(overall_summary, section_title)
+        section_content = generate_tender_section(overall_summary, section_title, context)
         if section_content:
             final_document += f"## {section_title}\n\n{section_content}\n\n---\n\n"
         else:
@@ -231,13 +239,14 @@ def process_multiple_documents(file_paths: List[str], config: Optional[Dict[str,
 
 
 async def process_multiple_documents_async(file_paths: List[str], config: Optional[Dict[str, Any]] = None, 
-                                         progress_callback=None) -> str:
+                                         progress_callback=None, context: Optional[ModelContext] = None) -> str:
     """异步处理多个文档并生成招标书
     
     Args:
         file_paths: 文档文件路径列表
         config: 配置参数
         progress_callback: 进度回调函数
+        context: 本次请求的模型选择（未指定时使用模块当前配置的模型）
         
     Returns:
         str: 生成的招标书内容
@@ -267,16 +276,20 @@ async def process_multiple_documents_async(file_paths: List[str], config: Option
         chunks = await asyncio.get_event_loop().run_in_executor(
             None, chunk_text, merged_content
         )
+        chunks, skipped = await asyncio.get_event_loop().run_in_executor(
+            None, deduplicate_chunks, chunks
+        )
         
-        update_progress(4, total_steps, f"开始对 {len(chunks)} 个文本块进行并行总结...")
+        skipped_message = f"（跳过 {skipped} 个近似重复的文本块）" if skipped else ""
+        update_progress(4, total_steps, f"开始对 {len(chunks)} 个文本块进行并行总结{skipped_message}...")
         with concurrent.futures.ThreadPoolExecutor() as executor:
             chunk_summaries = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: list(executor.map(summarize_chunk, chunks))
+                None, lambda: list(executor.map(partial(summarize_chunk, context=context), chunks))
             )
         
         update_progress(5, total_steps, "开始整合所有总结...")
         overall_summary = await asyncio.get_event_loop().run_in_executor(
-            None, reduce_summaries, chunk_summaries
+            None, reduce_summaries, chunk_summaries, context
         )
         
         update_progress(6, total_steps, "开始生成招标书章节...")
@@ -305,7 +318,7 @@ async def process_multiple_documents_async(file_paths: List[str], config: Option
         # 异步生成各章节内容
         for i, section_title in enumerate(tender_sections):
             section_content = await asyncio.get_event_loop().run_in_executor(
-                None, generate_tender_section, overall_summary, section_title
+                None, generate_tender_section, overall_summary, section_title, context
             )
             if section_content:
                 final_document += f"## {section_title}\n\n{section_content}\n\n---\n\n"
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本块近似重复过滤模块
+
+功能说明：
+- 在文本分块之后、并行总结（Map）之前过滤近似重复的文本块，减少大模型调用次数
+- 招标文件中反复出现的法律声明、格式模板，以及多文档合并时重叠的条款会产生内容几乎相同的块
+- 使用与历史输入去重相同的MinHash签名估算Jaccard相似度，LSH分段桶筛选候选，只与候选比较
+- 近似重复的块只保留首次出现的一个，保持原有顺序
+- 阈值在 tender_generation_config.ini 的 [ChunkDeduplication] 中配置，并累计统计跳过的块数（GET /api/tender/chunk-dedup）
+"""
+
+import os
+import threading
+import configparser
+from typing import Dict, List, Optional, Tuple
+
+config = configparser.ConfigParser()
+config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'tender_generation_config.ini')
+
+try:
+    config.read(config_path, encoding='utf-8')
+except Exception as e:
+    print(f"读取配置文件失败: {e}，将使用默认配置")
+
+DEFAULT_THRESHOLD = 0.85
+
+_stats_lock = threading.Lock()
+_stats = {"runs": 0, "chunks": 0, "skipped": 0}
+_hasher = None
+
+
+def _get_hasher():
+    """首次使用时创建MinHash计算器
+
+    延迟到首次去重时才导入；导入 near_duplicate 会执行 history 包的初始化并创建历史记录数据库
+    """
+    global _hasher
+    if _hasher is None:
+        from ..history.near_duplicate import MinHasher
+        _hasher = MinHasher()
+    return _hasher
+
+
+def get_dedup_config() -> Tuple[bool, float]:
+    """
+    从配置文件获取文本块去重参数
+
+    :return: tuple (enabled, threshold)
+    """
+    enabled = config.getboolean('ChunkDeduplication', 'Enabled', fallback=True)
+    threshold = config.getfloat('ChunkDeduplication', 'Threshold', fallback=DEFAULT_THRESHOLD)
+    return enabled, threshold
+
+
+def deduplicate_chunks(chunks: List[str], threshold: Optional[float] = None) -> Tuple[List[str], int]:
+    """
+    过滤近似重复的文本块
+
+    :param chunks: chunk_text 返回的文本块列表
+    :param threshold: 相似度阈值（0~1，估算的Jaccard相似度），为None时从配置文件读取；
+                      与已保留的某个块相似度不低于阈值的块被跳过
+    :return: tuple (保留的文本块列表, 跳过的块数)
+    """
+    enabled, config_threshold = get_dedup_config()
+    if threshold is None:
+        if not enabled:
+            return list(chunks), 0
+        threshold = config_threshold
+    if len(chunks) < 2:
+        return list(chunks), 0
+
+    hasher = _get_hasher()
+    kept: List[str] = []
+    kept_signatures: List[List[int]] = []
+    buckets: Dict[Tuple[int, str], List[int]] = {}
+
+    for chunk in chunks:
+        signature = hasher.signature(chunk)
+        if signature is None:
+            # 空白块不参与比较，保持原样
+            kept.append(chunk)
+            kept_signatures.append([])
+            continue
+
+        bands = hasher.bands(signature)
+        candidates = {index for band in bands for index in buckets.get(band, ())}
+        if any(hasher.similarity(signature, kept_signatures[index]) >= threshold for index in candidates):
+            continue
+
+        index = len(kept)
+        kept.append(chunk)
+        kept_signatures.append(signature)
+        for band in bands:
+            buckets.setdefault(band, []).append(index)
+
+    skipped = len(chunks) - len(kept)
+    with _stats_lock:
+        _stats["runs"] += 1
+        _stats["chunks"] += len(chunks)
+        _stats["skipped"] += skipped
+    return kept, skipped
+
+
+def get_dedup_statistics() -> Dict[str, float]:
+    """累计的文本块去重统计"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["skip_rate"] = stats["skipped"] / stats["chunks"] if stats["chunks"] else 0.0
+    return stats
@@ -6,15 +6,17 @@
 功能说明：
 - 实现招标文件生成的完整流程，包括文档解析、文本分块、内容总结和招标文件章节生成
 - 采用Map-Reduce模式对大文档进行并行处理和总结
-- 集成统一的模型管理器，支持多种大语言模型调用
+- 集成统一的模型管理器，支持多种大语言模型调用；每次请求可通过 ModelContext 指定模型，互不影响
 - 提供从原始文档到完整招标书的端到端转换能力
 """
 
 import os
 import configparser
 import concurrent.futures
+from functools import partial
 from .parser import parse_document_text
 from .chunker import chunk_text
+from .chunk_dedup import deduplicate_chunks
 # 导入统一的模型管理器
 from ..llm_service.model_manager import model_manager
 
@@ -32,22 +34,22 @@ except Exception as e:
 # 使用统一的模型管理器
 print(f"招标文件生成模块使用模型管理器，当前模型: {model_manager.get_current_model('tender_generation')}")
 
-def get_llm_response(prompt):
-    """获取大模型响应"""
+def get_llm_response(prompt, context=None):
+    """获取大模型响应（context 为单次请求的模型选择，见 ModelManager.create_context）"""
     try:
         # 使用统一的模型管理器调用模型
-        response = model_manager.call_model('tender_generation', prompt)
+        response = model_manager.call_model('tender_generation', prompt, context=context)
         return response
     except Exception as e:
         print(f"调用大模型时出错: {e}")
         return None
 
-def summarize_chunk(chunk):
+def summarize_chunk(chunk, context=None):
     """调用 LLM 对单个文本块进行总结 (Map 步骤)"""
     prompt = f"请你作为一个专业的招标项目经理，详细总结以下内容的核心要点、关键需求和技术指标。请确保总结内容清晰、准确，抓住重点。内容如下：\n\n---\n{chunk}\n---"
-    return get_llm_response(prompt)
+    return get_llm_response(prompt, context)
 
-def reduce_summaries(summaries):
+def reduce_summaries(summaries, context=None):
     """将所有块总结合并成一个最终的全局概述 (Reduce 步骤)"""
     # 过滤掉None值，避免join操作失败
     valid_summaries = [summary for summary in summaries if summary is not None and summary.strip()]
@@ -58,9 +60,9 @@ def reduce_summaries(summaries):
     
     combined_summary = "\n\n---\n\n".join(valid_summaries)
     prompt = f"你是一位顶级的项目需求分析专家。请基于以下多个分散的要点总结，整合并提炼成一份对整个项目全面、连贯、高度概括的需求陈述。这份陈述将作为后续撰写招标书的唯一依据，因此必须全面、准确、逻辑清晰。总结要点如下：\n\n---\n{combined_summary}\n---"
-    return get_llm_response(prompt)
+    return get_llm_response(prompt, context)
 
-def generate_tender_section(overall_summary, section_title):
+def generate_tender_section(overall_summary, section_title, context=None):
     """根据全局概述，生成招标书的单个章节 (迭代生成步骤)"""
     prompt = f"""你是一位资深的标书撰写专家。请根据以下项目的总体需求概述，撰写招标书的'{section_title}'部分。内容要求专业、详细、符合标准格式，语言严谨。
 
@@ -70,25 +72,35 @@ def generate_tender_section(overall_summary, section_title):
 ---
 
 请开始撰写'{section_title}'的内容："""
-    return get_llm_response(prompt)
+    return get_llm_response(prompt, context)
 
-def process_document(filepath):
-    """核心处理流程函数"""
+def process_document(filepath, text=None, context=None):
+    """核心处理流程函数
+
+    Args:
+        filepath: 文档路径
+        text: 已解析的文档文本（可选，传入时不再重复解析）
+        context: 本次请求的模型选择（ModelContext，可选，未指定时使用模块当前配置的模型）
+    """
     print(f"1. 开始解析文档: {filepath}")
-    text = parse_document_text(filepath)
+    if text is None:
+        text = parse_document_text(filepath)
     if not text:
         raise ValueError("无法从文档中提取文本内容")
 
     print("2. 开始文本分块...")
     chunks = chunk_text(text)
+    chunks, skipped = deduplicate_chunks(chunks)
+    if skipped:
+        print(f"   - 跳过 {skipped} 个近似重复的文本块")
     
     print(f"3. 开始对 {len(chunks)} 个文本块进行并行总结 (Map)...")
     # 保持并行处理
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        chunk_summaries = list(executor.map(summarize_chunk, chunks))
+        chunk_summaries = list(executor.map(partial(summarize_chunk, context=context), chunks))
     
     print("4. 开始整合所有总结 (Reduce)...")
-    overall_summary = reduce_summaries(chunk_summaries)
+    overall_summary = reduce_summaries(chunk_summaries, context)
     
     print("5. 开始迭代生成招标书...")
     tender_sections = [
@@ -103,14 +115,14 @@ def process_document(filepath):
     final_document = f"# 招标书\n\n(基于文件 {os.path.basename(filepath)} 生成)\n\n"
     for section_title in tender_sections:
         print(f"   - 正在生成: {section_title}")
-        section_content = generate_tender_section(overall_summary, section_title)
+        section_content = generate_tender_section(overall_summary, section_title, context)
         final_document += f"## {section_title}\n\n{section_content}\n\n---\n\n"
         
     print("6. 招标文件生成完毕！")
     return final_document
 
-def process_text_content(text_content, config):
-    """处理用户输入的文本内容生成招标书"""
+def process_text_content(text_content, config, context=None):
+    """处理用户输入的文本内容生成招标书（context 为本次请求的模型选择）"""
     print("1. 开始处理用户输入的文本内容...")
     
     if not text_content or len(text_content.strip()) < 10:
@@ -121,14 +133,17 @@ def process_text_content(text_content, config):
     
     print("2. 开始文本分块...")
     chunks = chunk_text(text_content)
+    chunks, skipped = deduplicate_chunks(chunks)
+    if skipped:
+        print(f"   - 跳过 {skipped} 个近似重复的文本块")
     
     print(f"3. 开始对 {len(chunks)} 个文本块进行并行总结 (Map)...")
     # 保持并行处理
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        chunk_summaries = list(executor.map(summarize_chunk, chunks))
+        chunk_summaries = list(executor.map(partial(summarize_chunk, context=context), chunks))
     
     print("4. 开始整合所有总结 (Reduce)...")
-    overall_summary = reduce_summaries(chunk_summaries)
+    overall_summary = reduce_summaries(chunk_summaries, context)
     
     print("5. 开始迭代生成招标书...")
     tender_sections = [
@@ -152,7 +167,7 @@ def process_text_content(text_content, config):
     
     for section_title in tender_sections:
         print(f"   - 正在生成: {section_title}")
-        section_content = generate_tender_section(overall_summary, section_title)
+        section_content = generate_tender_section(overall_summary, section_title, context)
         final_document += f"## {section_title}\n\n{section_content}\n\n---\n\n"
         
     print("6. 基于文本的招标文件生成完毕！")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown→Word 渲染模块
+
+功能说明：
+- 将生成的Markdown文件逐行读取并渲染为DOCX，不在内存中保留整篇文本
+- 同一文档内的段落样式只查找一次并缓存，避免python-docx每段按名称查找样式
+- 渲染在线程池中执行，不阻塞事件循环
+- 支持下载时按需渲染：Word文件首次下载时才由对应的Markdown文件生成
+"""
+
+import os
+import re
+import asyncio
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from docx import Document
+
+logger = logging.getLogger(__name__)
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*)$')
+_BULLET_RE = re.compile(r'^[-*+]\s+(.*)$')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_SEPARATORS = {'---', '***', '___'}
+
+
+class _StyleCache:
+    """单个文档的段落样式缓存"""
+
+    def __init__(self, document):
+        self._styles = document.styles
+        self._cache = {}
+
+    def get(self, name: str):
+        style = self._cache.get(name)
+        if style is None:
+            style = self._cache[name] = self._styles[name]
+        return style
+
+
+class DocxRenderer:
+    """Markdown→DOCX 渲染器
+
+    支持的Markdown元素：标题（#~######）、无序列表、加粗（**文本**）、
+    分隔线（跳过）；连续的普通文本行合并为一个段落，行内保留换行。
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docx-renderer")
+        # 正在渲染的目标文件 -> 锁，避免同一文件被并发下载时重复渲染
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # 目标文件 -> 持有或等待该锁的协程数，降为0时才移除锁
+        self._lock_users: Dict[str, int] = {}
+
+    def render_lines(self, lines: Iterable[str], output_path: str, title: Optional[str] = None) -> str:
+        """将Markdown行渲染为DOCX并保存
+
+        Args:
+            lines: Markdown文本行（可以是打开的文件对象）
+            output_path: DOCX保存路径
+            title: 文档标题（可选，使用Title样式）
+
+        Returns:
+            保存的DOCX文件路径
+        """
+        document = Document()
+        styles = _StyleCache(document)
+
+        if title:
+            document.add_paragraph(title, style=styles.get('Title'))
+
+        buffer = []
+
+        def flush():
+            if buffer:
+                self._add_paragraph(document, '\n'.join(buffer), styles.get('Normal'))
+                buffer.clear()
+
+        for line in lines:
+            line = line.strip()
+            if not line or line in _SEPARATORS:
+                flush()
+                continue
+
+            heading = _HEADING_RE.match(line)
+            if heading:
+                flush()
+                text = _BOLD_RE.sub(r'\1', heading.group(2).strip())
+                if text:
+                    document.add_paragraph(text, style=styles.get(f'Heading {len(heading.group(1))}'))
+                continue
+
+            bullet = _BULLET_RE.match(line)
+            if bullet:
+                flush()
+                self._add_paragraph(document, bullet.group(1), styles.get('List Bullet'))
+                continue
+
+            buffer.append(line)
+        flush()
+
+        # 先写入同目录下唯一命名的临时文件再替换，下载方不会读到未写完的文件
+        fd, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(output_path)}.", suffix=".tmp",
+                                         dir=os.path.dirname(output_path) or '.')
+        os.close(fd)
+        try:
+            document.save(temp_path)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return output_path
+
+    def render_file(self, markdown_path: str, output_path: str, title: Optional[str] = None) -> str:
+        """逐行读取Markdown文件并渲染为DOCX"""
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(markdown_path, 'r', encoding='utf-8') as f:
+            return self.render_lines(f, output_path, title)
+
+    async def render_file_async(self, markdown_path: str, output_path: str, title: Optional[str] = None) -> str:
+        """在线程池中渲染，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.render_file, markdown_path, output_path, title)
+
+    async def ensure_docx(self, markdown_path: str, output_path: str, title: Optional[str] = None) -> str:
+        """按需渲染：DOCX不存在时由Markdown文件生成，已存在则直接返回
+
+        Raises:
+            FileNotFoundError: DOCX与对应的Markdown文件均不存在
+        """
+        if os.path.exists(output_path):
+            return output_path
+
+        lock = self._locks.setdefault(output_path, asyncio.Lock())
+        self._lock_users[output_path] = self._lock_users.get(output_path, 0) + 1
+        try:
+            async with lock:
+                if not os.path.exists(output_path):
+                    if not os.path.exists(markdown_path):
+                        raise FileNotFoundError(markdown_path)
+                    logger.info(f"首次下载，开始渲染Word文档: {output_path}")
+                    await self.render_file_async(markdown_path, output_path, title)
+        finally:
+            # 没有协程持有或等待时移除（渲染失败或Markdown不存在时同样移除），避免任意文件名的锁不断累积；
+            # 仍有等待者时保留，否则后来者会新建锁，与等待者同时渲染
+            self._lock_users[output_path] -= 1
+            if not self._lock_users[output_path]:
+                del self._lock_users[output_path]
+                del self._locks[output_path]
+        return output_path
+
+    @staticmethod
+    def _add_paragraph(document, text: str, style):
+        """添加段落，将 **文本** 渲染为加粗"""
+        if '**' not in text:
+            return document.add_paragraph(text, style=style)
+
+        paragraph = document.add_paragraph(style=style)
+        parts = _BOLD_RE.split(text)
+        for index, part in enumerate(parts):
+            if part:
+                # split 结果中奇数位置为加粗内容
+                paragraph.add_run(part).bold = bool(index % 2)
+        return paragraph
+
+
+# 全局渲染器实例
+docx_renderer = DocxRenderer()
@@ -2,122 +2,104 @@ import time
 
 import time
 
+from itertools import compress
+
+# 合并到正文缓冲区的元素类型
+_BODY_TYPES = ("UncategorizedText", "ListItem")
+
+
+def _merge_split_phone_numbers(texts, types, skip_indices):
+    """第一步：清理和智能合并
+
+    以"(027"结尾且下一项以8或1开头的文本与下一项合并，被合并的下一项不再单独输出；
+    输入中已带 skip 标记的项同样跳过。不修改输入数据。
+
+    Returns:
+        (清理后的文本列表, 对应的类型列表)
+    """
+    n = len(texts)
+    merge_indices = [i for i in range(n - 1)
+                     if texts[i].endswith("(027") and texts[i + 1].startswith(("8", "1"))]
+    # 绝大多数文档既没有被拆分的电话号码，也没有预置的跳过标记
+    if not merge_indices and not skip_indices:
+        return texts, types
+
+    merged_texts = list(texts)
+    for i in merge_indices:
+        merged_texts[i] = texts[i] + texts[i + 1]
+
+    emit = [True] * n
+    for i in skip_indices:
+        emit[i] = False
+    for i in merge_indices:
+        emit[i + 1] = False
+    # 合并判断先于跳过判断：本身被合并掉的项若也满足合并条件，仍与其下一项合并输出
+    for i in merge_indices:
+        emit[i] = True
+    # 原实现中"以长度/高度结尾且末字符为数字"的合并条件恒不成立，故无需处理
+    return list(compress(merged_texts, emit)), list(compress(types, emit))
+
+
+def _merge_related_fragments(texts, types):
+    """第二步：按章节合并相关片段
+
+    以#开头的标题单独输出并更新当前章节，其他标题与其后的正文（UncategorizedText/ListItem）
+    拼接为一个 Content 元素。
+    """
+    merged_content = []
+    append = merged_content.append
+    current_section = ""
+    buffer = []
+
+    for text, item_type in zip(map(str.strip, texts), types):
+        # 跳过无意义的内容：长度<=1，或以*开头且长度<=3（含"*"、":"、"**"、"***"）
+        size = len(text)
+        if size <= 1 or (size <= 3 and text[0] == "*"):
+            continue
+
+        if item_type == "Title":
+            # 缓冲区中的文本均已去除首尾空白且非空，拼接结果无需再 strip
+            if buffer:
+                merged_text = " ".join(buffer)
+                if len(merged_text) > 3:
+                    append({"type": "Content", "text": merged_text, "section": current_section})
+                buffer = []
+            if text[0] == "#":
+                current_section = text
+                append({"type": "Title", "text": text, "section": current_section})
+            else:
+                buffer.append(text)
+        elif item_type in _BODY_TYPES:
+            buffer.append(text)
+
+    if buffer:
+        merged_text = " ".join(buffer)
+        if len(merged_text) > 3:
+            append({"type": "Content", "text": merged_text, "section": current_section})
+
+    return merged_content
+
+
 def optimize_tender_content_for_llm(filtered_data):
     """
     优化过滤后的招标文件，使其更适合大模型理解
+
+    先将 text/type 载入列表，电话号码拆分和跳过标记在整列上一次计算，
+    再单次遍历去除首尾空白后的文本按章节合并，不修改输入数据。
     """
-    
-    def merge_related_fragments(content_list):
-        """合并相关的文本片段"""
-        merged_content = []
-        current_section = ""
-        buffer = []
-        
-        for item in content_list:
-            text = item.get("text", "").strip()
-            item_type = item.get("type", "")
-            
-            # 跳过无意义的内容
-            if (text in ["*", ":", "**", "***"] or 
-                text.startswith("*") and len(text) <= 3 or
-                len(text) <= 1):
-                continue
-            
-            # 处理标题
-            if item_type == "Title":
-                # 如果buffer中有内容，先处理buffer
-                if buffer:
-                    merged_text = " ".join(buffer).strip()
-                    if merged_text and len(merged_text) > 3:
-                        merged_content.append({
-                            "type": "Content",
-                            "text": merged_text,
-                            "section": current_section
-                        })
-                    buffer = []
-                
-                # 处理标题
-                if text.startswith("#"):
-                    current_section = text
-                    merged_content.append({
-                        "type": "Title", 
-                        "text": text,
-                        "section": current_section
-                    })
-                elif text.endswith(":") or "：" in text:
-                    # 这可能是一个字段标签，加入buffer等待后续内容
-                    buffer.append(text)
-                else:
-                    buffer.append(text)
-            
-            # 处理其他内容
-            elif item_type in ["UncategorizedText", "ListItem"]:
-                buffer.append(text)
-        
-        # 处理最后的buffer
-        if buffer:
-            merged_text = " ".join(buffer).strip()
-            if merged_text and len(merged_text) > 3:
-                merged_content.append({
-                    "type": "Content",
-                    "text": merged_text,
-                    "section": current_section
-                })
-        
-        return merged_content
-    
-    def clean_and_merge_text(content_list):
-        """清理并智能合并文本"""
-        cleaned_content = []
-        
-        for i, item in enumerate(content_list):
-            text = item["text"]
-            
-            # 特殊处理：合并被分割的信息
-            if (text.endswith("(027") and 
-                i + 1 < len(content_list) and 
-                content_list[i + 1]["text"].startswith(("8", "1"))):
-                # 合并电话号码
-                next_text = content_list[i + 1]["text"]
-                merged_text = text + next_text
-                cleaned_content.append({
-                    **item,
-                    "text": merged_text
-                })
-                # 跳过下一个项目（因为已经合并了）
-                content_list[i + 1]["skip"] = True
-                continue
-            
-            # 跳过标记为跳过的项目
-            if item.get("skip"):
-                continue
-            
-            # 合并数字信息（如"长度6" + "12米"）
-            if (text.endswith(("长度", "高度")) and text[-1].isdigit() and
-                i + 1 < len(content_list)):
-                next_text = content_list[i + 1]["text"]
-                if next_text.endswith("米"):
-                    merged_text = text + next_text
-                    cleaned_content.append({
-                        **item,
-                        "text": merged_text
-                    })
-                    content_list[i + 1]["skip"] = True
-                    continue
-            
-            cleaned_content.append(item)
-        
-        return cleaned_content
-    
-    # 执行优化
     content = filtered_data.get("content", [])
-    
+
+    texts = [item["text"] for item in content]
+    types = [item.get("type", "") for item in content]
+    skips = [item.get("skip") for item in content]
+    skip_indices = list(compress(range(len(skips)), skips)) if any(skips) else []
+
     # 第一步：清理和智能合并
-    cleaned_content = clean_and_merge_text(content)
-    
+    cleaned_texts, cleaned_types = _merge_split_phone_numbers(texts, types, skip_indices)
+
     # 第二步：按章节合并相关片段
-    merged_content = merge_related_fragments(cleaned_content)
-    
+    merged_content = _merge_related_fragments(cleaned_texts, cleaned_types)
+
     return {"content": merged_content}
 
 
@@ -239,6 +221,136 @@ def process_tender_document_optimized(json_data):
     }
 
 
+# 流式处理时单个分组缓冲区的最大字符数，超出后提前输出，内存不随文档大小增长
+STREAM_MAX_BUFFER_CHARS = 200000
+
+
+class StreamingTenderFilter:
+    """
+    招标文件元素流的增量处理器
+
+    逐个接收解析器输出的元素（与 filtered_data["content"] 中的元素格式相同），
+    按 optimize_tender_content_for_llm 和 convert_to_structured_text 的规则增量生成结构化文本。
+    只保留一个待定元素（用于合并被拆分的电话号码）和当前分组的文本缓冲区，
+    内存占用与文档大小无关。
+
+    与整体处理的差异：
+    - 同名章节标题重复出现时按出现位置依次输出，不再归并到第一次出现的章节下
+    - 单个分组超过 max_buffer_chars 时提前输出，分组被拆为多段正文
+    """
+
+    def __init__(self, max_buffer_chars: int = STREAM_MAX_BUFFER_CHARS):
+        self.max_buffer_chars = max_buffer_chars
+        self._start_time = time.time()
+        # 第一步状态：尚未确定是否与下一项合并的元素 (text, type, 是否跳过)
+        self._pending = None
+        # 第二步状态
+        self._section = ""
+        self._buffer = []
+        self._buffer_chars = 0
+        # 结构化文本状态
+        self._chapter_open = False
+        self._has_output = False
+        self._fragments = []
+        # 统计
+        self.original_content_count = 0
+        self.optimized_content_count = 0
+        self.structured_text_length = 0
+
+    def feed(self, item):
+        """处理一个元素，返回新生成的结构化文本片段（拼接后即结构化文本）"""
+        text = item["text"]
+        self.original_content_count += 1
+        pending = self._pending
+        merged = False
+        if pending is not None:
+            pending_text, pending_type, pending_skip = pending
+            # 合并判断先于跳过判断，与 optimize_tender_content_for_llm 一致
+            if pending_text.endswith("(027") and text.startswith(("8", "1")):
+                self._accept(pending_text + text, pending_type)
+                merged = True
+            elif not pending_skip:
+                self._accept(pending_text, pending_type)
+        self._pending = (text, item.get("type", ""), merged or bool(item.get("skip")))
+        return self._take_fragments()
+
+    def finish(self):
+        """输入结束，输出剩余内容，返回最后的结构化文本片段"""
+        if self._pending is not None:
+            pending_text, pending_type, pending_skip = self._pending
+            if not pending_skip:
+                self._accept(pending_text, pending_type)
+            self._pending = None
+        self._flush()
+        if self._chapter_open:
+            self._emit_line("")
+            self._chapter_open = False
+        return self._take_fragments()
+
+    def statistics(self):
+        """当前统计信息，字段与 process_tender_document_optimized 返回的 statistics 相同"""
+        original = self.original_content_count
+        optimized = self.optimized_content_count
+        return {
+            "original_content_count": original,
+            "optimized_content_count": optimized,
+            "structured_text_length": self.structured_text_length,
+            "llm_prompt_length": len(create_llm_friendly_prompt("")) + self.structured_text_length,
+            "processing_time_seconds": round(time.time() - self._start_time, 2),
+            "optimization_ratio_percentage": round((1 - optimized / original) * 100, 2) if original > 0 else 0
+        }
+
+    def _accept(self, text, item_type):
+        """第二步：按章节合并相关片段（规则同 _merge_related_fragments）"""
+        text = text.strip()
+        size = len(text)
+        if size <= 1 or (size <= 3 and text[0] == "*"):
+            return
+
+        if item_type == "Title":
+            self._flush()
+            if text[0] == "#":
+                self._section = text
+                self.optimized_content_count += 1
+                if self._chapter_open:
+                    self._emit_line("")
+                self._emit_line(f"\n{text}\n")
+                self._emit_line("-" * 50)
+                self._chapter_open = True
+                return
+        elif item_type not in _BODY_TYPES:
+            return
+
+        self._buffer.append(text)
+        self._buffer_chars += size + 1
+        if self._buffer_chars > self.max_buffer_chars:
+            self._flush()
+
+    def _flush(self):
+        """输出当前分组的正文"""
+        if not self._buffer:
+            return
+        merged_text = " ".join(self._buffer)
+        self._buffer = []
+        self._buffer_chars = 0
+        if len(merged_text) > 3:
+            self.optimized_content_count += 1
+            # 第一个章节标题之前的正文不进入结构化文本
+            if self._chapter_open:
+                self._emit_line(merged_text)
+
+    def _emit_line(self, line):
+        fragment = f"\n{line}" if self._has_output else line
+        self._has_output = True
+        self.structured_text_length += len(fragment)
+        self._fragments.append(fragment)
+
+    def _take_fragments(self):
+        fragments = self._fragments
+        self._fragments = []
+        return fragments
+
+
 # 验证处理效果
 def validate_content_integrity(original_data, processed_result):
     """